@@ -0,0 +1,56 @@
+"""message history indexes
+
+Составные индексы (chat_id, created_at, id) и (user_id, created_at, id) для выборки последних сообщений
+и keyset пагинации истории чата. Одноколоночные индексы chat_id и user_id покрываются составными и удаляются.
+Индексы создаются через CONCURRENTLY, чтобы не блокировать запись в таблицу message.
+
+Revision ID: c71a55fe872b
+Revises: de3fd928cd0b
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71a55fe872b'
+down_revision = 'de3fd928cd0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_message_chat_id_created_at_id",
+            "message",
+            ["chat_id", "created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_message_user_id_created_at_id",
+            "message",
+            ["user_id", "created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_message_chat_id", table_name="message", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_message_user_id", table_name="message", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_message_chat_id", "message", ["chat_id"], postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            "ix_message_user_id", "message", ["user_id"], postgresql_concurrently=True, if_not_exists=True
+        )
+        op.drop_index(
+            "ix_message_chat_id_created_at_id", table_name="message", postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            "ix_message_user_id_created_at_id", table_name="message", postgresql_concurrently=True, if_exists=True
+        )
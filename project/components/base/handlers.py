@@ -7,7 +7,12 @@ from telegram.ext import (
     ContextTypes,
 )
 
-from project.infrastructure.utils.telegram import processing_errors, check_auth, timeout_with_retry
+from project.infrastructure.utils.telegram import (
+    processing_errors,
+    check_auth,
+    query_tracking_decorator,
+    timeout_with_retry,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,7 @@ logger = logging.getLogger(__name__)
 @timeout_with_retry
 @processing_errors
 @action_tracking_decorator("start_handler")
+@query_tracking_decorator
 @check_auth
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
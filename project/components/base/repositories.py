@@ -1,13 +1,23 @@
+import inspect
 import typing as t
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 from datetime import timedelta
 
-from sqlalchemy import select, delete, orm
+from sqlalchemy import select, delete, func, orm
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from project.components.base.models import Base
 from project.exceptions import NotFoundError, throw
 from project.infrastructure.adapters.acache import redis_client
-from project.infrastructure.adapters.database import Session, transaction, current_transaction
+from project.infrastructure.adapters.adatabase import aread_session, atransaction, current_atransaction
+from project.infrastructure.adapters.database import (
+    current_transaction,
+    mark_writes,
+    read_session,
+    repository_method,
+    transaction,
+)
+from project.libs.bulk import BulkFormatT, CopyWriter, CsvRowsReader, ProgressCallbackT, RowT, first_row_columns
 
 
 T = t.TypeVar("T", bound=Base)
@@ -19,23 +29,62 @@ class ORMRepository(t.Generic[T]):
     """
 
     _model: t.ClassVar
+    read_session = staticmethod(read_session)
+    transaction = staticmethod(transaction)
+    current_transaction = staticmethod(current_transaction)
+    aread_session = staticmethod(aread_session)
+    atransaction = staticmethod(atransaction)
+    current_atransaction = staticmethod(current_atransaction)
+    repository_method = staticmethod(repository_method)
+
+    def __init_subclass__(cls, **kwargs: t.Any) -> None:
+        """Публичные classmethod наследников называют себя в логе медленных запросов (repository_method)."""
+        super().__init_subclass__(**kwargs)
+        for name, attribute in vars(cls).items():
+            if name.startswith("_") or not isinstance(attribute, classmethod):
+                continue
+            method = attribute.__func__
+            unwrapped = inspect.unwrap(method)
+            if inspect.isgeneratorfunction(unwrapped) or inspect.isasyncgenfunction(unwrapped):
+                continue
+            setattr(cls, name, classmethod(cls.repository_method(method)))
 
     @classmethod
     @contextmanager
     def get_session(cls) -> t.Generator[orm.Session, t.Any, None]:
-        with Session() as session:  # di: skip
+        """Outside a transaction, goes to a replica if SQLALCHEMY_REPLICA_DSNS are set."""
+        with cls.read_session() as session:
             yield session
 
     @classmethod
     @contextmanager
     def get_transaction(cls) -> t.Generator[orm.Session, t.Any, None]:
-        with transaction() as session:  # di: skip
+        with cls.transaction() as session:
             yield session
 
     @classmethod
     @contextmanager
     def get_current_transaction(cls) -> t.Generator[orm.Session, t.Any, None]:
-        with current_transaction() as session:  # di: skip
+        with cls.current_transaction() as session:
+            yield session
+
+    @classmethod
+    @asynccontextmanager
+    async def get_asession(cls) -> t.AsyncGenerator[AsyncSession, None]:
+        """Outside a transaction, goes to a replica if SQLALCHEMY_REPLICA_DSNS are set."""
+        async with cls.aread_session() as session:
+            yield session
+
+    @classmethod
+    @asynccontextmanager
+    async def get_atransaction(cls) -> t.AsyncGenerator[AsyncSession, None]:
+        async with cls.atransaction() as session:
+            yield session
+
+    @classmethod
+    @asynccontextmanager
+    async def get_current_atransaction(cls) -> t.AsyncGenerator[AsyncSession, None]:
+        async with cls.current_atransaction() as session:
             yield session
 
 
@@ -44,6 +93,11 @@ class ORMModelRepository(ORMRepository[T]):
     Separates infrastructure from ORM.
     """
 
+    CsvRowsReader = CsvRowsReader
+    CopyWriter = CopyWriter
+    first_row_columns = staticmethod(first_row_columns)
+    mark_writes = staticmethod(mark_writes)
+
     @classmethod
     def new(cls, **kwargs: t.Any) -> T:
         return cls._model(**kwargs)
@@ -54,16 +108,32 @@ class ORMModelRepository(ORMRepository[T]):
         cls.save(instance)
         return instance
 
+    @classmethod
+    async def acreate(cls, **kwargs: t.Any) -> T:
+        instance = cls.new(**kwargs)
+        await cls.asave(instance)
+        return instance
+
     @classmethod
     def save(cls, instance: T) -> None:
         with cls.get_transaction() as session:
             session.add(instance)
 
+    @classmethod
+    async def asave(cls, instance: T) -> None:
+        async with cls.get_atransaction() as session:
+            session.add(instance)
+
     @classmethod
     def get_or_none(cls, pk: t.Any) -> T | None:
         with cls.get_session() as session:
             return session.get(cls._model, pk)
 
+    @classmethod
+    async def aget_or_none(cls, pk: t.Any) -> T | None:
+        async with cls.get_asession() as session:
+            return await session.get(cls._model, pk)
+
     @classmethod
     def get(cls, pk: t.Any) -> T:
         return cls.get_or_none(pk) or throw(NotFoundError, f"{cls._model}.pk", pk)
@@ -89,6 +159,80 @@ class ORMModelRepository(ORMRepository[T]):
         with cls.get_transaction() as session:
             session.execute(delete(cls._model).where(cls._model.id == id))
 
+    @classmethod
+    def bulk_insert(
+        cls,
+        rows: t.Iterable[RowT],
+        columns: t.Sequence[str] | None = None,
+        on_progress: ProgressCallbackT | None = None,
+    ) -> int:
+        """
+        Массовая вставка строк через COPY ... FROM STDIN в текущей транзакции.
+        Память не зависит от количества строк. Колонки по умолчанию - ключи первой строки.
+        Если загружается id, последовательность id сдвигается на максимальный id.
+        Работает только с синхронным драйвером psycopg2.
+        """
+        if columns is None:
+            columns, rows = cls.first_row_columns(rows)
+        if not columns:
+            return 0
+
+        table = cls._model.__table__
+        if unknown_columns := set(columns) - set(table.columns.keys()):
+            error = f"Unknown columns of {table.name}: {sorted(unknown_columns)}"
+            raise ValueError(error)
+
+        reader = cls.CsvRowsReader(rows, columns, on_progress=on_progress)
+        with cls.get_current_transaction() as session:
+            preparer = session.get_bind().dialect.identifier_preparer
+            column_names = ", ".join(preparer.quote(column) for column in columns)
+            sql = f"COPY {preparer.format_table(table)} ({column_names}) FROM STDIN WITH (FORMAT csv)"
+            with session.connection().connection.cursor() as cursor:
+                cursor.copy_expert(sql, reader)
+            cls.mark_writes(session)
+
+            if "id" in columns:
+                max_id = select(func.max(table.c.id)).scalar_subquery()
+                sequence = func.pg_get_serial_sequence(preparer.format_table(table), "id")
+                session.execute(select(func.setval(sequence, max_id)))
+
+        return reader.count
+
+    @classmethod
+    def bulk_export(
+        cls,
+        file: t.BinaryIO,
+        file_format: BulkFormatT = "csv",
+        columns: t.Sequence[str] | None = None,
+        on_progress: ProgressCallbackT | None = None,
+    ) -> int:
+        """
+        Массовая выгрузка строк через COPY ... TO STDOUT в CSV (с заголовком, NULL как \\N) или NDJSON.
+        Память не зависит от количества строк. Работает только с синхронным драйвером psycopg2.
+        """
+        table = cls._model.__table__
+        selected_columns = [table.c[column] for column in columns] if columns else list(table.columns)
+
+        writer = cls.CopyWriter(file, file_format, on_progress=on_progress)
+        with cls.get_session() as session:
+            dialect = session.get_bind().dialect
+            if file_format == "ndjson":
+                rows = select(*selected_columns).subquery("t")
+                query = select(func.row_to_json(rows.table_valued())).select_from(rows)
+                sql = f"COPY ({query.compile(dialect=dialect)}) TO STDOUT"
+            else:
+                preparer = dialect.identifier_preparer
+                column_names = ", ".join(preparer.quote(column.name) for column in selected_columns)
+                sql = (
+                    f"COPY {preparer.format_table(table)} ({column_names}) "
+                    "TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')"
+                )
+
+            with session.connection().connection.cursor() as cursor:
+                cursor.copy_expert(sql, writer)
+
+        return writer.count
+
 
 class CacheRepository:
     client = redis_client
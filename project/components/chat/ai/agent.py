@@ -1,13 +1,16 @@
+import time
 import typing as t
 
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
 from langfuse import propagate_attributes
 from langfuse.langchain import CallbackHandler
+from llm_common.prometheus import is_build_metrics
 
 from project.components.chat.ai.prompts import SYSTEM_PROMPT
 from project.components.chat.enums import MessageTypeEnum
 from project.datatypes import QuestionT, AnswerT, UserIdT, ChatIdT
+from project.libs import metrics
 
 if t.TYPE_CHECKING:
     from project.components.chat.models import MessageModel
@@ -33,20 +36,76 @@ class ChatAgent:
         Returns:
             Текст ответа от AI
         """
-        messages = [SystemMessage(content=SYSTEM_PROMPT)]
+        messages = self.build_messages(question, history)
 
-        for msg in history:
-            if msg.message_type == MessageTypeEnum.USER:
-                messages.append(HumanMessage(content=msg.content))
-            elif msg.message_type == MessageTypeEnum.AI:
-                messages.append(AIMessage(content=msg.content))
+        with (
+            self.langfuse_client.start_as_current_observation(as_type="span", name="chat"),
+            propagate_attributes(user_id=str(user_id), session_id=str(chat_id)),
+        ):
+            response = self.llm_client.invoke(messages, config=RunnableConfig(callbacks=[CallbackHandler()]))
 
-        messages.append(HumanMessage(content=question))
+        return AnswerT(response.content)
+
+    async def agenerate_answer(
+        self, user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, history: list["MessageModel"]
+    ) -> AnswerT:
+        """
+        Асинхронный generate_answer(), не блокирует поток на время ответа LLM.
+
+        Returns:
+            Текст ответа от AI
+        """
+        messages = self.build_messages(question, history)
 
         with (
             self.langfuse_client.start_as_current_observation(as_type="span", name="chat"),
             propagate_attributes(user_id=str(user_id), session_id=str(chat_id)),
         ):
-            response = self.llm_client.invoke(messages, config=RunnableConfig(callbacks=[CallbackHandler()]))
+            response = await self.llm_client.ainvoke(messages, config=RunnableConfig(callbacks=[CallbackHandler()]))
 
         return AnswerT(response.content)
+
+    async def astream_answer(
+        self, user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, history: list["MessageModel"]
+    ) -> t.AsyncIterator[str]:
+        """
+        Потоковый agenerate_answer(): отдает части текста ответа по мере генерации.
+        Пишет метрики времени до первого токена и скорости генерации (части ответа считаются токенами).
+        """
+        messages = self.build_messages(question, history)
+        start_time = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+
+        with (
+            self.langfuse_client.start_as_current_observation(as_type="span", name="chat"),
+            propagate_attributes(user_id=str(user_id), session_id=str(chat_id)),
+        ):
+            async for chunk in self.llm_client.astream(messages, config=RunnableConfig(callbacks=[CallbackHandler()])):
+                if not (text := chunk.text):
+                    continue
+
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    if is_build_metrics():
+                        metrics.LLM_TIME_TO_FIRST_TOKEN.labels(name="chat").observe(first_token_at - start_time)
+
+                tokens += 1
+                yield text
+
+        duration = time.perf_counter() - (first_token_at or start_time)
+        if tokens > 1 and duration > 0 and is_build_metrics():
+            metrics.LLM_TOKENS_PER_SECOND.labels(name="chat").observe((tokens - 1) / duration)
+
+    @staticmethod
+    def build_messages(question: QuestionT, history: list["MessageModel"]) -> list[BaseMessage]:
+        messages: list[BaseMessage] = [SystemMessage(content=SYSTEM_PROMPT)]
+
+        for msg in history:
+            if msg.message_type == MessageTypeEnum.USER:
+                messages.append(HumanMessage(content=msg.content))
+            elif msg.message_type == MessageTypeEnum.AI:
+                messages.append(AIMessage(content=msg.content))
+
+        messages.append(HumanMessage(content=question))
+        return messages
@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+import logging
+import typing as t
+
+import orjson
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
 from project.components.base.schemas import ApiResponseSchema
 from project.components.chat.schemas import (
@@ -10,6 +15,9 @@ from project.components.chat.schemas import (
 )
 from project.container import Container
 from project.datatypes import AnswerT
+from project.libs.streams import ServerSentEvent
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -33,11 +41,13 @@ def get_history_v1(body: ChatHistoryBodySchema):
         user_id=body.user_id,
         chat_id=body.chat_id,
         limit=body.limit,
+        before_id=body.before_id,
+        after_id=body.after_id,
     )
     return ApiResponseSchema(data=ChatHistoryResponseSchema(messages=history))
 
 
-@router.post("/v1/ask", response_model=ApiResponseSchema[AnswerT])
+@router.post("/v1/ask", response_model=ApiResponseSchema[AnswerT], deprecated=True)
 def ask_v1(body: AskBodySchema):
     """Asking a question to the chat."""
     answer = Container().chat.ask(
@@ -46,3 +56,48 @@ def ask_v1(body: AskBodySchema):
         chat_id=body.chat_id,
     )
     return ApiResponseSchema(data=answer)
+
+
+@router.post("/v2/ask", response_model=ApiResponseSchema[AnswerT])
+async def ask_v2(body: AskBodySchema):
+    """Asking a question to the chat, the request does not occupy a threadpool worker while waiting for the AI."""
+    answer = await Container().chat.aask(
+        user_id=body.user_id,
+        question=body.question,
+        chat_id=body.chat_id,
+    )
+    return ApiResponseSchema(data=answer)
+
+
+class AnswerEvents:
+    """Server-Sent Events of a streamed answer. Errors are reported as an event, the response has already started."""
+
+    ServerSentEvent = ServerSentEvent
+
+    async def encode(self, parts: t.AsyncIterator[AnswerT]) -> t.AsyncIterator[bytes]:
+        try:
+            async for part in parts:
+                yield self.ServerSentEvent(data=orjson.dumps({"text": part}).decode()).encode()
+        except Exception:
+            logger.exception("Answer stream error")
+            yield self.ServerSentEvent(data="{}", event="error").encode()
+        else:
+            yield self.ServerSentEvent(data="{}", event="done").encode()
+
+
+@router.post("/v2/ask/stream")
+async def ask_stream_v2(body: AskBodySchema, events: t.Annotated[AnswerEvents, Depends()]):
+    """
+    Asking a question to the chat, the answer is streamed as Server-Sent Events while it is generated:
+    "message" events with {"text": "<part of the answer>"}, then a "done" or an "error" event.
+    """
+    parts = Container().chat.aask_stream(
+        user_id=body.user_id,
+        question=body.question,
+        chat_id=body.chat_id,
+    )
+    return StreamingResponse(
+        events.encode(parts),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import String, BigInteger, Integer, ForeignKey, Enum
+from sqlalchemy import String, BigInteger, Integer, ForeignKey, Enum, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from project.components.base.models import TimeMixin, Base
@@ -27,10 +27,15 @@ class MessageModel(TimeMixin, Base):
     """Модель для хранения сообщений чата (вопросы пользователя и ответы AI)."""
 
     __tablename__ = "message"
+    __table_args__ = (
+        # Для выборки последних сообщений чата или пользователя и keyset пагинации без сортировки всех сообщений.
+        Index("ix_message_chat_id_created_at_id", "chat_id", "created_at", "id"),
+        Index("ix_message_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[MessageIdT] = mapped_column(BigInteger, primary_key=True)
-    chat_id: Mapped[ChatIdT] = mapped_column(Integer, ForeignKey("chat.id"), index=True, nullable=False)
-    user_id: Mapped[UserIdT] = mapped_column(Integer, ForeignKey("user.id"), index=True, nullable=False)
+    chat_id: Mapped[ChatIdT] = mapped_column(Integer, ForeignKey("chat.id"), nullable=False)
+    user_id: Mapped[UserIdT] = mapped_column(Integer, ForeignKey("user.id"), nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
     message_type: Mapped[MessageTypeEnum] = mapped_column(Enum(MessageTypeEnum), nullable=False)
 
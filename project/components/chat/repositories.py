@@ -1,9 +1,26 @@
-from sqlalchemy import select
+import logging
+import typing as t
+from datetime import timedelta
+from functools import lru_cache
+from operator import attrgetter
 
-from project.components.base.repositories import ORMModelRepository
+import orjson
+import redis
+from llm_common.prometheus import is_build_metrics
+from sqlalchemy import Integer, Select, bindparam, insert, select, tuple_
+from sqlalchemy.sql.dml import ReturningInsert
+
+from project.components.base.repositories import ORMModelRepository, CacheRepository
 from project.components.chat.models import ChatModel, MessageModel
 from project.components.chat.enums import MessageTypeEnum
-from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT
+from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT, MessageIdT
+from project.infrastructure.adapters.acache import redis_atransaction
+from project.infrastructure.adapters.cache import redis_transaction
+from project.libs import metrics
+from project.libs.bulk import ProgressCallbackT, RowT
+from project.settings import Settings
+
+logger = logging.getLogger(__name__)
 
 
 class ChatRepository(ORMModelRepository[ChatModel]):
@@ -11,29 +28,55 @@ class ChatRepository(ORMModelRepository[ChatModel]):
 
     _model = ChatModel
 
+    # Частые запросы собираются один раз, значения передаются параметрами при выполнении.
+    # SQLAlchemy запоминает ключ кеша скомпилированного запроса в объекте запроса,
+    # поэтому при выполнении запрос не собирается, не обходится для ключа кеша и не компилируется заново.
+    active_chat_query: t.ClassVar[Select[tuple[ChatModel]]] = (
+        select(ChatModel)
+        .where(ChatModel.user_id == bindparam("user_id"))
+        .where(ChatModel.is_active.is_(True))
+        .order_by(ChatModel.created_at.desc())
+        .limit(1)
+    )
+    new_chat_insert: t.ClassVar[ReturningInsert[tuple[ChatModel]]] = insert(ChatModel).returning(ChatModel)
+
+    @staticmethod
+    def new_chat_row(user_id: UserIdT, title: str) -> dict[str, t.Any]:
+        return {"user_id": user_id, "title": title, "is_active": True}
+
+    @classmethod
+    def get_active_chat(cls, user_id: UserIdT) -> ChatModel | None:
+        """Получить активный чат пользователя."""
+        with cls.get_session() as session:
+            return session.scalars(cls.active_chat_query, {"user_id": user_id}).first()
+
+    @classmethod
+    async def aget_active_chat(cls, user_id: UserIdT) -> ChatModel | None:
+        """Асинхронный get_active_chat()."""
+        async with cls.get_asession() as session:
+            return (await session.scalars(cls.active_chat_query, {"user_id": user_id})).first()
+
+    @classmethod
+    def create_active_chat(cls, user_id: UserIdT, title: str = "Новый чат") -> ChatModel:
+        """Создать активный чат одним INSERT ... RETURNING в текущей транзакции, без SAVEPOINT."""
+        with cls.get_current_transaction() as session:
+            return session.scalars(cls.new_chat_insert, [cls.new_chat_row(user_id, title)]).one()
+
+    @classmethod
+    async def acreate_active_chat(cls, user_id: UserIdT, title: str = "Новый чат") -> ChatModel:
+        """Асинхронный create_active_chat()."""
+        async with cls.get_current_atransaction() as session:
+            return (await session.scalars(cls.new_chat_insert, [cls.new_chat_row(user_id, title)])).one()
+
     @classmethod
     def get_or_create_active_chat(cls, user_id: UserIdT) -> ChatModel:
         """Получить или создать активный чат для пользователя."""
-        with cls.get_session() as session:
-            # Ищем активный чат
-            query = (
-                select(ChatModel)
-                .where(ChatModel.user_id == user_id)
-                .where(ChatModel.is_active.is_(True))
-                .order_by(ChatModel.created_at.desc())
-                .limit(1)
-            )
-            chat = session.scalars(query).first()
-
-            # Если чат не найден, создаем новый
-            if not chat:
-                chat = cls.create(
-                    user_id=user_id,
-                    title="Новый чат",
-                    is_active=True,
-                )
-
-            return chat
+        return cls.get_active_chat(user_id) or cls.create_active_chat(user_id)
+
+    @classmethod
+    async def aget_or_create_active_chat(cls, user_id: UserIdT) -> ChatModel:
+        """Асинхронный get_or_create_active_chat()."""
+        return await cls.aget_active_chat(user_id) or await cls.acreate_active_chat(user_id)
 
     @classmethod
     def get_chat_by_id(cls, chat_id: ChatIdT) -> ChatModel | None:
@@ -50,42 +93,368 @@ class ChatRepository(ORMModelRepository[ChatModel]):
                 chat.is_active = False
 
 
+class ChatWindowCacheRepository(CacheRepository):
+    """
+    Окно последних HISTORY_WINDOW сообщений чата в Redis для запросов к LLM без чтения истории из Postgres.
+    Хранится списком компактных orjson записей, удаляется через ttl без новых сообщений.
+
+    Новые сообщения дописываются только в существующее окно (RPUSHX),
+    окно создается целиком из Postgres при промахе, поэтому в кеше не бывает неполного окна.
+    Каждое изменение чата увеличивает версию окна, окно из Postgres сохраняется,
+    только если версия не изменилась с начала чтения (compare-and-set), иначе оно могло устареть.
+    Запись идет через redis_atransaction, внутри AllRepositories.atransaction() она выполняется после коммита в БД.
+    Ошибки Redis пишутся в лог и считаются промахом, история читается из Postgres.
+    """
+
+    metrics = metrics
+    key_template = "chat_window:{}"
+    version_key_template = "chat_window_version:{}"
+    ttl = timedelta(hours=1)
+    save_script = """
+        if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+            return 0
+        end
+        redis.call('DEL', KEYS[1])
+        if #ARGV > 2 then
+            redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+            redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        end
+        return 1
+    """
+
+    @staticmethod
+    def encode(message: MessageModel) -> bytes:
+        return orjson.dumps(
+            {
+                "id": message.id,
+                "user_id": message.user_id,
+                "type": message.message_type.name,
+                "content": message.content,
+            }
+        )
+
+    @staticmethod
+    def decode(chat_id: ChatIdT, content: bytes) -> MessageModel:
+        data = orjson.loads(content)
+        return MessageModel(
+            id=data["id"],
+            chat_id=chat_id,
+            user_id=data["user_id"],
+            message_type=MessageTypeEnum[data["type"]],
+            content=data["content"],
+        )
+
+    @classmethod
+    async def get(cls, chat_id: ChatIdT) -> list[MessageModel] | None:
+        """Окно сообщений от старых к новым или None, если окна нет в кеше."""
+        try:
+            content = await cls.client().lrange(cls.key_template.format(chat_id), -Settings().HISTORY_WINDOW, -1)
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+            return None
+
+        if is_build_metrics():
+            result = "hit" if content else "miss"
+            cls.metrics.CACHE_REQUESTS.labels(name="chat_window", result=result).inc()
+
+        if content:
+            # Сообщения, сохраненные между чтением окна из Postgres и его записью, могут попасть в окно дважды.
+            messages = {message.id: message for message in (cls.decode(chat_id, item) for item in content)}
+            return list(messages.values())
+
+        return None
+
+    @classmethod
+    async def version(cls, chat_id: ChatIdT) -> bytes | None:
+        """Версия окна для save(), читается до чтения окна из Postgres. None - Redis недоступен."""
+        try:
+            return await cls.client().get(cls.version_key_template.format(chat_id)) or b""
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+            return None
+
+    @classmethod
+    async def save(cls, chat_id: ChatIdT, messages: list[MessageModel], version: bytes) -> None:
+        """Заменяет окно сообщений чата, если версия окна не изменилась с version()."""
+        items = [cls.encode(message) for message in messages[-Settings().HISTORY_WINDOW :]]
+        keys = [cls.key_template.format(chat_id), cls.version_key_template.format(chat_id)]
+        try:
+            async with redis_atransaction() as tr:
+                tr.eval(cls.save_script, len(keys), *keys, version, int(cls.ttl.total_seconds() * 1000), *items)
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+
+    @classmethod
+    async def append(cls, *messages: MessageModel) -> None:
+        """Дописывает сообщения одного чата в окно, если окно есть в кеше."""
+        chat_id = messages[0].chat_id
+        key = cls.key_template.format(chat_id)
+        try:
+            async with redis_atransaction() as tr:
+                cls._increment_version(tr, chat_id)
+                tr.rpushx(key, *(cls.encode(message) for message in messages))
+                tr.ltrim(key, -Settings().HISTORY_WINDOW, -1)
+                tr.expire(key, cls.ttl)
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+
+    @classmethod
+    async def delete(cls, chat_id: ChatIdT) -> None:
+        try:
+            async with redis_atransaction() as tr:
+                tr.delete(cls.key_template.format(chat_id))
+                cls._increment_version(tr, chat_id)
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+
+    @classmethod
+    def invalidate(cls, *chat_ids: ChatIdT) -> None:
+        """
+        Удаляет окна чатов, в которые сообщения сохранены синхронно (save_turn(), bulk_insert()).
+        Через redis_transaction, внутри AllRepositories.transaction() выполняется после коммита в БД.
+        """
+        try:
+            with redis_transaction() as tr:
+                for chat_id in chat_ids:
+                    tr.delete(cls.key_template.format(chat_id))
+                    cls._increment_version(tr, chat_id)
+        except redis.RedisError as exc:
+            logger.warning("Chat window cache error: %s", exc)
+
+    @classmethod
+    def _increment_version(cls, tr: t.Any, chat_id: ChatIdT) -> None:
+        """Окно, прочитанное из Postgres до этого изменения, не будет сохранено в save()."""
+        key = cls.version_key_template.format(chat_id)
+        tr.incr(key)
+        tr.expire(key, cls.ttl)
+
+
 class MessageRepository(ORMModelRepository[MessageModel]):
     """Репозиторий для работы с сообщениями чата."""
 
     _model = MessageModel
+    window_cache = ChatWindowCacheRepository
+
+    @staticmethod
+    @lru_cache
+    def chat_history_statement(by_chat: bool, before: bool, after: bool) -> Select[tuple[MessageModel]]:
+        """
+        Запрос последних limit сообщений (или первых limit сообщений после after_id).
+        Сортировка по (created_at, id) идет по индексу ix_message_*_created_at_id,
+        курсоры before_id/after_id сравниваются с (created_at, id) сообщения-курсора (keyset пагинация).
+        Результат запроса отсортирован от новых к старым, если не указан только after_id.
+
+        Собирается один раз на сочетание фильтров, значения передаются параметрами, см. chat_history_query().
+        """
+        query = select(MessageModel)
+
+        # Фильтруем по чату или по пользователю
+        if by_chat:
+            query = query.where(MessageModel.chat_id == bindparam("chat_id"))
+        else:
+            query = query.where(MessageModel.user_id == bindparam("user_id"))
+
+        key = tuple_(MessageModel.created_at, MessageModel.id)
+        if before:
+            before_id = bindparam("before_id", type_=MessageModel.id.type)
+            before_created_at = select(MessageModel.created_at).where(MessageModel.id == before_id).scalar_subquery()
+            query = query.where(key < tuple_(before_created_at, before_id))
+        if after:
+            after_id = bindparam("after_id", type_=MessageModel.id.type)
+            after_created_at = select(MessageModel.created_at).where(MessageModel.id == after_id).scalar_subquery()
+            query = query.where(key > tuple_(after_created_at, after_id))
+
+        limit = bindparam("limit", type_=Integer)
+        if after and not before:
+            return query.order_by(MessageModel.created_at.asc(), MessageModel.id.asc()).limit(limit)
+
+        return query.order_by(MessageModel.created_at.desc(), MessageModel.id.desc()).limit(limit)
+
+    @classmethod
+    def chat_history_query(
+        cls,
+        user_id: UserIdT,
+        chat_id: ChatIdT | None,
+        limit: int,
+        before_id: MessageIdT | None = None,
+        after_id: MessageIdT | None = None,
+    ) -> tuple[Select[tuple[MessageModel]], dict[str, t.Any]]:
+        """Запрос chat_history_statement() и его параметры."""
+        statement = cls.chat_history_statement(bool(chat_id), before_id is not None, after_id is not None)
+        params = {"chat_id": chat_id} if chat_id else {"user_id": user_id}
+        params["limit"] = limit
+        if before_id is not None:
+            params["before_id"] = before_id
+        if after_id is not None:
+            params["after_id"] = after_id
+
+        return statement, params
+
+    @staticmethod
+    def _chronological(
+        messages: t.Sequence[MessageModel], before_id: MessageIdT | None, after_id: MessageIdT | None
+    ) -> list[MessageModel]:
+        """Возвращает результат chat_history_query() от старых к новым."""
+        if after_id is not None and before_id is None:
+            return list(messages)
+
+        return list(reversed(messages))
 
     @classmethod
-    def get_chat_history(cls, user_id: UserIdT, chat_id: ChatIdT | None = None, limit: int = 10) -> list[MessageModel]:
-        """Получить историю чата пользователя."""
+    def get_chat_history(
+        cls,
+        user_id: UserIdT,
+        chat_id: ChatIdT | None = None,
+        limit: int = 10,
+        before_id: MessageIdT | None = None,
+        after_id: MessageIdT | None = None,
+    ) -> list[MessageModel]:
+        """
+        Получить историю чата пользователя: последние limit сообщений от старых к новым.
+        before_id/after_id - вернуть сообщения до/после сообщения с этим ID.
+        """
+        query, params = cls.chat_history_query(user_id, chat_id, limit, before_id, after_id)
         with cls.get_session() as session:
-            query = select(MessageModel)
+            return cls._chronological(session.scalars(query, params).all(), before_id, after_id)
 
-            # Фильтруем по чату или по пользователю
-            if chat_id:
-                query = query.where(MessageModel.chat_id == chat_id)
-            else:
-                query = query.where(MessageModel.user_id == user_id)
+    @classmethod
+    async def aget_chat_history(
+        cls,
+        user_id: UserIdT,
+        chat_id: ChatIdT | None = None,
+        limit: int = 10,
+        before_id: MessageIdT | None = None,
+        after_id: MessageIdT | None = None,
+    ) -> list[MessageModel]:
+        """Асинхронный get_chat_history()."""
+        query, params = cls.chat_history_query(user_id, chat_id, limit, before_id, after_id)
+        async with cls.get_asession() as session:
+            return cls._chronological((await session.scalars(query, params)).all(), before_id, after_id)
+
+    @classmethod
+    async def aget_chat_window(cls, user_id: UserIdT, chat_id: ChatIdT) -> list[MessageModel]:
+        """
+        Последние HISTORY_WINDOW сообщений чата от старых к новым для запроса к LLM.
+        Читаются из window_cache, при промахе из Postgres с заполнением кеша.
+        """
+        messages = await cls.window_cache.get(chat_id)
+        if messages is None:
+            version = await cls.window_cache.version(chat_id)
+            messages = await cls.aget_chat_history(user_id, chat_id, limit=Settings().HISTORY_WINDOW)
+            if version is not None:
+                await cls.window_cache.save(chat_id, messages, version)
+
+        return messages
+
+    # Вопрос и ответ вставляются ORM bulk insert: строки передаются параметрами запроса,
+    # драйвер отправляет их одним multi-row INSERT ... RETURNING (insertmanyvalues).
+    turn_insert: t.ClassVar[ReturningInsert[tuple[MessageModel]]] = insert(MessageModel).returning(MessageModel)
+
+    @staticmethod
+    def turn_rows(
+        user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, answer: AnswerT | None
+    ) -> list[dict[str, t.Any]]:
+        """Строки вопроса и ответа (если есть) одного хода диалога для turn_insert."""
+        rows = [{"user_id": user_id, "chat_id": chat_id, "content": question, "message_type": MessageTypeEnum.USER}]
+        if answer is not None:
+            rows.append({"user_id": user_id, "chat_id": chat_id, "content": answer, "message_type": MessageTypeEnum.AI})
+
+        return rows
+
+    @classmethod
+    def save_turn(
+        cls, user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, answer: AnswerT | None
+    ) -> list[MessageModel]:
+        """
+        Сохранить вопрос и ответ одним запросом в текущей транзакции, без SAVEPOINT на каждое сообщение.
+        Окно чата в window_cache удаляется, синхронный код не дописывает его.
+
+        Returns:
+            Сохраненные сообщения от старых к новым.
+        """
+        with cls.get_current_transaction() as session:
+            messages = session.scalars(cls.turn_insert, cls.turn_rows(user_id, chat_id, question, answer)).all()
 
-            query = query.order_by(MessageModel.created_at.asc()).limit(limit)
-            return list(session.scalars(query).all())
+        cls.window_cache.invalidate(chat_id)
+        return sorted(messages, key=attrgetter("id"))
+
+    @classmethod
+    async def asave_turn(
+        cls, user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, answer: AnswerT | None
+    ) -> list[MessageModel]:
+        """Асинхронный save_turn(), дописывает сообщения в window_cache."""
+        async with cls.get_current_atransaction() as session:
+            rows = cls.turn_rows(user_id, chat_id, question, answer)
+            messages = (await session.scalars(cls.turn_insert, rows)).all()
+            messages = sorted(messages, key=attrgetter("id"))
+
+        await cls.window_cache.append(*messages)
+        return messages
+
+    @classmethod
+    def bulk_insert(
+        cls,
+        rows: t.Iterable[RowT],
+        columns: t.Sequence[str] | None = None,
+        on_progress: ProgressCallbackT | None = None,
+    ) -> int:
+        """ORMModelRepository.bulk_insert(), окна загруженных чатов в window_cache удаляются."""
+        chat_ids: set[ChatIdT] = set()
+
+        def collect_chat_ids(rows: t.Iterable[RowT]) -> t.Iterator[RowT]:
+            for row in rows:
+                if (chat_id := row.get("chat_id")) is not None:
+                    chat_ids.add(chat_id)
+                yield row
+
+        count = super().bulk_insert(collect_chat_ids(rows), columns, on_progress)
+        cls.window_cache.invalidate(*chat_ids)
+        return count
 
     @classmethod
     def save_user_message(cls, user_id: UserIdT, chat_id: ChatIdT, content: QuestionT) -> MessageModel:
-        """Сохранить сообщение пользователя."""
-        return cls.create(
+        """Сохранить сообщение пользователя, окно чата в window_cache удаляется."""
+        message = cls.create(
             user_id=user_id,
             chat_id=chat_id,
             content=content,
             message_type=MessageTypeEnum.USER,
         )
+        cls.window_cache.invalidate(chat_id)
+        return message
+
+    @classmethod
+    async def asave_user_message(cls, user_id: UserIdT, chat_id: ChatIdT, content: QuestionT) -> MessageModel:
+        """Асинхронный save_user_message(), дописывает сообщение в window_cache."""
+        message = await cls.acreate(
+            user_id=user_id,
+            chat_id=chat_id,
+            content=content,
+            message_type=MessageTypeEnum.USER,
+        )
+        await cls.window_cache.append(message)
+        return message
 
     @classmethod
     def save_ai_message(cls, user_id: UserIdT, chat_id: ChatIdT, content: AnswerT) -> MessageModel:
-        """Сохранить сообщение AI."""
-        return cls.create(
+        """Сохранить сообщение AI, окно чата в window_cache удаляется."""
+        message = cls.create(
+            user_id=user_id,
+            chat_id=chat_id,
+            content=content,
+            message_type=MessageTypeEnum.AI,
+        )
+        cls.window_cache.invalidate(chat_id)
+        return message
+
+    @classmethod
+    async def asave_ai_message(cls, user_id: UserIdT, chat_id: ChatIdT, content: AnswerT) -> MessageModel:
+        """Асинхронный save_ai_message(), дописывает сообщение в window_cache."""
+        message = await cls.acreate(
             user_id=user_id,
             chat_id=chat_id,
             content=content,
             message_type=MessageTypeEnum.AI,
         )
+        await cls.window_cache.append(message)
+        return message
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 
-from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT
+from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT, MessageIdT
 
 
 class CreateChatBodySchema(BaseModel):
@@ -31,12 +31,20 @@ class ChatHistoryBodySchema(BaseModel):
     user_id: UserIdT
     chat_id: ChatIdT | None = Field(default=None, description="ID чата (опционально)")
     limit: int = 20
+    before_id: MessageIdT | None = Field(
+        default=None, description="Вернуть сообщения до сообщения с этим ID (question_id первого элемента)"
+    )
+    after_id: MessageIdT | None = Field(
+        default=None, description="Вернуть сообщения после сообщения с этим ID (answer_id последнего элемента)"
+    )
 
 
 class ChatHistoryItemSchema(BaseModel):
     """Схема для элемента истории чата."""
 
+    question_id: MessageIdT
     question: QuestionT
+    answer_id: MessageIdT
     answer: AnswerT
 
 
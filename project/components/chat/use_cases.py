@@ -1,8 +1,9 @@
+import asyncio
 import typing as t
 
 from project.components.chat.enums import MessageTypeEnum
 from project.components.user.schemas import UserCacheSchema
-from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT
+from project.datatypes import UserIdT, QuestionT, AnswerT, ChatIdT, MessageIdT
 from project.settings import Settings
 
 if t.TYPE_CHECKING:
@@ -45,12 +46,12 @@ class Chat:
     def ask(self, user_id: UserIdT, question: QuestionT, chat_id: ChatIdT | None = None) -> AnswerT:
         """
         Задать вопрос в чат. Вернет текст ответа от AI.
+        Соединение с БД не удерживается на время ответа AI: чат и история читаются в одной короткой транзакции,
+        вопрос с ответом сохраняются в другой.
         """
         with self.repo.transaction():
             if chat_id is None:
-                chat_id = self.get_active_chat(user_id)
-
-            self.repo.message.save_user_message(user_id, chat_id, question)
+                chat_id = self.repo.chat.get_or_create_active_chat(user_id).id
 
             history_messages = self.repo.message.get_chat_history(
                 user_id=user_id,
@@ -58,34 +59,102 @@ class Chat:
                 limit=Settings().HISTORY_WINDOW,
             )
 
-            answer_text = self.chat_agent.generate_answer(user_id, chat_id, question, history_messages)
+        answer_text = self.chat_agent.generate_answer(user_id, chat_id, question, history_messages)
 
-            self.repo.message.save_ai_message(user_id, chat_id, answer_text)
+        with self.repo.transaction():
+            # Вопрос и ответ сохраняются одним запросом: ход диалога сохраняется целиком или не сохраняется.
+            self.repo.message.save_turn(user_id, chat_id, question, answer_text)
 
             self.repo.user_cache.save(user_id, UserCacheSchema(user_id=user_id))
 
-            return answer_text
+        return answer_text
+
+    async def aask(self, user_id: UserIdT, question: QuestionT, chat_id: ChatIdT | None = None) -> AnswerT:
+        """
+        Асинхронный ask(), не занимает поток и соединение с БД на время ответа AI.
+        """
+        async with self.repo.atransaction():
+            if chat_id is None:
+                chat = await self.repo.chat.aget_or_create_active_chat(user_id)
+                chat_id = chat.id
+
+            history_messages = await self.repo.message.aget_chat_window(user_id, chat_id)
+
+        answer_text = await self.chat_agent.agenerate_answer(user_id, chat_id, question, history_messages)
+
+        await self._asave_turn(user_id, chat_id, question, answer_text)
+
+        return answer_text
+
+    async def aask_stream(
+        self, user_id: UserIdT, question: QuestionT, chat_id: ChatIdT | None = None
+    ) -> t.AsyncIterator[AnswerT]:
+        """
+        Потоковый aask(): отдает части ответа AI по мере генерации.
+        Вопрос и ответ сохраняются после завершения потока, если поток прерван (например, клиент отключился),
+        сохраняется полученная часть ответа, если ответа нет - только вопрос.
+        """
+        async with self.repo.atransaction():
+            if chat_id is None:
+                chat = await self.repo.chat.aget_or_create_active_chat(user_id)
+                chat_id = chat.id
+
+            history_messages = await self.repo.message.aget_chat_window(user_id, chat_id)
+
+        parts = []
+        try:
+            async for part in self.chat_agent.astream_answer(user_id, chat_id, question, history_messages):
+                parts.append(part)
+                yield AnswerT(part)
+        finally:
+            answer_text = AnswerT("".join(parts)) if parts else None
+            # Защита от отмены, чтобы ответ сохранился и при отключении клиента.
+            await asyncio.shield(self._asave_turn(user_id, chat_id, question, answer_text))
+
+    async def _asave_turn(
+        self, user_id: UserIdT, chat_id: ChatIdT, question: QuestionT, answer_text: AnswerT | None
+    ) -> None:
+        # Вопрос и ответ сохраняются одним запросом: ход диалога сохраняется целиком или не сохраняется.
+        async with self.repo.atransaction():
+            await self.repo.message.asave_turn(user_id, chat_id, question, answer_text)
+            await self.repo.user_cache.save(user_id, UserCacheSchema(user_id=user_id))
 
     def get_history(
-        self, user_id: UserIdT, chat_id: ChatIdT | None = None, limit: int = 20
-    ) -> list[dict[str, QuestionT | AnswerT]]:
+        self,
+        user_id: UserIdT,
+        chat_id: ChatIdT | None = None,
+        limit: int = 20,
+        before_id: MessageIdT | None = None,
+        after_id: MessageIdT | None = None,
+    ) -> list[dict[str, MessageIdT | QuestionT | AnswerT]]:
         """
-        Получить историю чата пользователя. Вернет список словарей с вопросами и ответами
+        Получить историю чата пользователя: последние limit сообщений,
+        before_id/after_id - страница до/после сообщения с этим ID.
+        Вернет список словарей с вопросами и ответами и их ID для следующей страницы.
         """
         messages = self.repo.message.get_chat_history(
             user_id=user_id,
             chat_id=chat_id,
             limit=limit,
+            before_id=before_id,
+            after_id=after_id,
         )
 
         history = []
-        temp_question = None
+        question = None
 
         for msg in messages:
             if msg.message_type == MessageTypeEnum.USER:
-                temp_question = QuestionT(msg.content)
-            elif msg.message_type == MessageTypeEnum.AI and temp_question is not None:
-                history.append({"question": temp_question, "answer": AnswerT(msg.content)})
-                temp_question = None
+                question = msg
+            elif msg.message_type == MessageTypeEnum.AI and question is not None:
+                history.append(
+                    {
+                        "question_id": question.id,
+                        "question": QuestionT(question.content),
+                        "answer_id": msg.id,
+                        "answer": AnswerT(msg.content),
+                    }
+                )
+                question = None
 
         return history
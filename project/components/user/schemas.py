@@ -1,9 +1,14 @@
 import logging
+import typing as t
 
-from pydantic import BaseModel
+from pydantic import BaseModel, RootModel
 
 logger = logging.getLogger(__name__)
 
 
 class UserCacheSchema(BaseModel):
     user_id: int
+
+
+class UsersDataSchema(RootModel[dict[int, dict[str, t.Any]]]):
+    """Ответ api/users_data сервиса авторизации: данные авторизованных пользователей по Telegram id."""
@@ -1,4 +1,4 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 import typing as t
 
 from project.components.chat.ai.agent import ChatAgent
@@ -6,11 +6,16 @@ from project.components.chat.repositories import ChatRepository, MessageReposito
 from project.components.chat.use_cases import Chat
 from project.components.user.repositories import UserRepository, UserCacheRepository
 from project.components.user.service import QuotaService
+from project.infrastructure.adapters.acache import fail_safe_redis_atransaction
+from project.infrastructure.adapters.cache import fail_safe_redis_transaction
+from project.infrastructure.adapters.adatabase import atransaction, current_atransaction
 from project.infrastructure.adapters.database import transaction, current_transaction
 from project.infrastructure.adapters.llm import llm_chat_client
+from project.infrastructure.utils.base_client import AsyncApi, SyncApi
 from project.libs.structures import LazyInit
 
 if t.TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import Session as ORMSession
 
 
@@ -24,7 +29,11 @@ class AllRepositories:
     @classmethod
     @contextmanager
     def transaction(cls) -> t.Generator["ORMSession", t.Any, None]:
-        with transaction() as session:  # di: skip
+        """
+        Транзакция БД и Redis: команды Redis (кеши репозиториев) выполняются после коммита в БД
+        и не выполняются, если транзакция БД откатилась. Ошибка Redis после коммита пишется в лог.
+        """
+        with fail_safe_redis_transaction(), transaction() as session:  # di: skip
             yield session
 
     @classmethod
@@ -33,6 +42,21 @@ class AllRepositories:
         with current_transaction() as session:  # di: skip
             yield session
 
+    @classmethod
+    @asynccontextmanager
+    async def atransaction(cls) -> t.AsyncGenerator["AsyncSession", None]:
+        """
+        Асинхронный transaction().
+        """
+        async with fail_safe_redis_atransaction(), atransaction() as session:  # di: skip
+            yield session
+
+    @classmethod
+    @asynccontextmanager
+    async def current_atransaction(cls) -> t.AsyncGenerator["AsyncSession", None]:
+        async with current_atransaction() as session:  # di: skip
+            yield session
+
 
 Repositories = LazyInit(AllRepositories)
 
@@ -60,3 +84,12 @@ class DIContainer:
 
 
 Container = LazyInit(DIContainer)
+
+
+async def aclose_resources(async_api: type[AsyncApi] = AsyncApi, sync_api: type[SyncApi] = SyncApi) -> None:
+    """
+    Releases long-lived infrastructure resources (connection pools).
+    Called on application shutdown.
+    """
+    await async_api.close_pooled_sessions()
+    sync_api.close_pooled_clients()
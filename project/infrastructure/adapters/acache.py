@@ -1,4 +1,5 @@
 import contextvars
+import logging
 from contextlib import asynccontextmanager
 from functools import cache
 from typing import Any, AsyncGenerator
@@ -8,6 +9,8 @@ from redis.asyncio.client import Pipeline
 
 from project.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 redis_async_transactions: contextvars.ContextVar[Pipeline | None] = contextvars.ContextVar(
     "current_transaction",
     default=None,
@@ -59,3 +62,20 @@ async def redis_atransaction() -> AsyncGenerator[Pipeline, Any]:
 
             finally:
                 redis_async_transactions.reset(token)
+
+
+@asynccontextmanager
+async def fail_safe_redis_atransaction() -> AsyncGenerator[Pipeline, Any]:
+    """
+    Works as redis_atransaction(), but errors of the commands executed on exit are logged instead of raised.
+    Used for cache commands after a database commit: the data is already saved, caches expire by their ttl.
+    """
+    completed = False
+    try:
+        async with redis_atransaction() as pipe:
+            yield pipe
+            completed = True
+    except redis.RedisError as exc:
+        if not completed:
+            raise
+        logger.warning("Redis transaction error: %s", exc)
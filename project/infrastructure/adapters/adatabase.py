@@ -2,6 +2,7 @@ import contextvars
 from contextlib import asynccontextmanager
 from functools import lru_cache
 
+from sqlalchemy import AsyncAdaptedQueuePool, make_url
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
@@ -9,17 +10,75 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 
+from project.infrastructure.adapters.database import (
+    InstrumentedQueuePool,
+    instrument_pool,
+    instrument_queries,
+    is_primary_pinned,
+    pool_settings,
+    prepared_statements_args,
+    select_replica,
+)
 from project.settings import Settings
 
 asession_storage: contextvars.ContextVar[AsyncSession | None] = contextvars.ContextVar("current_session", default=None)
+areplica_session_storage: contextvars.ContextVar[AsyncSession | None] = contextvars.ContextVar(
+    "current_replica_session", default=None
+)
+
+
+class AsyncInstrumentedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool с метриками ожидания свободного соединения."""
+
+    pool_name = "async"
+
+
+def async_dsn(dsn: str) -> str:
+    """
+    DSN for the async engine. A sync driver (psycopg2 or no driver) is replaced with asyncpg,
+    so SQLALCHEMY_DATABASE_DSN and SQLALCHEMY_REPLICA_DSNS serve both engines.
+    The async drivers asyncpg and psycopg (3) are kept.
+    """
+    url = make_url(dsn)
+    if url.get_driver_name() in ("asyncpg", "psycopg"):
+        return dsn
+
+    return url.set(drivername=f"{url.get_backend_name()}+asyncpg").render_as_string(hide_password=False)
 
 
 @lru_cache
 def aengine_factory() -> AsyncEngine:
-    return create_async_engine(
-        str(Settings().SQLALCHEMY_DATABASE_DSN),
-        pool_pre_ping=Settings().DATABASE_PRE_PING,
+    dsn = async_dsn(str(Settings().SQLALCHEMY_DATABASE_DSN))
+    engine = create_async_engine(
+        dsn,
+        poolclass=AsyncInstrumentedQueuePool,
+        connect_args=prepared_statements_args(dsn),
+        **pool_settings(),
     )
+    instrument_pool(engine.sync_engine, "async")
+    instrument_queries(engine.sync_engine, "async")
+    return engine
+
+
+class AsyncReplicaQueuePool(AsyncInstrumentedQueuePool):
+    pool_name = "async_replica"
+
+
+@lru_cache
+def areplica_engines_factory() -> tuple[AsyncEngine, ...]:
+    engines = []
+    for replica_dsn in Settings().SQLALCHEMY_REPLICA_DSNS:
+        dsn = async_dsn(str(replica_dsn))
+        engine = create_async_engine(
+            dsn,
+            poolclass=AsyncReplicaQueuePool,
+            connect_args=prepared_statements_args(dsn),
+            **pool_settings(),
+        )
+        instrument_pool(engine.sync_engine, AsyncReplicaQueuePool.pool_name)
+        instrument_queries(engine.sync_engine, AsyncReplicaQueuePool.pool_name)
+        engines.append(engine)
+    return tuple(engines)
 
 
 @lru_cache
@@ -27,6 +86,11 @@ def async_sessionmaker_factory():
     return async_sessionmaker(aengine_factory(), autoflush=False, expire_on_commit=False)
 
 
+@lru_cache
+def areplica_sessionmaker_factory():
+    return async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
 @asynccontextmanager
 async def asession():
     """
@@ -85,3 +149,29 @@ async def current_atransaction():
     else:
         async with asession() as session, session.begin():
             yield session
+
+
+@asynccontextmanager
+async def aread_session():
+    """
+    Session for reads. Goes to a replica of SQLALCHEMY_REPLICA_DSNS,
+    if no session (transaction) is open and nothing was committed in the current context (request)
+    during DATABASE_REPLICA_PRIMARY_PIN seconds, otherwise works as asession().
+    Nested calls reuse the replica session.
+    """
+    engines = areplica_engines_factory()
+
+    if not engines or asession_storage.get() or is_primary_pinned():
+        async with asession() as session:
+            yield session
+    elif current_session := areplica_session_storage.get():
+        yield current_session
+    else:
+        engine = engines[select_replica([engine.sync_engine.pool for engine in engines])]
+
+        async with areplica_sessionmaker_factory()(bind=engine) as session:
+            token = areplica_session_storage.set(session)
+            try:
+                yield session
+            finally:
+                areplica_session_storage.reset(token)
@@ -1,9 +1,25 @@
+import itertools
+import logging
+import typing as t
+from datetime import timedelta
 from functools import cache
 
+import redis
+
+from project.components.user.schemas import UsersDataSchema
+from project.infrastructure.adapters.acache import redis_client
+from project.infrastructure.adapters.redis_rate_limit import RedisTokenBucket
 from project.infrastructure.utils.base_client import IClient, AsyncApi
 from project.exceptions import ExternalApiError, ServerError, ClientError
+from project.libs.circuit_breaker import CircuitBreaker
+from project.libs.hedging import Hedger
+from project.libs.rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+from project.libs.retry import RetryPolicy
+from project.libs.ttl_cache import CachePolicy, TTLCache
 from project.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 
 class AuthApiError(ExternalApiError):
     pass
@@ -17,6 +33,96 @@ class AuthClientError(ClientError):
     pass
 
 
+class AuthorizationCache:
+    """
+    Cache of authorization decisions of Telegram users.
+    Level 1 is in-process with a short TTL, level 2 is Redis shared between processes.
+    Redis errors are logged and treated as a cache miss.
+    """
+
+    TTLCache = TTLCache
+    redis_client = staticmethod(redis_client)
+    key_template = "auth:telegram_user:{}"
+    redis_batch_size = 1000
+
+    def __init__(
+        self,
+        ttl: timedelta,
+        negative_ttl: timedelta,
+        local_ttl: timedelta,
+        max_entries: int = 100_000,
+    ):
+        """
+        Args:
+            ttl: Time to live of "authorized" decisions.
+            negative_ttl: Time to live of "not authorized" decisions.
+            local_ttl: Max time to live in the process, bounds staleness after invalidation in other processes.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local_ttl = local_ttl
+        self.local = self.TTLCache(max_entries)
+
+    async def get(self, telegram_user_id: int) -> bool | None:
+        decision = self.local.get(telegram_user_id)
+        if decision is not None:
+            return decision
+
+        key = self.key_template.format(telegram_user_id)
+        try:
+            async with self.redis_client().pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                content, pttl = await pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning("Authorization cache error: %s", exc)
+            return None
+
+        if content is None:
+            return None
+
+        decision = content == b"1"
+        if pttl > 0:
+            self.local.set(telegram_user_id, decision, min(pttl / 1000, self.local_ttl.total_seconds()))
+
+        return decision
+
+    async def set(self, telegram_user_id: int, decision: bool) -> None:
+        ttl = self.ttl if decision else self.negative_ttl
+        self.local.set(telegram_user_id, decision, min(ttl, self.local_ttl).total_seconds())
+
+        try:
+            await self.redis_client().set(
+                self.key_template.format(telegram_user_id), b"1" if decision else b"0", ex=ttl
+            )
+        except redis.RedisError as exc:
+            logger.warning("Authorization cache error: %s", exc)
+
+    async def set_many(self, telegram_user_ids: t.Collection[int], decision: bool) -> None:
+        """Same decision for many users, written to Redis by pipelines of redis_batch_size keys."""
+        ttl = self.ttl if decision else self.negative_ttl
+        local_ttl = min(ttl, self.local_ttl).total_seconds()
+        for telegram_user_id in telegram_user_ids:
+            self.local.set(telegram_user_id, decision, local_ttl)
+
+        try:
+            for batch in itertools.batched(telegram_user_ids, self.redis_batch_size):
+                async with self.redis_client().pipeline(transaction=False) as pipe:
+                    for telegram_user_id in batch:
+                        pipe.set(self.key_template.format(telegram_user_id), b"1" if decision else b"0", ex=ttl)
+                    await pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning("Authorization cache error: %s", exc)
+
+    async def invalidate(self, telegram_user_id: int) -> None:
+        """Other processes will see the change after local_ttl."""
+        self.local.delete(telegram_user_id)
+        try:
+            await self.redis_client().delete(self.key_template.format(telegram_user_id))
+        except redis.RedisError as exc:
+            logger.warning("Authorization cache error: %s", exc)
+
+
 class AuthClient(IClient):
     class Api(AsyncApi):
         ApiError = AuthApiError
@@ -24,20 +130,131 @@ class AuthClient(IClient):
         ClientError = AuthClientError
         name_for_monitoring = "auth_api"
 
+    AuthorizationCache = AuthorizationCache
+    CachePolicy = CachePolicy
+    TokenBucket = TokenBucket
+    RedisTokenBucket = RedisTokenBucket
+    AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter
+    CircuitBreaker = CircuitBreaker
+    RetryPolicy = RetryPolicy
+    Hedger = Hedger
+
     def __init__(self):
         self.api_root = Settings().BOT_AUTH_SERVICE_URL
-        self.api = self.Api(self.api_root, name_for_monitoring="auth_api", request_settings={"timeout": 10})
+        self.api = self.Api(
+            self.api_root,
+            name_for_monitoring="auth_api",
+            request_settings={"timeout": 10},
+            pooled=True,
+            singleflight=True,
+            cache_policies={
+                "api/users_data": self.CachePolicy(ttl=timedelta(minutes=5), redis=True),
+            },
+            connector_settings={
+                "limit": Settings().HTTP_POOL_LIMIT,
+                "limit_per_host": Settings().HTTP_POOL_LIMIT_PER_HOST,
+                "keepalive_timeout": Settings().HTTP_POOL_KEEPALIVE_TIMEOUT,
+                "ttl_dns_cache": Settings().HTTP_POOL_DNS_CACHE_TTL,
+            },
+            rate_limiter=self.create_rate_limiter(),
+            concurrency_limiter=self.create_concurrency_limiter(),
+            circuit_breaker=self.create_circuit_breaker(),
+            retry_policy=self.create_retry_policy(),
+        )
+        self.authorization_cache = self.AuthorizationCache(
+            ttl=timedelta(seconds=Settings().AUTH_CACHE_TTL),
+            negative_ttl=timedelta(seconds=Settings().AUTH_CACHE_NEGATIVE_TTL),
+            local_ttl=timedelta(seconds=Settings().AUTH_CACHE_LOCAL_TTL),
+        )
+        self.check_hedger = self.create_check_hedger()
+
+    @classmethod
+    def create_rate_limiter(cls) -> TokenBucket | RedisTokenBucket | None:
+        if not Settings().AUTH_API_RATE_LIMIT:
+            return None
+
+        if Settings().AUTH_API_RATE_LIMIT_SHARED:
+            return cls.RedisTokenBucket("auth_api", Settings().AUTH_API_RATE_LIMIT, Settings().AUTH_API_RATE_BURST)
+
+        return cls.TokenBucket(Settings().AUTH_API_RATE_LIMIT, Settings().AUTH_API_RATE_BURST)
+
+    @classmethod
+    def create_concurrency_limiter(cls) -> AdaptiveConcurrencyLimiter | None:
+        if not Settings().AUTH_API_MAX_CONCURRENCY:
+            return None
+
+        max_limit = Settings().AUTH_API_MAX_CONCURRENCY
+        return cls.AdaptiveConcurrencyLimiter(initial_limit=max(1, max_limit // 2), max_limit=max_limit)
+
+    @classmethod
+    def create_circuit_breaker(cls) -> CircuitBreaker | None:
+        if not Settings().AUTH_API_CIRCUIT_FAILURE_THRESHOLD:
+            return None
+
+        return cls.CircuitBreaker(
+            "auth_api",
+            failure_threshold=Settings().AUTH_API_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=Settings().AUTH_API_CIRCUIT_RECOVERY_TIMEOUT,
+        )
+
+    @classmethod
+    def create_retry_policy(cls) -> RetryPolicy | None:
+        if Settings().AUTH_API_RETRY_MAX_ATTEMPTS <= 1:
+            return None
+
+        return cls.RetryPolicy(
+            max_attempts=Settings().AUTH_API_RETRY_MAX_ATTEMPTS,
+            jitter="full",
+            deadline=Settings().AUTH_API_RETRY_DEADLINE,
+            budget="auth_api",
+        )
+
+    @classmethod
+    def create_check_hedger(cls) -> Hedger | None:
+        if not Settings().AUTH_API_HEDGE_PERCENTILE:
+            return None
+
+        return cls.Hedger(percentile=Settings().AUTH_API_HEDGE_PERCENTILE, min_delay=0.01)
 
     async def check_telegram_user(self, telegram_user_id: int) -> bool:
         result = await self.api.call_endpoint(
             f"api/check/{telegram_user_id}",
             resource_for_monitoring="api/check/{telegram_user_id}",
+            hedger=self.check_hedger,
         )
         return result["exists"]
 
     async def get_users_data(self) -> dict:
         return await self.api.call_endpoint("api/users_data")
 
+    async def is_authorized(self, telegram_user_id: int) -> bool:
+        """Cached check_telegram_user."""
+        decision = await self.authorization_cache.get(telegram_user_id)
+        if decision is None:
+            decision = await self.check_telegram_user(telegram_user_id)
+            await self.authorization_cache.set(telegram_user_id, decision)
+
+        return decision
+
+    async def invalidate_authorization(self, telegram_user_id: int) -> None:
+        await self.authorization_cache.invalidate(telegram_user_id)
+
+    async def warm_up_authorization(self) -> int:
+        """
+        Preloads "authorized" decisions of all users of get_users_data() into the cache.
+        Users missing from the response are checked on their first is_authorized().
+
+        Returns:
+            Number of preloaded users.
+
+        Raises:
+            pydantic.ValidationError: The response does not match UsersDataSchema.
+        """
+        users = UsersDataSchema.model_validate(await self.get_users_data())
+        await self.authorization_cache.set_many(users.root, decision=True)
+        logger.info("Authorization cache is warmed up: %s users", len(users.root))
+        return len(users.root)
+
 
 @cache
 def auth_client():
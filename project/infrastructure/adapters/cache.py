@@ -1,4 +1,5 @@
 import contextvars
+import logging
 from contextlib import contextmanager
 from functools import cache
 from typing import Any, Generator
@@ -8,6 +9,8 @@ from redis.client import Pipeline
 
 from project.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 redis_transactions: contextvars.ContextVar[Pipeline | None] = contextvars.ContextVar(
     "current_transaction",
     default=None,
@@ -59,3 +62,20 @@ def redis_transaction() -> Generator[Pipeline, Any, None]:
 
             finally:
                 redis_transactions.reset(token)
+
+
+@contextmanager
+def fail_safe_redis_transaction() -> Generator[Pipeline, Any, None]:
+    """
+    Works as redis_transaction(), but errors of the commands executed on exit are logged instead of raised.
+    Used for cache commands after a database commit: the data is already saved, caches expire by their ttl.
+    """
+    completed = False
+    try:
+        with redis_transaction() as pipe:
+            yield pipe
+            completed = True
+    except redis.RedisError as exc:
+        if not completed:
+            raise
+        logger.warning("Redis transaction error: %s", exc)
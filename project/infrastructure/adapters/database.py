@@ -1,23 +1,223 @@
 import contextvars
+import inspect
+import itertools
+import logging
+import time
 from contextlib import contextmanager
-from functools import lru_cache
+from functools import lru_cache, wraps
 import typing as t
 
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.orm import sessionmaker, Session as ORMSession, scoped_session
+from llm_common.prometheus import is_build_metrics
+from sqlalchemy import Engine, QueuePool, create_engine, event, exc, make_url
+from sqlalchemy.pool import Pool, PoolProxiedConnection
+from sqlalchemy.orm import ORMExecuteState, SessionTransaction, sessionmaker, Session as ORMSession, scoped_session
 
 from project.components.base.models import public_schema
+from project.libs import metrics
+from project.libs.query_stats import fingerprint, query_hash, record_query
 from project.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 session_storage: contextvars.ContextVar[ORMSession | None] = contextvars.ContextVar("current_session", default=None)
+replica_session_storage: contextvars.ContextVar[ORMSession | None] = contextvars.ContextVar(
+    "current_replica_session", default=None
+)
+# Время последнего коммита в текущем контексте (запросе), после него чтения идут в primary.
+last_commit_at: contextvars.ContextVar[float | None] = contextvars.ContextVar("last_commit_at", default=None)
+# Выполняемый метод репозитория, например MessageRepository.get_chat_history, для лога медленных запросов.
+repository_method_storage: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "repository_method", default=None
+)
+replica_counter = itertools.count()
 
 
 @lru_cache
 def engine_factory() -> Engine:
-    return create_engine(
+    engine = create_engine(
         str(Settings().SQLALCHEMY_DATABASE_DSN),
-        pool_pre_ping=Settings().DATABASE_PRE_PING,
+        poolclass=InstrumentedQueuePool,
+        connect_args=prepared_statements_args(str(Settings().SQLALCHEMY_DATABASE_DSN)),
+        **pool_settings(),
     )
+    instrument_pool(engine, "sync")
+    instrument_queries(engine, "sync")
+    return engine
+
+
+def pool_settings() -> dict[str, t.Any]:
+    """Настройки пула соединений, общие для синхронного и асинхронного движков."""
+    return {
+        "pool_pre_ping": Settings().DATABASE_PRE_PING,
+        "pool_size": Settings().DATABASE_POOL_SIZE,
+        "max_overflow": Settings().DATABASE_MAX_OVERFLOW,
+        "pool_recycle": Settings().DATABASE_POOL_RECYCLE,
+        "pool_timeout": Settings().DATABASE_POOL_TIMEOUT,
+        "pool_use_lifo": Settings().DATABASE_POOL_USE_LIFO,
+    }
+
+
+@lru_cache
+def replica_engines_factory() -> tuple[Engine, ...]:
+    engines = []
+    for dsn in Settings().SQLALCHEMY_REPLICA_DSNS:
+        engine = create_engine(
+            str(dsn),
+            poolclass=ReplicaQueuePool,
+            connect_args=prepared_statements_args(str(dsn)),
+            **pool_settings(),
+        )
+        instrument_pool(engine, ReplicaQueuePool.pool_name)
+        instrument_queries(engine, ReplicaQueuePool.pool_name)
+        engines.append(engine)
+    return tuple(engines)
+
+
+def prepared_statements_args(dsn: str) -> dict[str, t.Any]:
+    """
+    Server-side prepared statements of the driver: PostgreSQL parses and plans a statement once per connection.
+    asyncpg prepares every statement and keeps DATABASE_PREPARED_STATEMENT_CACHE_SIZE of them per connection,
+    psycopg (3) prepares a statement after 5 executions, psycopg2 does not support them.
+    0 disables them, it is required behind PgBouncer in transaction mode.
+    """
+    driver = make_url(dsn).get_driver_name()
+    cache_size = Settings().DATABASE_PREPARED_STATEMENT_CACHE_SIZE
+
+    if driver == "asyncpg":
+        return {"prepared_statement_cache_size": cache_size}
+    if driver == "psycopg" and not cache_size:
+        return {"prepare_threshold": None}
+
+    return {}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool с метриками получения соединения: genapp_db_pool_checkout_wait_sec
+    и genapp_db_pool_checkout_timeouts_total (пул исчерпан дольше pool_timeout).
+    В SQLAlchemy нет события начала ожидания, поэтому измеряется публичный Pool.connect():
+    ожидание свободного соединения, открытие нового соединения и pre-ping.
+    """
+
+    pool_name = "sync"
+
+    def connect(self) -> PoolProxiedConnection:
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if is_build_metrics():
+                metrics.DB_POOL_CHECKOUT_TIMEOUTS.labels(pool=self.pool_name).inc()
+            raise
+        finally:
+            if is_build_metrics():
+                metrics.DB_POOL_CHECKOUT_WAIT.labels(pool=self.pool_name).observe(time.perf_counter() - start_time)
+
+
+class ReplicaQueuePool(InstrumentedQueuePool):
+    """Пул соединений реплик, метрики всех реплик процесса пишутся с pool="sync_replica"."""
+
+    pool_name = "sync_replica"
+
+
+def instrument_pool(engine: Engine, pool_name: str) -> None:
+    """
+    Метрики пула соединений: занятые соединения, соединения сверх pool_size (overflow),
+    время, на которое соединение берется из пула, и возраст выдаваемых соединений.
+    Долгое удержание соединения (например, на время ответа LLM) видно по genapp_db_connection_hold_sec.
+    """
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        if not is_build_metrics():
+            return
+
+        metrics.DB_CONNECTION_AGE.labels(pool=pool_name).observe(time.time() - connection_record.starttime)
+        if isinstance(engine.pool, QueuePool):
+            set_pool_metrics(engine.pool, pool_name, engine.pool.checkedout(), engine.pool.overflow())
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if not is_build_metrics():
+            return
+
+        if checked_out_at is not None:
+            metrics.DB_CONNECTION_HOLD.labels(pool=pool_name).observe(time.perf_counter() - checked_out_at)
+        if isinstance(pool := engine.pool, QueuePool):
+            # Событие вызывается до возврата соединения в пул,
+            # соединение сверх pool_size закрывается, если в пуле нет места.
+            overflow = pool.overflow() - (pool.checkedin() >= pool.size())
+            set_pool_metrics(pool, pool_name, pool.checkedout() - 1, overflow)
+
+
+def set_pool_metrics(pool: QueuePool, pool_name: str, checked_out: int, overflow: int) -> None:
+    metrics.DB_POOL_CHECKED_OUT.labels(pool=pool_name).set(max(checked_out, 0))
+    # До заполнения пула overflow() отрицательный: -pool_size + количество открытых соединений.
+    metrics.DB_POOL_OVERFLOW.labels(pool=pool_name).set(max(overflow, 0))
+
+
+def instrument_queries(engine: Engine, pool_name: str) -> None:
+    """
+    Время SQL запросов по хешу отпечатка запроса (без значений параметров): genapp_db_query_duration_sec.
+    Запросы медленнее DATABASE_SLOW_QUERY_SEC пишутся в лог с хешем, текстом и вызвавшим методом репозитория.
+    Порог читается один раз при установке обработчиков, отпечаток и хеш кешируются по тексту запроса.
+    Запросы считаются в открытых track_queries() (запрос FastAPI, обновление Telegram, тест).
+    """
+    slow_query_sec = Settings().DATABASE_SLOW_QUERY_SEC
+
+    @lru_cache(maxsize=4096)
+    def statement_fingerprint(statement: str) -> tuple[str, str]:
+        query = fingerprint(statement)
+        return query, query_hash(query)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - connection.info.pop("query_started_at")
+        query, hash_ = statement_fingerprint(statement)
+        record_query(query, duration)
+        if is_build_metrics():
+            metrics.DB_QUERY_DURATION.labels(pool=pool_name, query_hash=hash_).observe(duration)
+
+        if duration >= slow_query_sec > 0:
+            if is_build_metrics():
+                metrics.DB_SLOW_QUERIES.labels(pool=pool_name).inc()
+            caller = repository_method_storage.get() or "unknown"
+            logger.warning("Slow query %s %.3fs in %s: %s", hash_, duration, caller, query)
+
+
+def repository_method(func: t.Callable) -> t.Callable:
+    """
+    Оборачивает classmethod репозитория (функцию без classmethod): на время вызова имя метода
+    лежит в repository_method_storage и попадает в лог медленных запросов.
+    Вложенные вызовы восстанавливают имя внешнего метода.
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(cls: type, *args: t.Any, **kwargs: t.Any) -> t.Any:
+            token = repository_method_storage.set(f"{cls.__name__}.{func.__name__}")
+            try:
+                return await func(cls, *args, **kwargs)
+            finally:
+                repository_method_storage.reset(token)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(cls: type, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        token = repository_method_storage.set(f"{cls.__name__}.{func.__name__}")
+        try:
+            return func(cls, *args, **kwargs)
+        finally:
+            repository_method_storage.reset(token)
+
+    return wrapper
 
 
 @lru_cache
@@ -33,6 +233,11 @@ def scoped_session_factory() -> scoped_session:
     )
 
 
+@lru_cache
+def replica_sessionmaker_factory() -> sessionmaker:
+    return sessionmaker(autoflush=False, expire_on_commit=False, autobegin=True)
+
+
 @contextmanager
 def Session() -> t.Generator[ORMSession, t.Any, None]:  # noqa: N802
     """
@@ -83,15 +288,99 @@ def current_transaction() -> t.Generator[ORMSession, t.Any, None]:
     current_session = session_storage.get()
 
     if current_session:
-        nested = current_session.in_transaction()
-
-        with current_session.begin(nested):
+        if current_session.in_transaction():
             yield current_session
+        else:
+            with current_session.begin():
+                yield current_session
     else:
         with Session() as session, session.begin():
             yield session
 
 
+@contextmanager
+def read_session() -> t.Generator[ORMSession, t.Any, None]:
+    """
+    Session for reads. Goes to a replica of SQLALCHEMY_REPLICA_DSNS,
+    if no session (transaction) is open and nothing was committed in the current context (request)
+    during DATABASE_REPLICA_PRIMARY_PIN seconds, otherwise works as Session().
+    Nested calls reuse the replica session.
+    """
+    engines = replica_engines_factory()
+
+    if not engines or session_storage.get() or is_primary_pinned():
+        with Session() as session:
+            yield session
+    elif current_session := replica_session_storage.get():
+        yield current_session
+    else:
+        engine = engines[select_replica([engine.pool for engine in engines])]
+
+        with replica_sessionmaker_factory()(bind=engine) as session:
+            token = replica_session_storage.set(session)
+            try:
+                yield session
+            finally:
+                replica_session_storage.reset(token)
+
+
+def select_replica(pools: t.Sequence[Pool]) -> int:
+    """Index of the replica: in turn (round_robin) or with the fewest checked out connections (least_connections)."""
+    if Settings().DATABASE_REPLICA_SELECTION == "least_connections":
+        checked_out = [pool.checkedout() if isinstance(pool, QueuePool) else 0 for pool in pools]
+        return checked_out.index(min(checked_out))
+
+    return next(replica_counter) % len(pools)
+
+
+def pin_primary() -> None:
+    """
+    Read-your-writes: after a commit with writes, reads of the current context go to the primary,
+    until the replicas catch up (DATABASE_REPLICA_PRIMARY_PIN seconds).
+    The context is a request of FastAPI or an asyncio task.
+    """
+    last_commit_at.set(time.monotonic())
+
+
+def mark_writes(session: ORMSession) -> None:
+    """
+    The transaction of the session has writes, its commit pins reads to the primary.
+    ORM flushes and INSERT/UPDATE/DELETE statements are marked by session events,
+    writes bypassing the session (e.g. COPY through the DBAPI cursor) are marked explicitly.
+    """
+    session.info["has_writes"] = True
+
+
+@event.listens_for(ORMSession, "after_flush")
+def on_flush(session: ORMSession, flush_context) -> None:
+    mark_writes(session)
+
+
+@event.listens_for(ORMSession, "do_orm_execute")
+def on_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mark_writes(orm_execute_state.session)
+
+
+@event.listens_for(ORMSession, "after_commit")
+def on_commit(session: ORMSession) -> None:
+    # Событие вызывается и при RELEASE SAVEPOINT, реплика видит данные только после коммита всей транзакции.
+    if session.get_nested_transaction() is None and session.info.pop("has_writes", False):
+        pin_primary()
+
+
+@event.listens_for(ORMSession, "after_transaction_end")
+def on_transaction_end(session: ORMSession, transaction: SessionTransaction) -> None:
+    # Откат всей транзакции: записей нет. Откат SAVEPOINT отметку не снимает.
+    if transaction.parent is None:
+        session.info.pop("has_writes", None)
+
+
+def is_primary_pinned() -> bool:
+    committed_at = last_commit_at.get()
+    return committed_at is not None and time.monotonic() - committed_at < Settings().DATABASE_REPLICA_PRIMARY_PIN
+
+
 def init_database():
     engine = engine_factory()
     public_schema.create_all(bind=engine)
@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import typing as t
+from datetime import timedelta
+
+import redis
+
+from project.infrastructure.adapters.acache import redis_client
+from project.infrastructure.adapters.cache import RedisClient
+from project.libs.metrics import HttpClientMetrics
+from project.libs.ttl_cache import CachePolicy, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Response cache of AsyncApi/SyncApi.
+    Level 1 is in-process TTL + LRU bounded by entries and bytes, level 2 is optional Redis.
+    Responses are stored serialized, so every caller gets its own copy of the data.
+    Redis errors are logged and treated as a cache miss.
+    """
+
+    TTLCache = TTLCache
+    Metrics = HttpClientMetrics
+    RedisClient = staticmethod(RedisClient)
+    redis_client = staticmethod(redis_client)
+    redis_key_template = "http_cache:{}:{}"
+
+    def __init__(
+        self,
+        name_for_monitoring: str,
+        max_entries: int = 1024,
+        max_bytes: int | None = 16 * 1024 * 1024,
+        metrics: HttpClientMetrics | None = None,
+    ):
+        self.name_for_monitoring = name_for_monitoring
+        self.metrics = metrics or self.Metrics(name_for_monitoring)
+        self.local = self.TTLCache(max_entries, max_bytes, on_evict=self.metrics.track_cache_eviction)
+
+    def redis_key(self, key: t.Hashable) -> str:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return self.redis_key_template.format(self.name_for_monitoring, digest)
+
+    def get(self, key: t.Hashable, policy: CachePolicy) -> bytes | None:
+        content = self._get_local(key)
+        if content is None and policy.redis:
+            try:
+                with self.RedisClient().pipeline(transaction=False) as pipe:
+                    pipe.get(self.redis_key(key))
+                    pipe.pttl(self.redis_key(key))
+                    content, pttl = pipe.execute()
+            except redis.RedisError as exc:
+                logger.warning("Response cache error: %s", exc)
+                return None
+
+            self._set_local_from_redis(key, content, pttl)
+
+        return content
+
+    def set(self, key: t.Hashable, content: bytes, ttl: timedelta, policy: CachePolicy) -> None:
+        self.local.set(key, content, ttl.total_seconds(), len(content))
+        if policy.redis:
+            try:
+                self.RedisClient().set(self.redis_key(key), content, px=ttl)
+            except redis.RedisError as exc:
+                logger.warning("Response cache error: %s", exc)
+
+    async def aget(self, key: t.Hashable, policy: CachePolicy) -> bytes | None:
+        content = self._get_local(key)
+        if content is None and policy.redis:
+            try:
+                async with self.redis_client().pipeline(transaction=False) as pipe:
+                    pipe.get(self.redis_key(key))
+                    pipe.pttl(self.redis_key(key))
+                    content, pttl = await pipe.execute()
+            except redis.RedisError as exc:
+                logger.warning("Response cache error: %s", exc)
+                return None
+
+            self._set_local_from_redis(key, content, pttl)
+
+        return content
+
+    async def aset(self, key: t.Hashable, content: bytes, ttl: timedelta, policy: CachePolicy) -> None:
+        self.local.set(key, content, ttl.total_seconds(), len(content))
+        if policy.redis:
+            try:
+                await self.redis_client().set(self.redis_key(key), content, px=ttl)
+            except redis.RedisError as exc:
+                logger.warning("Response cache error: %s", exc)
+
+    def _get_local(self, key: t.Hashable) -> bytes | None:
+        content = self.local.get(key)
+        self.metrics.track_cache_request("local", hit=content is not None)
+        return content
+
+    def _set_local_from_redis(self, key: t.Hashable, content: bytes | None, pttl: int) -> None:
+        self.metrics.track_cache_request("redis", hit=content is not None)
+        if content is not None and pttl > 0:
+            self.local.set(key, content, pttl / 1000, len(content))
@@ -1,5 +1,11 @@
+from functools import cache
+
+import httpx
+
 import project.exceptions
 from project.infrastructure.utils import base_client as base
+from project.libs.rate_limit import TokenBucket
+from project.settings import Settings
 
 
 class KeycloakApiError(project.exceptions.ExternalApiError):
@@ -14,12 +20,23 @@ class KeycloakClientError(project.exceptions.ClientError):
     pass
 
 
+@cache
+def keycloak_rate_limiter(token_bucket: type[TokenBucket] = TokenBucket) -> TokenBucket | None:
+    """Shared by all Keycloak clients of the process, sync and async."""
+    if not Settings().KEYCLOAK_RATE_LIMIT:
+        return None
+
+    return token_bucket(Settings().KEYCLOAK_RATE_LIMIT, Settings().KEYCLOAK_RATE_BURST)
+
+
 class KeycloakAsyncClient:
     class Api(base.AsyncApi):
         ApiError = KeycloakApiError
         ServerError = KeycloakServerError
         ClientError = KeycloakClientError
 
+    rate_limiter = staticmethod(keycloak_rate_limiter)
+
     def __init__(
         self,
         keycloak_url: str,
@@ -28,7 +45,11 @@ class KeycloakAsyncClient:
         password: str | None = None,
     ):
         self.api_root = keycloak_url
-        self.api = self.Api(self.api_root, name_for_monitoring="keycloak")
+        self.api = self.Api(
+            self.api_root,
+            name_for_monitoring="keycloak",
+            rate_limiter=self.rate_limiter(),
+        )
         self._auth_data = {
             "grant_type": "password",
             "client_id": client_id,
@@ -55,6 +76,8 @@ class KeycloakSyncClient:
         ServerError = KeycloakServerError
         ClientError = KeycloakClientError
 
+    rate_limiter = staticmethod(keycloak_rate_limiter)
+
     def __init__(
         self,
         keycloak_url: str,
@@ -63,7 +86,17 @@ class KeycloakSyncClient:
         password: str | None = None,
     ):
         self.api_root = keycloak_url
-        self.api = self.Api(self.api_root, name_for_monitoring="keycloak")
+        self.api = self.Api(
+            self.api_root,
+            name_for_monitoring="keycloak",
+            pooled=True,
+            limits=httpx.Limits(
+                max_connections=Settings().HTTP_POOL_LIMIT,
+                keepalive_expiry=Settings().HTTP_POOL_KEEPALIVE_TIMEOUT,
+            ),
+            http2=Settings().HTTP_POOL_HTTP2,
+            rate_limiter=self.rate_limiter(),
+        )
         self._auth_data = {
             "grant_type": "password",
             "client_id": client_id,
@@ -71,6 +104,9 @@ class KeycloakSyncClient:
             "password": password,
         }
 
+    def close(self) -> None:
+        self.api.close()
+
     def get_token(self) -> str:
         response = self.api.call_endpoint(
             "",
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+
+import redis
+
+from project.infrastructure.adapters.acache import redis_client
+from project.libs.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RedisTokenBucket:
+    """
+    Token bucket shared between processes via Redis (GCRA).
+    Like TokenBucket, a call reserves its slot at once and waits for it.
+    On Redis errors falls back to the in-process bucket with the same settings.
+    """
+
+    TokenBucket = TokenBucket
+    redis_client = staticmethod(redis_client)
+    redis_key_template = "rate_limit:{}"
+    script = """
+        local now = redis.call('TIME')
+        local now_us = tonumber(now[1]) * 1000000 + tonumber(now[2])
+        local interval_us = tonumber(ARGV[1])
+        local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now_us), now_us) + interval_us
+        redis.call('SET', KEYS[1], string.format('%d', tat), 'PX', math.ceil((tat - now_us) / 1000) + 1)
+        return math.max(0, tat - interval_us * tonumber(ARGV[2]) - now_us)
+    """
+
+    def __init__(self, name: str, rate: float, burst: int = 1):
+        """
+        Args:
+            name: Name of the limit shared by processes, e.g. name_for_monitoring.
+        """
+        self.name = name
+        self.local = self.TokenBucket(rate, burst)
+
+    async def acquire(self) -> None:
+        interval_us = max(1, round(1_000_000 / self.local.rate))
+        try:
+            script = self.redis_client().register_script(self.script)
+            delay = await script(keys=[self.redis_key_template.format(self.name)], args=[interval_us, self.local.burst])
+            delay /= 1_000_000
+        except redis.RedisError as exc:
+            logger.warning("Rate limiter error: %s", exc)
+            delay = self.local.reserve()
+
+        if delay:
+            await asyncio.sleep(delay)
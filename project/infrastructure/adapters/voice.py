@@ -30,7 +30,15 @@ class VoiceAdapter:
         self.stt_model = stt_model
         self.tts_model = tts_model
 
-    @retry_unless_exception(exclude_exceptions_from_retry, max_attempts=6, backoff=3)  # di: skip
+    @retry_unless_exception(  # di: skip
+        exclude_exceptions_from_retry,
+        max_attempts=6,
+        backoff=3,
+        max_delay=10,
+        jitter="full",
+        deadline=60,
+        budget="openai_voice",
+    )
     @action_tracking_decorator("voice_to_text")
     async def voice_to_text(self, voice: bytes | bytearray) -> str:
         """
@@ -44,7 +52,15 @@ class VoiceAdapter:
         wav_buffer = await asyncio.to_thread(self._convert_ogg_to_wav_bytes, bytes(voice))
         return await self._transcriptions(wav_buffer)
 
-    @retry_unless_exception(exclude_exceptions_from_retry, max_attempts=6, backoff=3)  # di: skip
+    @retry_unless_exception(  # di: skip
+        exclude_exceptions_from_retry,
+        max_attempts=6,
+        backoff=3,
+        max_delay=10,
+        jitter="full",
+        deadline=60,
+        budget="openai_voice",
+    )
     @action_tracking_decorator("voice_from_text")
     async def text_to_voice(
         self,
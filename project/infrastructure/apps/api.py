@@ -11,6 +11,8 @@ from starlette.requests import Request
 
 from project import exceptions
 from project.components.chat.endpoints import router as chat_router
+from project.container import aclose_resources
+from project.libs.query_stats import observe_queries, track_queries
 from project.logger import setup_logging
 from project.settings import Constants, Settings
 
@@ -37,12 +39,28 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    await aclose_resources()
+
 
 app = FastAPI(root_path=Constants.API_ROOT_PATH, lifespan=lifespan, dependencies=[Depends(auth_by_token)])
 app.include_router(chat_router)
 
 app.middleware("http")(fastapi_tracking_middleware)
 
+
+@app.middleware("http")
+async def query_tracking_middleware(request: Request, call_next):
+    """Количество SQL запросов на запрос, см. project.libs.query_stats."""
+    with track_queries(request.url.path) as stats:
+        try:
+            return await call_next(request)
+        finally:
+            route = request.scope.get("route")
+            # Для путей без ручки (404) одна метка, чтобы не плодить метки метрик.
+            handler = route.path if route else "unknown"
+            observe_queries(stats, "fastapi", handler)
+
+
 app.get("/prometheus")(fastapi_endpoint_for_prometheus)
 
 
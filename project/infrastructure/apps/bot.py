@@ -7,6 +7,8 @@ from telegram.ext import AIORateLimiter, ApplicationBuilder
 from telegram.request import HTTPXRequest
 
 from project.components.base.handlers import register_base_handlers
+from project.container import aclose_resources
+from project.infrastructure.adapters.auth import auth_client
 from project.logger import setup_logging
 from project.settings import Settings
 
@@ -44,6 +46,12 @@ async def run_bot_app() -> None:
 
     application.job_queue.run_repeating(reminder_job, interval=300, first=10)
 
+    if not Settings().is_local():
+        try:
+            await auth_client().warm_up_authorization()
+        except Exception:
+            logger.exception("Failed to warm up authorization cache")
+
     async with application:
         await application.start()
         try:
@@ -56,6 +64,7 @@ async def run_bot_app() -> None:
                     await application.updater.stop()
         finally:
             await application.stop()
+            await aclose_resources()
 
 
 if __name__ == "__main__":
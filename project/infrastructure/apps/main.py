@@ -7,6 +7,7 @@ from llm_common.prometheus import build_prometheus_metrics
 
 from project.infrastructure.apps.flask import run_api_app
 from project.infrastructure.apps.bot import run_bot_app
+from project.libs.metrics import HttpRequestRecorder
 from project.logger import setup_logging
 from project.settings import Constants, Envs, Settings
 
@@ -19,12 +20,14 @@ if __name__ == "__main__":
         error = "MONITORING_APP_NAME cannot be empty"
         raise ValueError(error)
 
+    common_metrics = None
     if Settings().ENV == Envs.PROD:
-        build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="prod")
+        common_metrics = build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="prod")
     elif Settings().ENV == Envs.LAMBDA:
-        build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="preprod")
+        common_metrics = build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="preprod")
     elif Settings().ENV == Envs.SANDBOX:
-        build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="dev")
+        common_metrics = build_prometheus_metrics(project_name=Constants.MONITORING_APP_NAME, env="dev")
+    HttpRequestRecorder.use_common_metrics(common_metrics)
 
     setup_logging()
 
@@ -0,0 +1,122 @@
+"""
+Массовая выгрузка и загрузка чатов и сообщений через PostgreSQL COPY в CSV/NDJSON файлы.
+Память не зависит от количества строк, прогресс пишется в лог.
+Каждый запуск import загружает одну таблицу в своей транзакции: при ошибке таблица не загружается частично.
+Сообщения ссылаются на чаты, поэтому загружайте чаты раньше сообщений.
+
+Example:
+    python -m project.infrastructure.cli export chat chat.csv
+    python -m project.infrastructure.cli export message message.ndjson
+    python -m project.infrastructure.cli import chat chat.csv
+    python -m project.infrastructure.cli import message message.ndjson
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from project.container import Repositories
+from project.libs.bulk import BulkFormatT, read_rows
+from project.logger import setup_logging
+
+TABLES = ("chat", "message")
+FORMATS_BY_SUFFIX: dict[str, BulkFormatT] = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class Progress:
+    """Пишет в лог количество обработанных строк не чаще раза в interval секунд."""
+
+    def __init__(self, action: str, table: str, interval: float = 5.0):
+        self.action = action
+        self.table = table
+        self.interval = interval
+        self.start_time = self.logged_at = time.perf_counter()
+        # Логгер создается после setup_logging(), иначе он будет отключен (disable_existing_loggers).
+        self.logger = logging.getLogger(__name__)
+
+    def __call__(self, rows: int) -> None:
+        now = time.perf_counter()
+        if now - self.logged_at >= self.interval:
+            self.logged_at = now
+            self.log(rows, now)
+
+    def log(self, rows: int, now: float | None = None) -> None:
+        duration = (now or time.perf_counter()) - self.start_time
+        self.logger.info(
+            "%s %s: %d rows in %.0fs (%.0f rows/s)",
+            self.action,
+            self.table,
+            rows,
+            duration,
+            rows / duration if duration else 0,
+        )
+
+
+class BulkCli:
+    """Команды export и import, зависимости - атрибуты класса."""
+
+    Repositories = Repositories
+    Progress = Progress
+    read_rows = staticmethod(read_rows)
+
+    @staticmethod
+    def get_format(path: Path, file_format: BulkFormatT | None) -> BulkFormatT:
+        if file_format:
+            return file_format
+
+        if path.suffix not in FORMATS_BY_SUFFIX:
+            error = f"Unknown format of {path}, use --format"
+            raise ValueError(error)
+
+        return FORMATS_BY_SUFFIX[path.suffix]
+
+    def export_table(
+        self, table: str, path: Path, file_format: BulkFormatT | None = None, columns: list[str] | None = None
+    ) -> int:
+        repository = getattr(self.Repositories(), table)
+        progress = self.Progress("Exported", table)
+
+        with path.open("wb") as file:
+            rows = repository.bulk_export(file, self.get_format(path, file_format), columns, on_progress=progress)
+
+        progress.log(rows)
+        return rows
+
+    def import_table(self, table: str, path: Path, file_format: BulkFormatT | None = None) -> int:
+        repositories = self.Repositories()
+        progress = self.Progress("Imported", table)
+
+        with path.open("rb") as file, repositories.transaction():
+            rows = self.read_rows(file, self.get_format(path, file_format))
+            count = getattr(repositories, table).bulk_insert(rows, on_progress=progress)
+
+        progress.log(count)
+        return count
+
+    def main(self, argv: list[str] | None = None) -> None:
+        parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+        commands = parser.add_subparsers(dest="command", required=True)
+
+        export_parser = commands.add_parser("export", help="Выгрузить таблицу в файл")
+        export_parser.add_argument("table", choices=TABLES)
+        export_parser.add_argument("path", type=Path)
+        export_parser.add_argument("--format", choices=["csv", "ndjson"], help="По умолчанию по расширению файла")
+        export_parser.add_argument("--columns", nargs="+", help="По умолчанию все колонки")
+
+        import_parser = commands.add_parser("import", help="Загрузить таблицу из файла")
+        import_parser.add_argument("table", choices=TABLES)
+        import_parser.add_argument("path", type=Path)
+        import_parser.add_argument("--format", choices=["csv", "ndjson"], help="По умолчанию по расширению файла")
+
+        args = parser.parse_args(argv)
+        setup_logging()
+
+        if args.command == "export":
+            self.export_table(args.table, args.path, args.format, args.columns)
+        else:
+            self.import_table(args.table, args.path, args.format)
+
+
+if __name__ == "__main__":
+    BulkCli().main()
@@ -1,25 +1,176 @@
+import asyncio
+import json as jsonlib
 import logging
+import threading
 import time
 import typing as t
-from contextlib import asynccontextmanager, contextmanager
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import partial
 
 import httpx
 import orjson
-from aiohttp import ClientResponse, ClientSession, ClientError as AiohttpClientError, typedefs
-from llm_common.prometheus import is_build_metrics, http_tracking
+from aiohttp import ClientResponse, ClientSession, ClientError as AiohttpClientError, TCPConnector, typedefs
+from llm_common.prometheus import is_build_metrics
 
 from project.exceptions import ExternalApiError, ServerError, ClientError, ExternalHTTPConnectionError
+from project.infrastructure.adapters.http_cache import ResponseCache
+from project.libs.circuit_breaker import CircuitBreaker, CircuitOpenError
+from project.libs.hedging import Hedger
+from project.libs.metrics import HttpClientMetrics
+from project.libs.rate_limit import AdaptiveConcurrencyLimiter, RateLimiter, TokenBucket
+from project.libs.retry import RetryPolicy
+from project.libs.singleflight import SingleFlight
+from project.libs.streams import StreamDecoder, StreamModeT
+from project.libs.ttl_cache import CachePolicy
 
 logger = logging.getLogger(__name__)
 
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+# Events of the httpcore "trace" request extension after a new connection is opened.
+NEW_CONNECTION_EVENTS = frozenset(("connection.connect_tcp.complete", "connection.connect_unix_socket.complete"))
 
-class AsyncApi:
+
+class CachedResponse:
+    """Stand-in for the response of an error restored from the cache."""
+
+    def __init__(self, method: str, url: str, status: int):
+        self.method = method
+        self.url = url
+        self.status = self.status_code = status
+
+
+@dataclass(slots=True)
+class EndpointCall:
+    """Arguments of one call of AsyncApi.call_many()."""
+
+    resource: str
+    method: str = "GET"
+    resource_for_monitoring: str | None = None
+    params: typedefs.Query = None
+    headers: typedefs.LooseHeaders | None = None
+    data: t.Any = None
+    json: t.Any = None
+    request_settings: dict | None = None
+
+
+@dataclass(slots=True)
+class CallResult:
+    """
+    Result of one call of AsyncApi.call_many().
+
+    Args:
+        index: Position of the call in the batch.
+        result: Response data, if the call succeeded.
+        error: Exception of the call, if it failed.
+        duration: Duration of the call in seconds, without waiting for a free slot.
+    """
+
+    index: int
+    call: EndpointCall
+    result: t.Any = None
+    error: Exception | None = None
+    duration: float = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BaseApi:
+    """Policies of calls shared by AsyncApi and SyncApi."""
+
+    Metrics = HttpClientMetrics
+    ResponseCache = ResponseCache
+    StreamDecoder = StreamDecoder
+    name_for_monitoring: str
+    vary_headers: tuple[str, ...]
+    circuit_breaker: CircuitBreaker | None
+    metrics: HttpClientMetrics
+
+    def request_key(self, method: str, url: str, params: t.Any, headers: t.Mapping) -> t.Hashable:
+        """Key of identical requests for single-flight and response cache."""
+        if isinstance(params, t.Mapping):
+            params = tuple(sorted((str(k), str(v)) for k, v in params.items()))
+        elif params is not None and not isinstance(params, str):
+            params = tuple((str(k), str(v)) for k, v in params)
+
+        relevant_headers = tuple(
+            sorted((str(k).lower(), str(v)) for k, v in headers.items() if str(k).lower() in self.vary_headers)
+        )
+        return method.upper(), url, params, relevant_headers
+
+    def retry_name(self, resource_for_monitoring: str, method: str) -> str:
+        """
+        Name of retries of a call for logs and the genapp_retry_attempts_total label.
+        The resource is normalized like in HTTP metrics, so ids in paths do not grow the set of labels.
+        """
+        return f"{self.name_for_monitoring}:{self.metrics.recorder(resource_for_monitoring, method).resource}"
+
+    def response_from_cache(self, content: bytes, method: str, url: str) -> t.Any:
+        status, response_data = orjson.loads(content)
+        if status == 404:
+            raise self.ClientError(
+                response=CachedResponse(method, url, status),
+                response_data=response_data,
+                url=url,
+                status_code=status,
+            )
+
+        return response_data
+
+    @contextmanager
+    def circuit_breaker_guard(self, method: str, url: str) -> t.Iterator[None]:
+        """Fails fast with ConnectionError while the circuit is open and reports the outcome of the call."""
+        breaker = self.circuit_breaker
+        if breaker is None:
+            yield
+            return
+
+        if not breaker.allow():
+            self.metrics.track_circuit_rejected()
+            self.metrics.track_circuit_state(breaker.state)
+            exc = CircuitOpenError(breaker.name, breaker.retry_after)
+            logger.warning("Call endpoint rejected: %s %s - %s", method, url, exc)
+            raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+
+        try:
+            yield
+        except Exception as exc:
+            if self.is_circuit_failure(exc):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            self.metrics.track_circuit_state(breaker.state)
+
+    @staticmethod
+    def is_circuit_failure(exc: Exception) -> bool:
+        """Whether the error means that the upstream is unavailable."""
+        if isinstance(exc, ExternalHTTPConnectionError):
+            return True
+
+        status_code = getattr(exc, "status_code", None) or 0
+        return status_code >= 500
+
+
+class AsyncApi(BaseApi):
     ApiError = ExternalApiError
     ServerError = ServerError
     ClientError = ClientError
     ConnectionError = ExternalHTTPConnectionError
     ClientSession = ClientSession
+    SingleFlight = SingleFlight
+    CallResult = CallResult
     name_for_monitoring: str
+    # Process-wide sessions of the pooled mode by event loop, api_root and connector settings.
+    pooled_sessions: t.ClassVar[dict[tuple[asyncio.AbstractEventLoop, str, tuple], ClientSession]] = {}
 
     def __init__(
         self,
@@ -30,7 +181,41 @@ class AsyncApi:
         request_settings: dict | None = None,
         log_level: int | str = logging.INFO,
         logging_extra_data: bool = False,
+        pooled: bool = False,
+        connector_settings: dict | None = None,
+        singleflight: bool = False,
+        vary_headers: t.Iterable[str] = ("Authorization",),
+        cache_policies: dict[str, CachePolicy] | None = None,
+        cache: ResponseCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        retry_policy: RetryPolicy | None = None,
+        hedgers: dict[str, Hedger] | None = None,
     ):
+        """
+        Args:
+            pooled: Use a long-lived session shared by all clients with the same api_root and connector_settings,
+                instead of opening a new session (and TCP/TLS connection) per call.
+            connector_settings: TCPConnector settings of the pooled session,
+                e.g. {"limit_per_host": 20, "keepalive_timeout": 30, "ttl_dns_cache": 300}.
+            singleflight: Concurrent identical GET/HEAD/OPTIONS calls without a body share one upstream request
+                and one parsed result, which must not be mutated.
+            vary_headers: Headers that distinguish otherwise identical calls for single-flight and cache.
+            cache_policies: Response caching policies of GET/HEAD/OPTIONS calls by resource_for_monitoring,
+                e.g. {"api/items/{id}": CachePolicy(ttl=timedelta(minutes=5))}.
+            cache: Response cache, by default in-process only one per instance.
+            rate_limiter: Limits the rate of requests to the upstream, e.g. TokenBucket or RedisTokenBucket.
+                Share one instance between all clients of an upstream.
+            concurrency_limiter: Limits concurrent requests to the upstream,
+                the limit shrinks on 429, 5xx and timeouts and grows on success.
+            circuit_breaker: Fail fast with ConnectionError without calling the upstream while it is unavailable.
+                Share one instance between all clients of an upstream.
+            retry_policy: Retry failed calls of call_endpoint by status code, honoring Retry-After.
+            hedgers: Send a second request for GET/HEAD/OPTIONS calls without a body that are slower than usual,
+                the first successful response wins. Hedgers by resource_for_monitoring,
+                e.g. {"api/items/{id}": Hedger(percentile=0.95)}.
+        """
         self.api_root = api_root
         self.name_for_monitoring = name_for_monitoring
         self.request_settings = request_settings or {}
@@ -40,6 +225,19 @@ class AsyncApi:
         if isinstance(self.log_level, str):
             self.log_level = logging.getLevelNamesMapping()[self.log_level.upper()]
         self.session = None
+        self.pooled = pooled
+        self.connector_settings = connector_settings or {}
+        self.singleflight = singleflight
+        self.vary_headers = tuple(h.lower() for h in vary_headers)
+        self._flight = self.SingleFlight()
+        self.metrics = self.Metrics(name_for_monitoring)
+        self.cache_policies = cache_policies or {}
+        self.cache = cache or self.ResponseCache(name_for_monitoring, metrics=self.metrics)
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.circuit_breaker = circuit_breaker
+        self.retry_policy = retry_policy
+        self.hedgers = hedgers or {}
 
     @asynccontextmanager
     async def Session(self, **session_settings):  # noqa: N802
@@ -53,6 +251,52 @@ class AsyncApi:
             finally:
                 self.session = None
 
+    def pooled_session(self) -> ClientSession:
+        """
+        Returns the process-wide session for api_root and connector_settings in the running event loop,
+        it is opened lazily on the first call. A session is bound to its event loop,
+        so each loop (e.g. of a test or a thread with asyncio.run) gets its own session.
+        Closed by close_pooled_sessions().
+        """
+        key = (asyncio.get_running_loop(), self.api_root, tuple(sorted(self.connector_settings.items())))
+        session = self.pooled_sessions.get(key)
+        if session is None or session.closed:
+            session = self.ClientSession(connector=TCPConnector(**self.connector_settings))
+            self.pooled_sessions[key] = session
+
+        return session
+
+    @classmethod
+    async def close_pooled_sessions(cls) -> None:
+        """
+        Closes process-wide pooled sessions opened in the running event loop.
+        Sessions of closed event loops can not be closed anymore, they are forgotten.
+        Must be called on application shutdown.
+        """
+        loop = asyncio.get_running_loop()
+        for key in list(cls.pooled_sessions):
+            session_loop, api_root, _ = key
+            if session_loop is loop:
+                session = cls.pooled_sessions.pop(key)
+                logger.debug("Close pooled session: %s", api_root)
+                await session.close()
+            elif session_loop.is_closed():
+                del cls.pooled_sessions[key]
+
+    @asynccontextmanager
+    async def _use_session(self, session: ClientSession | None = None):
+        """Session for a call. Sessions that are not created here are not closed on exit."""
+        if session:
+            yield session
+        elif self.session:
+            yield self.session
+        elif self.pooled:
+            yield self.pooled_session()
+        else:
+            # Not stored in self.session, so that concurrent calls do not close each other's session.
+            async with self.ClientSession() as sess:
+                yield sess
+
     async def call_endpoint(
         self,
         resource: str,
@@ -65,96 +309,400 @@ class AsyncApi:
         json: t.Any = None,
         request_settings: dict | None = None,
         session: ClientSession | None = None,
+        retry_policy: RetryPolicy | None = None,
+        hedger: Hedger | None = None,
     ) -> t.Any:
+        """
+        Args:
+            retry_policy: Overrides the retry policy of the Api for this call.
+            hedger: Overrides the hedger of resource_for_monitoring for this call.
+        """
         resource_for_monitoring = resource_for_monitoring or resource
         url = self.api_root
         if resource:
             url = f"{self.api_root}/{resource}"
         headers = self.headers | (headers or {})
         request_settings = self.request_settings | (request_settings or {})
+        request = partial(
+            self._request,
+            method,
+            url,
+            resource_for_monitoring=resource_for_monitoring,
+            params=params,
+            headers=headers,
+            data=data,
+            json=json,
+            request_settings=request_settings,
+            session=session,
+        )
+        hedger = hedger or self.hedgers.get(resource_for_monitoring)
+        if hedger and data is None and json is None and method.upper() in IDEMPOTENT_METHODS:
+            request = partial(hedger.run, request, on_hedge=self.metrics.track_hedge)
+        if retry_policy := retry_policy or self.retry_policy:
+            request = partial(retry_policy.acall, request, method, self.retry_name(resource_for_monitoring, method))
+
+        if session or data is not None or json is not None or method.upper() not in IDEMPOTENT_METHODS:
+            return await request()
+
+        key = self.request_key(method, url, params, headers)
+
+        if policy := self.cache_policies.get(resource_for_monitoring):
+            if (content := await self.cache.aget(key, policy)) is not None:
+                logger.debug("Call endpoint from cache: %s %s", method, url)
+                return self.response_from_cache(content, method, url)
+
+            request = partial(self._request_and_cache, request, key, policy)
+
+        if self.singleflight:
+            result, shared = await self._flight.do(key, request)
+            if shared:
+                logger.debug("Coalesced call endpoint: %s %s", method, url)
+                self.metrics.track_coalesced()
+
+            return result
+
+        return await request()
+
+    async def _request_and_cache(
+        self,
+        request: t.Callable[[], t.Awaitable[t.Any]],
+        key: t.Hashable,
+        policy: CachePolicy,
+    ) -> t.Any:
+        try:
+            response_data = await request()
+        except self.ClientError as exc:
+            if exc.status_code == 404 and policy.negative_ttl:
+                await self.cache.aset(key, orjson.dumps([404, exc.response_data]), policy.negative_ttl, policy)
+            raise
 
-        async with session or self.session or self.Session() as sess:
-            logger.log(self.log_level, "Call endpoint: %s %s", method, url)
+        await self.cache.aset(key, orjson.dumps([200, response_data]), policy.ttl, policy)
+        return response_data
 
-            if self.logging_extra_data:
-                if headers:
-                    logger.debug("Headers: %s", headers)
-                if params:
-                    logger.debug("Params: %s", params)
-                if data:
-                    logger.debug("Data: %s", data)
-                if json:
-                    logger.debug("Json: %s", json)
+    @asynccontextmanager
+    async def _limit(self):
+        """Waits for the rate and concurrency limiters and reports the outcome of the request to them."""
+        if self.rate_limiter is None and self.concurrency_limiter is None:
+            yield
+            return
 
-            start_time = time.perf_counter()
+        start_time = time.perf_counter()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        if self.concurrency_limiter is not None:
+            await self.concurrency_limiter.acquire()
+        self.metrics.track_limit_wait(time.perf_counter() - start_time)
 
-            try:
-                async with sess.request(
-                    method,
-                    url,
-                    params=params,
-                    data=data,
-                    json=json,
-                    headers=headers,
-                    **request_settings,
-                ) as response:
+        limiter = self.concurrency_limiter
+        if limiter is None:
+            yield
+            return
+
+        try:
+            yield
+        except Exception as exc:
+            limiter.release(overloaded=self.is_overloaded(exc))
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedged request that lost), the upstream did not answer, the limit is not changed.
+            limiter.cancel()
+            raise
+        else:
+            limiter.release()
+        finally:
+            self.metrics.track_concurrency_limit(limiter.limit)
+
+    def is_overloaded(self, exc: Exception) -> bool:
+        """Whether the error means that the upstream is overloaded and the concurrency should be reduced."""
+        if isinstance(exc, ExternalHTTPConnectionError):
+            return isinstance(exc.original_error, TimeoutError)
+
+        status_code = getattr(exc, "status_code", None) or 0
+        return status_code == 429 or status_code >= 500
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        resource_for_monitoring: str,
+        params: typedefs.Query,
+        headers: typedefs.LooseHeaders,
+        data: t.Any,
+        json: t.Any,
+        request_settings: dict,
+        session: ClientSession | None,
+    ) -> t.Any:
+        with self.circuit_breaker_guard(method, url):
+            async with self._use_session(session) as sess, self._limit():
+                logger.log(self.log_level, "Call endpoint: %s %s", method, url)
+
+                if self.logging_extra_data:
+                    if headers:
+                        logger.debug("Headers: %s", headers)
+                    if params:
+                        logger.debug("Params: %s", params)
+                    if data:
+                        logger.debug("Data: %s", data)
+                    if json:
+                        logger.debug("Json: %s", json)
+
+                if json is not None:
+                    # Serialized here to know the request size, the same way aiohttp serializes json=.
+                    data, headers = self.encode_json_body(json, data, headers)
+
+                recorder = self.metrics.recorder(resource_for_monitoring, method)
+                status_code = 0
+                response_size = 0
+                start_time = time.perf_counter()
+
+                try:
+                    async with sess.request(
+                        method,
+                        url,
+                        params=params,
+                        data=data,
+                        headers=headers,
+                        **request_settings,
+                    ) as response:
+                        status_code = response.status
+                        try:
+                            return await self.process_response(response)
+                        finally:
+                            response_size = response.content.total_bytes
+
+                except AiohttpClientError as exc:
+                    status_code = 0
+                    logger.error("Connection error: %s %s - %s", method, url, exc)
+                    raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+
+                except TimeoutError as exc:
+                    status_code = 0
+                    logger.error("Timeout error: %s %s - %s", method, url, exc)
+                    raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+
+                finally:
                     duration = time.perf_counter() - start_time
                     logger.debug("End call endpoint: %s %s, duration %s ", method, url, duration)
+                    recorder.record(status_code, duration, self.body_size(data), response_size)
+
+    @staticmethod
+    def encode_json_body(payload: t.Any, data: t.Any, headers: dict) -> tuple[bytes, dict]:
+        """
+        Serializes a JSON request body with json.dumps like aiohttp, Content-Type is added unless it is in headers.
+
+        Raises:
+            ValueError: Both data and json are passed, as in aiohttp.
+        """
+        if data is not None:
+            raise ValueError("data and json parameters can not be used at the same time")
+
+        if not any(str(name).lower() == "content-type" for name in headers):
+            headers = {**headers, "Content-Type": "application/json"}
+
+        return jsonlib.dumps(payload).encode(), headers
+
+    @staticmethod
+    def body_size(data: t.Any) -> int:
+        """Size of a request body in bytes, 0 if it is not known before sending (forms, streams)."""
+        if isinstance(data, bytes | bytearray):
+            return len(data)
+        if isinstance(data, str):
+            return len(data.encode())
+        return 0
+
+    async def call_endpoint_stream(
+        self,
+        resource: str,
+        *,
+        method: str = "GET",
+        resource_for_monitoring: str | None = None,
+        params: typedefs.Query = None,
+        headers: typedefs.LooseHeaders | None = None,
+        data: t.Any = None,
+        json: t.Any = None,
+        request_settings: dict | None = None,
+        session: ClientSession | None = None,
+        mode: StreamModeT = "raw",
+        chunk_size: int = 64 * 1024,
+    ) -> t.AsyncIterator[t.Any]:
+        """
+        Reads the response incrementally instead of buffering the whole body.
+        Yields bytes chunks, NDJSON records or ServerSentEvent depending on mode.
+        The call is recorded in the HTTP metrics when the stream is closed.
+
+        Example:
+            async for record in api.call_endpoint_stream("export", mode="ndjson"):
+                ...
+        """
+        resource_for_monitoring = resource_for_monitoring or resource
+        url = self.api_root
+        if resource:
+            url = f"{self.api_root}/{resource}"
+        headers = self.headers | (headers or {})
+        request_settings = self.request_settings | (request_settings or {})
+        decoder = self.StreamDecoder(mode)
+
+        with self.circuit_breaker_guard(method, url):
+            async with self._use_session(session) as sess, self._limit():
+                logger.log(self.log_level, "Call stream endpoint: %s %s", method, url)
+
+                if json is not None:
+                    data, headers = self.encode_json_body(json, data, headers)
+
+                recorder = self.metrics.recorder(resource_for_monitoring, method)
+                status_code = 0
+                response_size = 0
+                start_time = time.perf_counter()
+
+                try:
+                    async with sess.request(
+                        method,
+                        url,
+                        params=params,
+                        data=data,
+                        headers=headers,
+                        **request_settings,
+                    ) as response:
+                        status_code = response.status
+
+                        if not 200 <= response.status < 300:
+                            await self.process_response(response)
+
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            if not response_size:
+                                self.metrics.track_time_to_first_byte(time.perf_counter() - start_time)
+
+                            response_size += len(chunk)
+                            for item in decoder.feed(chunk):
+                                yield item
+
+                        for item in decoder.flush():
+                            yield item
+
+                except (AiohttpClientError, TimeoutError) as exc:
+                    status_code = 0
+                    logger.error("Connection error: %s %s - %s", method, url, exc)
+                    raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+
+                finally:
+                    duration = time.perf_counter() - start_time
+                    logger.debug("End call stream endpoint: %s %s, duration %s ", method, url, duration)
+                    recorder.record(status_code, duration, self.body_size(data), response_size)
 
-                    if is_build_metrics():
-                        request_headers = getattr(response.request_info, "headers", {}) or {}
-                        response_headers = response.headers or {}
-                        request_size = int(
-                            request_headers.get("content-length", request_headers.get("Content-Length", 0)),
-                        )
-                        response_size = int(
-                            response_headers.get("content-length", response_headers.get("Content-Length", 0)),
-                        )
-                        http_tracking(
-                            app_type=self.name_for_monitoring,
-                            resource=resource_for_monitoring,
-                            method=str(method).upper(),
-                            response_size=response_size,
-                            status_code=response.status,
-                            duration=duration,
-                            request_size=request_size,
-                        )
-
-                    return await self.process_response(response)
-
-            except AiohttpClientError as exc:
-                duration = time.perf_counter() - start_time
-                logger.error("Connection error: %s %s - %s", method, url, exc)
+    async def call_many(
+        self,
+        calls: t.Iterable[EndpointCall],
+        *,
+        concurrency: int = 10,
+        call_timeout: float | None = None,
+        session: ClientSession | None = None,
+    ) -> list[CallResult]:
+        """
+        Runs a batch of calls with at most `concurrency` calls in flight.
+        A failed call does not stop the batch, its exception is returned in CallResult.error.
+
+        Example:
+            results = await api.call_many([EndpointCall(f"items/{id}") for id in ids], concurrency=20)
+            failed = [r for r in results if not r.ok]
+
+        Returns:
+            Results in the order of calls.
+        """
+        batch = self.iter_call_many(calls, concurrency=concurrency, call_timeout=call_timeout, session=session)
+        results = [result async for result in batch]
+        results.sort(key=lambda result: result.index)
+        return results
+
+    async def iter_call_many(
+        self,
+        calls: t.Iterable[EndpointCall],
+        *,
+        concurrency: int = 10,
+        call_timeout: float | None = None,
+        session: ClientSession | None = None,
+    ) -> t.AsyncIterator[CallResult]:
+        """
+        Same as call_many(), but yields results as the calls complete.
+        Calls are taken from the iterable only when there is a free slot, so it can be a lazy generator.
+
+        Args:
+            call_timeout: Timeout of one call in seconds, including retries.
+        """
+        if concurrency < 1:
+            error = "concurrency must be positive"
+            raise ValueError(error)
+
+        pending = enumerate(calls)
+        results: asyncio.Queue[CallResult | None] = asyncio.Queue()
+
+        async def worker():
+            try:
+                for index, call in pending:
+                    results.put_nowait(await self._call_in_batch(index, call, call_timeout, session))
+            finally:
+                results.put_nowait(None)
 
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=0,
-                        status_code=0,
-                        duration=duration,
-                        request_size=0,
-                    )
+        start_time = time.perf_counter()
+        failed = total = 0
 
-                raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+        async with AsyncExitStack() as stack:
+            if session is None and not self.pooled:
+                # One session for the whole batch instead of a session per call.
+                await stack.enter_async_context(self.Session())
 
-            except TimeoutError as exc:
-                duration = time.perf_counter() - start_time
-                logger.error("Timeout error: %s %s - %s", method, url, exc)
+            workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+            try:
+                running = len(workers)
+                while running:
+                    result = await results.get()
+                    if result is None:
+                        running -= 1
+                        continue
+
+                    total += 1
+                    failed += not result.ok
+                    yield result
+
+                for task in workers:
+                    task.result()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
 
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=0,
-                        status_code=0,
-                        duration=duration,
-                        request_size=0,
-                    )
+                if failed:
+                    logger.warning("Batch %s: %s of %s calls failed", self.name_for_monitoring, failed, total)
+                self.metrics.track_batch(time.perf_counter() - start_time)
 
-                raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
+    async def _call_in_batch(
+        self,
+        index: int,
+        call: EndpointCall,
+        call_timeout: float | None,
+        session: ClientSession | None,
+    ) -> CallResult:
+        start_time = time.perf_counter()
+        try:
+            async with asyncio.timeout(call_timeout):
+                result = await self.call_endpoint(
+                    call.resource,
+                    method=call.method,
+                    resource_for_monitoring=call.resource_for_monitoring,
+                    params=call.params,
+                    headers=call.headers,
+                    data=call.data,
+                    json=call.json,
+                    request_settings=call.request_settings,
+                    session=session,
+                )
+        except Exception as exc:
+            call_result = self.CallResult(index, call, error=exc, duration=time.perf_counter() - start_time)
+        else:
+            call_result = self.CallResult(index, call, result=result, duration=time.perf_counter() - start_time)
+
+        self.metrics.track_batch_call(call_result.duration, ok=call_result.ok)
+        return call_result
 
     async def response_to_native(self, response: ClientResponse) -> t.Any:
         try:
@@ -192,13 +740,16 @@ class AsyncApi:
         return response_data
 
 
-class SyncApi:
+class SyncApi(BaseApi):
     ApiError = ExternalApiError
     ServerError = ServerError
     ClientError = ClientError
     ConnectionError = ExternalHTTPConnectionError
     ClientSession = httpx.Client
     name_for_monitoring: str
+    # Pooled clients by Api class, api_root and connection settings (limits, http2).
+    pooled_clients: t.ClassVar[dict[tuple[type, str, tuple], httpx.Client]] = {}
+    pooled_clients_lock: t.ClassVar[threading.Lock] = threading.Lock()
 
     def __init__(
         self,
@@ -209,7 +760,30 @@ class SyncApi:
         request_settings: dict | None = None,
         log_level: int | str = logging.INFO,
         logging_extra_data: bool = False,
+        pooled: bool = False,
+        limits: httpx.Limits | None = None,
+        http2: bool = False,
+        vary_headers: t.Iterable[str] = ("Authorization",),
+        cache_policies: dict[str, CachePolicy] | None = None,
+        cache: ResponseCache | None = None,
+        rate_limiter: TokenBucket | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        retry_policy: RetryPolicy | None = None,
     ):
+        """
+        Args:
+            pooled: Use a reusable thread-safe client shared by instances of the Api class
+                with the same api_root, limits and http2, instead of creating a new client (and connection) per call.
+            limits: Connection pool limits of the pooled client.
+            http2: Enable HTTP/2 for the pooled client, requires the httpx[http2] extra.
+            vary_headers: Headers that distinguish otherwise identical calls for cache.
+            cache_policies: Response caching policies of GET/HEAD/OPTIONS calls by resource_for_monitoring.
+            cache: Response cache, by default in-process only one per instance.
+            rate_limiter: Limits the rate of requests to the upstream, share one instance between its clients.
+            circuit_breaker: Fail fast with ConnectionError without calling the upstream while it is unavailable.
+                Share one instance between all clients of an upstream.
+            retry_policy: Retry failed calls of call_endpoint by status code, honoring Retry-After.
+        """
         self.name_for_monitoring = name_for_monitoring
         self.api_root = api_root
         self.request_settings = request_settings or {}
@@ -219,6 +793,22 @@ class SyncApi:
         if isinstance(self.log_level, str):
             self.log_level = logging.getLevelNamesMapping()[self.log_level.upper()]
         self.session = None
+        self.pooled = pooled
+        self.limits = limits or httpx.Limits()
+        self.http2 = http2
+        self.vary_headers = tuple(h.lower() for h in vary_headers)
+        self.metrics = self.Metrics(name_for_monitoring)
+        self.cache_policies = cache_policies or {}
+        self.cache = cache or self.ResponseCache(name_for_monitoring, metrics=self.metrics)
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.retry_policy = retry_policy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        """The pooled client is shared by all clients of the Api class, so it is not closed here, see close()."""
 
     @contextmanager
     def Session(self, **session_settings):  # noqa: N802
@@ -232,6 +822,76 @@ class SyncApi:
             finally:
                 self.session = None
 
+    def pooled_client_key(self) -> tuple[type, str, tuple]:
+        limits = (self.limits.max_connections, self.limits.max_keepalive_connections, self.limits.keepalive_expiry)
+        return type(self), self.api_root, (limits, self.http2)
+
+    def pooled_client(self) -> httpx.Client:
+        """
+        Returns the pooled client of the Api class for api_root, limits and http2,
+        it is created lazily on the first call. Closed by close() or close_pooled_clients().
+        """
+        key = self.pooled_client_key()
+        client = self.pooled_clients.get(key)
+        if client is None or client.is_closed:
+            with self.pooled_clients_lock:
+                client = self.pooled_clients.get(key)
+                if client is None or client.is_closed:
+                    transport = httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+                    client = self.ClientSession(transport=transport)
+                    self.pooled_clients[key] = client
+
+        return client
+
+    def close(self) -> None:
+        """
+        Closes the pooled client of the Api class for api_root, limits and http2.
+        The client is shared by all such instances of the Api class, call it only when none of them is used anymore.
+        """
+        with self.pooled_clients_lock:
+            client = self.pooled_clients.pop(self.pooled_client_key(), None)
+
+        if client is not None:
+            client.close()
+
+    @classmethod
+    def close_pooled_clients(cls) -> None:
+        """
+        Closes all pooled clients of SyncApi classes.
+        Must be called on application shutdown.
+        """
+        with cls.pooled_clients_lock:
+            while cls.pooled_clients:
+                (_, api_root, _), client = cls.pooled_clients.popitem()
+                logger.debug("Close pooled client: %s", api_root)
+                client.close()
+
+    def request_extensions(self, request_settings: dict) -> dict:
+        """Adds the httpcore trace extension that counts new connections, unless a trace is already set."""
+        if not is_build_metrics():
+            return request_settings
+
+        extensions = {"trace": self.trace_connections, **request_settings.get("extensions", {})}
+        return request_settings | {"extensions": extensions}
+
+    def trace_connections(self, event_name: str, _info: dict) -> None:
+        if event_name in NEW_CONNECTION_EVENTS:
+            self.metrics.track_new_connection()
+
+    @contextmanager
+    def _use_session(self, session: httpx.Client | None = None):
+        """Client for a call. Clients that are not created here are not closed on exit."""
+        if session:
+            yield session
+        elif self.session:
+            yield self.session
+        elif self.pooled:
+            yield self.pooled_client()
+        else:
+            # Not stored in self.session, so that concurrent calls do not close each other's client.
+            with self.ClientSession() as sess:
+                yield sess
+
     def call_endpoint(
         self,
         resource: str,
@@ -244,16 +904,69 @@ class SyncApi:
         json: t.Any = None,
         request_settings: dict | None = None,
         session: httpx.Client | None = None,
+        retry_policy: RetryPolicy | None = None,
     ) -> t.Any:
+        """
+        Args:
+            retry_policy: Overrides the retry policy of the Api for this call.
+        """
         resource_for_monitoring = resource_for_monitoring or resource
         url = self.api_root
         if resource:
             url = f"{self.api_root}/{resource}"
 
         headers = self.headers | (headers or {})
-        request_settings = self.request_settings | (request_settings or {})
+        request_settings = self.request_extensions(self.request_settings | (request_settings or {}))
+        request = partial(
+            self._request,
+            method,
+            url,
+            resource_for_monitoring=resource_for_monitoring,
+            params=params,
+            headers=headers,
+            data=data,
+            json=json,
+            request_settings=request_settings,
+            session=session,
+        )
+        if retry_policy := retry_policy or self.retry_policy:
+            request = partial(retry_policy.call, request, method, self.retry_name(resource_for_monitoring, method))
+
+        policy = self.cache_policies.get(resource_for_monitoring)
+        if policy is None or data is not None or json is not None or method.upper() not in IDEMPOTENT_METHODS:
+            return request()
+
+        key = self.request_key(method, url, params, headers)
+        if (content := self.cache.get(key, policy)) is not None:
+            logger.debug("Call endpoint from cache: %s %s", method, url)
+            return self.response_from_cache(content, method, url)
+
+        try:
+            response_data = request()
+        except self.ClientError as exc:
+            if exc.status_code == 404 and policy.negative_ttl:
+                self.cache.set(key, orjson.dumps([404, exc.response_data]), policy.negative_ttl, policy)
+            raise
+
+        self.cache.set(key, orjson.dumps([200, response_data]), policy.ttl, policy)
+        return response_data
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        resource_for_monitoring: str,
+        params: dict | None,
+        headers: dict,
+        data: t.Any,
+        json: t.Any,
+        request_settings: dict,
+        session: httpx.Client | None,
+    ) -> t.Any:
+        self.wait_rate_limit()
 
-        with session or self.session or self.Session() as sess:
+        with self.circuit_breaker_guard(method, url), self._use_session(session) as sess:
             logger.log(self.log_level, "Call endpoint: %s %s", method, url)
 
             if self.logging_extra_data:
@@ -266,7 +979,12 @@ class SyncApi:
                 if json:
                     logger.debug("Json: %s", json)
 
+            recorder = self.metrics.recorder(resource_for_monitoring, method)
+            status_code = 0
+            request_size = 0
+            response_size = 0
             start_time = time.perf_counter()
+            self.metrics.track_requests_in_flight(1)
 
             try:
                 response = sess.request(
@@ -278,73 +996,123 @@ class SyncApi:
                     headers=headers,
                     **request_settings,
                 )
-
-                logger.debug("End call endpoint: %s %s, duration %s ", method, url, response.elapsed.total_seconds())
-
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=int(response.headers.get("content-length", 0)),
-                        status_code=response.status_code,
-                        duration=response.elapsed.total_seconds(),
-                        request_size=int(response.request.headers.get("content-length", 0)),
-                    )
+                status_code = response.status_code
+                request_size = self.request_body_size(response.request)
+                response_size = response.num_bytes_downloaded
 
                 return self.process_response(response)
 
             except httpx.ConnectError as exc:
-                duration = time.perf_counter() - start_time
+                status_code = 0
                 logger.error("Connection error: %s %s - %s", method, url, exc)
-
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=0,
-                        status_code=0,
-                        duration=duration,
-                        request_size=0,
-                    )
-
                 raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
 
             except httpx.TimeoutException as exc:
-                duration = time.perf_counter() - start_time
+                status_code = 0
                 logger.error("Timeout error: %s %s - %s", method, url, exc)
-
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=0,
-                        status_code=0,
-                        duration=duration,
-                        request_size=0,
-                    )
-
                 raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
 
             except httpx.HTTPStatusError as exc:
-                duration = time.perf_counter() - start_time
+                status_code = exc.response.status_code if exc.response else 0
                 logger.error("HTTP status error: %s %s - %s", method, url, exc)
+                raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
 
-                if is_build_metrics():
-                    http_tracking(
-                        app_type=self.name_for_monitoring,
-                        resource=resource_for_monitoring,
-                        method=str(method).upper(),
-                        response_size=0,
-                        status_code=exc.response.status_code if exc.response else 0,
-                        duration=duration,
-                        request_size=0,
-                    )
+            finally:
+                duration = time.perf_counter() - start_time
+                logger.debug("End call endpoint: %s %s, duration %s ", method, url, duration)
+                recorder.record(status_code, duration, request_size, response_size)
+                self.metrics.track_requests_in_flight(-1)
+
+    @staticmethod
+    def request_body_size(request: httpx.Request) -> int:
+        try:
+            return len(request.content)
+        except httpx.RequestNotRead:
+            return 0
+
+    def call_endpoint_stream(
+        self,
+        resource: str,
+        *,
+        method: str = "GET",
+        resource_for_monitoring: str | None = None,
+        params: dict | None = None,
+        headers: dict | None = None,
+        data: t.Any = None,
+        json: t.Any = None,
+        request_settings: dict | None = None,
+        session: httpx.Client | None = None,
+        mode: StreamModeT = "raw",
+        chunk_size: int = 64 * 1024,
+    ) -> t.Iterator[t.Any]:
+        """
+        Reads the response incrementally instead of buffering the whole body.
+        Yields bytes chunks, NDJSON records or ServerSentEvent depending on mode.
+        The call is recorded in the HTTP metrics when the stream is closed.
+        """
+        resource_for_monitoring = resource_for_monitoring or resource
+        url = self.api_root
+        if resource:
+            url = f"{self.api_root}/{resource}"
+        headers = self.headers | (headers or {})
+        request_settings = self.request_extensions(self.request_settings | (request_settings or {}))
+        decoder = self.StreamDecoder(mode)
+
+        self.wait_rate_limit()
+
+        with self.circuit_breaker_guard(method, url), self._use_session(session) as sess:
+            logger.log(self.log_level, "Call stream endpoint: %s %s", method, url)
 
+            recorder = self.metrics.recorder(resource_for_monitoring, method)
+            status_code = 0
+            request_size = 0
+            response_size = 0
+            start_time = time.perf_counter()
+            self.metrics.track_requests_in_flight(1)
+
+            try:
+                with sess.stream(
+                    method,
+                    url,
+                    params=params,
+                    data=data,
+                    json=json,
+                    headers=headers,
+                    **request_settings,
+                ) as response:
+                    status_code = response.status_code
+                    request_size = self.request_body_size(response.request)
+
+                    if not 200 <= response.status_code < 300:
+                        response.read()
+                        self.process_response(response)
+
+                    for chunk in response.iter_bytes(chunk_size):
+                        if not response_size:
+                            self.metrics.track_time_to_first_byte(time.perf_counter() - start_time)
+
+                        response_size += len(chunk)
+                        yield from decoder.feed(chunk)
+
+                    yield from decoder.flush()
+
+            except (httpx.ConnectError, httpx.TimeoutException) as exc:
+                status_code = 0
+                logger.error("Connection error: %s %s - %s", method, url, exc)
                 raise self.ConnectionError(url=url, method=method, original_error=exc) from exc
 
+            finally:
+                duration = time.perf_counter() - start_time
+                logger.debug("End call stream endpoint: %s %s, duration %s ", method, url, duration)
+                recorder.record(status_code, duration, request_size, response_size)
+                self.metrics.track_requests_in_flight(-1)
+
+    def wait_rate_limit(self) -> None:
+        if self.rate_limiter is not None:
+            start_time = time.perf_counter()
+            self.rate_limiter.wait()
+            self.metrics.track_limit_wait(time.perf_counter() - start_time)
+
     def response_to_native(self, response: httpx.Response) -> t.Any:
         try:
             return orjson.loads(response.content)
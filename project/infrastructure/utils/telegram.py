@@ -1,14 +1,19 @@
 import asyncio
 import logging
+import time
+from datetime import timedelta
 from functools import wraps
-from typing import Callable, Any
+from typing import AsyncIterable, Callable, Any
 
-from telegram import Update
+from telegram import Message, Update
+from telegram.constants import ChatType, MessageLimit
+from telegram.error import RetryAfter, TelegramError
 from telegram.ext import ContextTypes
 
 from project.exceptions import AuthError
 from project.infrastructure.adapters.auth import auth_client
 from project.libs.log import get_log_id
+from project.libs.query_stats import observe_queries, track_queries
 from project.settings import Settings
 
 logger = logging.getLogger(__name__)
@@ -16,6 +21,7 @@ logger = logging.getLogger(__name__)
 failed_message = "Произошла ошибка. Код ошибки {log_id}"
 processing_retry_message = "⏳ Превышено время ожидания. Повторная попытка..."
 processing_message_with_retry = "⏳ Обработка... (макс. ожидание {timeout} сек.)"
+streaming_message = "⏳ Обработка..."
 
 
 def processing_errors(func):
@@ -49,7 +55,7 @@ def check_auth(func):
             return await func(update, context)
 
         user_id = update.effective_user.id
-        if not await auth_client().check_telegram_user(user_id):  # di: skip
+        if not await auth_client().is_authorized(user_id):  # di: skip
             raise AuthError(user_id)
 
         return await func(update, context)
@@ -57,6 +63,24 @@ def check_auth(func):
     return wrapper
 
 
+def query_tracking_decorator(func, track=track_queries, observe=observe_queries):
+    """
+    Количество SQL запросов на обновление Telegram, см. project.libs.query_stats.
+    Метка обработчика - имя функции.
+    """
+    name = func.__name__
+
+    @wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        with track(name) as stats:
+            try:
+                return await func(update, context)
+            finally:
+                observe(stats, "telegram", name)
+
+    return wrapper
+
+
 def timeout_with_retry(
     func: Callable | None = None,
     *,
@@ -139,3 +163,104 @@ def timeout_with_retry(
         return decorator(func)
 
     return decorator
+
+
+def split_message(text: str, max_length: int = MessageLimit.MAX_TEXT_LENGTH) -> list[str]:
+    """
+    Разбивает текст на части не длиннее лимита Telegram,
+    по возможности по переносу строки или пробелу. Пустые части отбрасываются.
+    """
+    chunks = []
+    while len(text) > max_length:
+        cut = text.rfind("\n", 0, max_length + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, max_length + 1)
+        if cut <= 0:
+            cut = max_length
+
+        chunk, text = text[:cut].rstrip(), text[cut:].lstrip()
+        if chunk:
+            chunks.append(chunk)
+
+    if text.strip():
+        chunks.append(text)
+
+    return chunks
+
+
+async def stream_reply(
+    message: Message,
+    parts: AsyncIterable[str],
+    *,
+    placeholder: str = streaming_message,
+    edit_interval: float = 1.0,
+    group_edit_interval: float = 3.0,
+    max_length: int = MessageLimit.MAX_TEXT_LENGTH,
+    split: Callable[[str, int], list[str]] = split_message,
+) -> list[Message]:
+    """
+    Отвечает на сообщение по мере генерации ответа:
+    отправляет placeholder и редактирует его не чаще раза в edit_interval секунд,
+    текст длиннее max_length продолжается в следующих сообщениях.
+
+    Интервалы подобраны под лимиты Telegram, которые соблюдает AIORateLimiter:
+    1 сообщение в секунду в личном чате и 20 сообщений в минуту в группе.
+    Если Telegram вернул RetryAfter, следующее редактирование откладывается.
+    При другой ошибке Telegram редактирование прекращается,
+    оставшийся ответ дочитывается и отправляется заново обычными сообщениями.
+    Ошибки генерации ответа пробрасываются.
+
+    Example:
+        await stream_reply(update.effective_message, Container().chat.aask_stream(user_id, question))
+
+    Returns:
+        Сообщения с ответом.
+    """
+    interval = edit_interval if message.chat.type == ChatType.PRIVATE else group_edit_interval
+    messages = [await message.reply_text(placeholder)]
+    shown = [placeholder]
+    text = ""
+
+    async def show(chunks: list[str]) -> None:
+        for i, chunk in enumerate(chunks):
+            if i == len(messages):
+                messages.append(await message.reply_text(chunk))
+                shown.append(chunk)
+            elif shown[i] != chunk:
+                await messages[i].edit_text(chunk)
+                shown[i] = chunk
+
+    try:
+        next_edit_at = time.monotonic() + interval
+        async for part in parts:
+            text += part
+            if time.monotonic() < next_edit_at:
+                continue
+
+            try:
+                await show(split(text, max_length))
+            except RetryAfter as exc:
+                retry_after = exc.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                next_edit_at = time.monotonic() + retry_after
+            else:
+                next_edit_at = time.monotonic() + interval
+
+        await show(split(text, max_length) or [placeholder])
+
+    except TelegramError:
+        logger.exception("Failed to stream reply, falling back to a single reply")
+        async for part in parts:
+            text += part
+
+        for sent_message in messages:
+            try:
+                await sent_message.delete()
+            except TelegramError:
+                logger.warning("Failed to delete streamed message %s", sent_message.message_id)
+
+        chunks = split(text, max_length) or [placeholder]
+        messages = [await message.reply_text(chunk) for chunk in chunks]
+
+    return messages
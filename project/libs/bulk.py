@@ -0,0 +1,151 @@
+"""
+Потоковые преобразования строк таблиц для массовой загрузки и выгрузки через PostgreSQL COPY.
+Память не зависит от количества строк: строки кодируются и пишутся пачками по мере чтения драйвером.
+
+Поддерживаемые форматы файлов:
+    - csv: с заголовком, NULL записывается как \\N
+    - ndjson: по одному JSON объекту на строку (https://github.com/ndjson/ndjson-spec)
+
+Example:
+    with open("message.ndjson", "rb") as file:
+        MessageRepository.bulk_insert(read_rows(file, "ndjson"))
+
+    with open("message.csv", "wb") as file:
+        MessageRepository.bulk_export(file, "csv")
+"""
+
+import csv
+import io
+import itertools
+import typing as t
+
+import orjson
+
+BulkFormatT = t.Literal["csv", "ndjson"]
+RowT = t.Mapping[str, t.Any]
+ProgressCallbackT = t.Callable[[int], None]
+
+CSV_NULL = "\\N"
+
+
+def to_copy_value(value: t.Any) -> t.Any:
+    if isinstance(value, dict | list):
+        return orjson.dumps(value).decode()
+
+    return value
+
+
+class CsvRowsReader:
+    """
+    File-like объект для COPY ... FROM STDIN (FORMAT csv).
+    Кодирует строки в CSV пачками по batch_size по мере вызова read(), None записывается как NULL.
+    """
+
+    to_copy_value = staticmethod(to_copy_value)
+
+    def __init__(
+        self,
+        rows: t.Iterable[RowT],
+        columns: t.Sequence[str],
+        batch_size: int = 10_000,
+        on_progress: ProgressCallbackT | None = None,
+    ):
+        self.rows = iter(rows)
+        self.columns = columns
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.count = 0
+        self._buffer = io.StringIO()
+        # Пустое значение без кавычек COPY читает как NULL, значение в кавычках - как строку.
+        self._writer = csv.writer(self._buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n")
+        self._data = b""
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self._position >= len(self._data) and not self._encode_batch():
+            return b""
+
+        end = len(self._data) if size < 0 else self._position + size
+        chunk = self._data[self._position : end]
+        self._position += len(chunk)
+        return chunk
+
+    def _encode_batch(self) -> bool:
+        batch = list(itertools.islice(self.rows, self.batch_size))
+        if not batch:
+            return False
+
+        columns, to_value = self.columns, self.to_copy_value
+        values = [[to_value(row.get(column)) for column in columns] for row in batch]
+        self._writer.writerows(values)
+        self._data = self._buffer.getvalue().encode()
+        self._position = 0
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        self.count += len(batch)
+        if self.on_progress:
+            self.on_progress(self.count)
+        return True
+
+
+class CopyWriter:
+    """
+    File-like объект для COPY ... TO STDOUT.
+    Драйвер передает в write() по одной строке таблицы, строки пишутся в file как есть или как NDJSON.
+    CSV выгружается с заголовком, заголовок не считается строкой.
+    """
+
+    def __init__(
+        self,
+        file: t.BinaryIO,
+        file_format: BulkFormatT,
+        progress_every: int = 10_000,
+        on_progress: ProgressCallbackT | None = None,
+    ):
+        self.file = file
+        self.file_format = file_format
+        self.progress_every = progress_every
+        self.on_progress = on_progress
+        self.count = 0
+        self._header = file_format == "csv"
+
+    def write(self, data: bytes | str) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+
+        if self.file_format == "ndjson":
+            # JSON строки выгружаются в текстовом формате COPY, который удваивает обратный слеш.
+            # Другие экранируемые символы в JSON не встречаются.
+            data = data.replace(b"\\\\", b"\\")
+
+        self.file.write(data)
+        if self._header:
+            self._header = False
+            return len(data)
+
+        self.count += 1
+        if self.on_progress and self.count % self.progress_every == 0:
+            self.on_progress(self.count)
+        return len(data)
+
+
+def read_rows(file: t.BinaryIO, file_format: BulkFormatT) -> t.Iterator[dict[str, t.Any]]:
+    """Читает строки таблицы из CSV (с заголовком) или NDJSON файла."""
+    if file_format == "ndjson":
+        for line in file:
+            if line.strip():
+                yield orjson.loads(line)
+    else:
+        for row in csv.DictReader(io.TextIOWrapper(file, encoding="utf-8", newline="")):
+            yield {column: None if value == CSV_NULL else value for column, value in row.items()}
+
+
+def first_row_columns(rows: t.Iterable[RowT]) -> tuple[list[str], t.Iterator[RowT]]:
+    """Колонки по ключам первой строки и итератор всех строк, включая первую."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+
+    return list(first), itertools.chain([first], rows)
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+import typing as t
+from enum import Enum
+
+from project.libs.fsm import StateMachine, transition
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitStateEnum(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+to_open = transition(from_states=[CircuitStateEnum.CLOSED, CircuitStateEnum.HALF_OPEN], to_state=CircuitStateEnum.OPEN)
+to_half_open = transition(from_states=CircuitStateEnum.OPEN, to_state=CircuitStateEnum.HALF_OPEN)
+to_closed = transition(from_states=CircuitStateEnum.HALF_OPEN, to_state=CircuitStateEnum.CLOSED)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(name, retry_after)
+        self.name = name
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"Circuit {self.name} is open, retry after {self.retry_after:.1f}s"
+
+
+def is_circuit_open_error(exc: BaseException) -> bool:
+    """Ошибка вызвана открытым предохранителем, напрямую или как причина (raise ... from)."""
+    return isinstance(exc, CircuitOpenError) or isinstance(exc.__cause__, CircuitOpenError)
+
+
+class CircuitBreaker(StateMachine):
+    """
+    Предохранитель (circuit breaker) для вызовов внешнего сервиса. Потокобезопасный.
+
+    CLOSED: вызовы разрешены, после failure_threshold ошибок подряд переходит в OPEN.
+    OPEN: вызовы сразу отклоняются, через recovery_timeout секунд переходит в HALF_OPEN.
+    HALF_OPEN: разрешено half_open_max_calls пробных вызовов,
+        успешный возвращает в CLOSED, ошибка снова в OPEN.
+
+    Example:
+        breaker = CircuitBreaker("auth_api", failure_threshold=5, recovery_timeout=30)
+        if not breaker.allow():
+            raise CircuitOpenError(breaker.name, breaker.retry_after)
+        try:
+            result = call()
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        on_state_change: t.Callable[[CircuitStateEnum], None] | None = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_state_change = on_state_change
+        self._state = CircuitStateEnum.CLOSED
+        self._failures = 0
+        self._trials = 0
+        self._opened_at = 0.0
+        self._lock = threading.RLock()
+
+    def get_state(self) -> CircuitStateEnum:
+        return self._state
+
+    def set_state(self, new_state: CircuitStateEnum) -> None:
+        self._state = new_state
+        if self.on_state_change is not None:
+            self.on_state_change(new_state)
+
+    @property
+    def state(self) -> CircuitStateEnum:
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Через сколько секунд открытый предохранитель пропустит пробный вызов."""
+        if self._state is not CircuitStateEnum.OPEN:
+            return 0.0
+
+        return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state is CircuitStateEnum.OPEN:
+                if self.retry_after > 0:
+                    return False
+                self._half_open()
+
+            if self._state is CircuitStateEnum.HALF_OPEN:
+                if self._trials >= self.half_open_max_calls:
+                    return False
+                self._trials += 1
+
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state is CircuitStateEnum.HALF_OPEN:
+                self._close()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state is CircuitStateEnum.HALF_OPEN:
+                self._open()
+            elif self._state is CircuitStateEnum.CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open()
+
+    def release(self) -> None:
+        """Вызов завершился без результата (например, отменен), пробный слот освобождается."""
+        with self._lock:
+            if self._state is CircuitStateEnum.HALF_OPEN and self._trials:
+                self._trials -= 1
+
+    @to_open
+    def _open(self) -> None:
+        logger.warning("Circuit %s is open for %ss", self.name, self.recovery_timeout)
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self._trials = 0
+
+    @to_half_open
+    def _half_open(self) -> None:
+        self._trials = 0
+
+    @to_closed
+    def _close(self) -> None:
+        logger.info("Circuit %s is closed", self.name)
+        self._failures = 0
+        self._trials = 0
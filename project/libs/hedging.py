@@ -0,0 +1,142 @@
+import asyncio
+import math
+import time
+import typing as t
+from collections import deque
+
+T = t.TypeVar("T")
+
+
+class Hedger:
+    """
+    Дублирующие (hedged) вызовы для снижения хвостовых задержек.
+
+    Если вызов не завершился за время percentile последних успешных вызовов,
+    отправляется второй такой же вызов, результатом становится первый успешный, оставшийся вызов отменяется.
+    Дублирующие вызовы не превышают долю max_hedge_ratio от всех вызовов.
+    Пока успешных вызовов меньше min_samples, дублирующие вызовы не отправляются.
+
+    Использовать только для идемпотентных вызовов в одном event loop.
+
+    Example:
+        hedger = Hedger(percentile=0.95, max_hedge_ratio=0.05)
+        result = await hedger.run(partial(api.call_endpoint, "items"))
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.0,
+        max_delay: float | None = None,
+        max_hedge_ratio: float = 0.05,
+        max_tokens: float = 10.0,
+        window: int = 1000,
+        min_samples: int = 50,
+        on_hedge: t.Callable[[str], None] | None = None,
+    ):
+        """
+        Args:
+            percentile: Процентиль длительности успешных вызовов, после которого отправляется дублирующий вызов.
+            min_delay, max_delay: Границы задержки дублирующего вызова в секундах.
+            max_hedge_ratio: Максимальная доля дублирующих вызовов.
+            max_tokens: Сколько дублирующих вызовов можно отправить подряд.
+            window: Количество последних успешных вызовов, по которым считается процентиль.
+            min_samples: Минимальное количество успешных вызовов для расчета процентиля.
+            on_hedge: Вызывается с "sent" при отправке дублирующего вызова и с "won", если он оказался быстрее.
+        """
+        if not 0 < percentile < 1:
+            error = "percentile must be between 0 and 1"
+            raise ValueError(error)
+
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_tokens = max_tokens
+        self.min_samples = min_samples
+        self.on_hedge = on_hedge
+        self._durations: deque[float] = deque(maxlen=window)
+        self._refresh_every = max(1, window // 20)
+        self._since_refresh = 0
+        self._delay: float | None = None
+        self._tokens = max_tokens
+
+    @property
+    def delay(self) -> float | None:
+        """Задержка дублирующего вызова или None, если успешных вызовов пока мало."""
+        return self._delay
+
+    def record(self, duration: float) -> None:
+        """Учитывает длительность успешного вызова, процентиль пересчитывается раз в window / 20 вызовов."""
+        self._durations.append(duration)
+        self._since_refresh += 1
+        if self._since_refresh >= self._refresh_every or self._delay is None:
+            self._since_refresh = 0
+            self._refresh_delay()
+
+    def _refresh_delay(self) -> None:
+        if len(self._durations) < self.min_samples:
+            self._delay = None
+            return
+
+        durations = sorted(self._durations)
+        delay = durations[min(len(durations) - 1, math.ceil(self.percentile * len(durations)) - 1)]
+        delay = max(self.min_delay, delay)
+        self._delay = delay if self.max_delay is None else min(self.max_delay, delay)
+
+    def _withdraw(self) -> bool:
+        if self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+        return True
+
+    async def _timed(self, func: t.Callable[[], t.Awaitable[T]]) -> T:
+        start_time = time.perf_counter()
+        result = await func()
+        self.record(time.perf_counter() - start_time)
+        return result
+
+    async def run(self, func: t.Callable[[], t.Awaitable[T]], on_hedge: t.Callable[[str], None] | None = None) -> T:
+        """
+        Args:
+            func: Вызов без аргументов, может быть выполнен дважды.
+            on_hedge: Заменяет on_hedge из конструктора для этого вызова.
+
+        Returns:
+            Результат первого успешного вызова. Если оба вызова завершились ошибкой, пробрасывается первая.
+        """
+        self._tokens = min(self.max_tokens, self._tokens + self.max_hedge_ratio)
+        on_hedge = on_hedge or self.on_hedge
+        delay = self._delay
+        if delay is None:
+            return await self._timed(func)
+
+        primary = asyncio.ensure_future(self._timed(func))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._withdraw():
+                tasks.append(asyncio.ensure_future(self._timed(func)))
+                if on_hedge is not None:
+                    on_hedge("sent")
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.index):
+                    if task.exception() is None:
+                        if task is not primary and on_hedge is not None:
+                            on_hedge("won")
+                        return task.result()
+
+                    error = error or task.exception()
+
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
@@ -0,0 +1,325 @@
+"""
+Prometheus метрики проекта, дополняющие общие метрики из llm_common.prometheus.
+
+Метрики пишутся только если они инициализированы через build_prometheus_metrics(),
+для проверки используйте is_build_metrics().
+Общие метрики HTTP запросов пишутся через объект CommonMetrics, который вернул build_prometheus_metrics(),
+его нужно передать в HttpRequestRecorder.use_common_metrics().
+"""
+
+import re
+import typing as t
+from functools import lru_cache
+
+from llm_common import prometheus
+from llm_common.prometheus import COMMON_METRIC_TEMPLATE, is_build_metrics
+from prometheus_client import Counter, Gauge, Histogram
+
+from project.libs.circuit_breaker import CircuitStateEnum
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    COMMON_METRIC_TEMPLATE.format("http_requests_in_flight"),
+    "Number of SyncApi requests sent and not completed yet, pooled or not",
+    ["app_type"],
+)
+HTTP_NEW_CONNECTIONS = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_new_connections_total"),
+    "Number of connections opened by the HTTP client, a keep-alive pool opens one per concurrent request",
+    ["app_type"],
+)
+HTTP_COALESCED_REQUESTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_coalesced_requests_total"),
+    "Number of HTTP calls served by an identical in-flight request",
+    ["app_type"],
+)
+HTTP_CACHE_REQUESTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_cache_requests_total"),
+    "Number of HTTP response cache lookups",
+    ["app_type", "tier", "result"],
+)
+HTTP_CACHE_EVICTIONS = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_cache_evictions_total"),
+    "Number of entries evicted from the in-process HTTP response cache",
+    ["app_type", "reason"],
+)
+HTTP_TIME_TO_FIRST_BYTE = Histogram(
+    COMMON_METRIC_TEMPLATE.format("http_time_to_first_byte_sec"),
+    "Time from sending a streaming HTTP request to the first byte of the response body",
+    ["app_type"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, float("inf")],
+)
+HTTP_BATCH_DURATION = Histogram(
+    COMMON_METRIC_TEMPLATE.format("http_batch_duration_sec"),
+    "Duration of a batch of HTTP calls of AsyncApi.call_many",
+    ["app_type"],
+    buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf")],
+)
+HTTP_BATCH_CALL_DURATION = Histogram(
+    COMMON_METRIC_TEMPLATE.format("http_batch_call_duration_sec"),
+    "Duration of one HTTP call in a batch of AsyncApi.call_many, including retries",
+    ["app_type", "result"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf")],
+)
+HTTP_LIMITER_WAIT = Histogram(
+    COMMON_METRIC_TEMPLATE.format("http_limiter_wait_sec"),
+    "Time an HTTP request waits for the client-side rate and concurrency limiters",
+    ["app_type"],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf")],
+)
+HTTP_CONCURRENCY_LIMIT = Gauge(
+    COMMON_METRIC_TEMPLATE.format("http_concurrency_limit"),
+    "Current adaptive limit of concurrent HTTP requests to an upstream",
+    ["app_type"],
+)
+HTTP_CIRCUIT_STATE = Gauge(
+    COMMON_METRIC_TEMPLATE.format("http_circuit_state"),
+    "State of the HTTP circuit breaker: 0 - closed, 1 - half-open, 2 - open",
+    ["app_type"],
+)
+HTTP_CIRCUIT_REJECTED = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_circuit_rejected_total"),
+    "Number of HTTP calls rejected by an open circuit breaker",
+    ["app_type"],
+)
+HTTP_HEDGED_REQUESTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("http_hedged_requests_total"),
+    "Number of hedged HTTP requests, result=sent when sent and result=won when faster than the original",
+    ["app_type", "result"],
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    COMMON_METRIC_TEMPLATE.format("llm_time_to_first_token_sec"),
+    "Time from a streaming LLM request to the first token of the answer",
+    ["name"],
+    buckets=[0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, float("inf")],
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    COMMON_METRIC_TEMPLATE.format("llm_tokens_per_second"),
+    "Generation speed of streaming LLM answers after the first token",
+    ["name"],
+    buckets=[1, 5, 10, 20, 50, 100, 200, 500, float("inf")],
+)
+RETRY_ATTEMPTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("retry_attempts_total"),
+    "Number of retries made by retry decorators",
+    ["name"],
+)
+RETRY_BUDGET_EXHAUSTED = Counter(
+    COMMON_METRIC_TEMPLATE.format("retry_budget_exhausted_total"),
+    "Number of retries skipped because the retry budget is exhausted",
+    ["name"],
+)
+CACHE_REQUESTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("cache_requests_total"),
+    "Number of cache repository lookups",
+    ["name", "result"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    COMMON_METRIC_TEMPLATE.format("db_pool_checked_out"),
+    "Number of database connections checked out from the SQLAlchemy pool",
+    ["pool"],
+)
+DB_POOL_OVERFLOW = Gauge(
+    COMMON_METRIC_TEMPLATE.format("db_pool_overflow"),
+    "Number of database connections opened over the SQLAlchemy pool size",
+    ["pool"],
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    COMMON_METRIC_TEMPLATE.format("db_pool_checkout_wait_sec"),
+    "Time to get a connection from the SQLAlchemy pool, including waiting for a free one and connecting",
+    ["pool"],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")],
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    COMMON_METRIC_TEMPLATE.format("db_pool_checkout_timeouts_total"),
+    "Number of failed checkouts because the SQLAlchemy pool was exhausted longer than the pool timeout",
+    ["pool"],
+)
+DB_CONNECTION_AGE = Histogram(
+    COMMON_METRIC_TEMPLATE.format("db_connection_age_sec"),
+    "Age of database connections checked out from the SQLAlchemy pool",
+    ["pool"],
+    buckets=[1, 10, 60, 300, 900, 1800, 3600, 7200, 21600, 86400, float("inf")],
+)
+DB_CONNECTION_HOLD = Histogram(
+    COMMON_METRIC_TEMPLATE.format("db_connection_hold_sec"),
+    "Time a database connection is checked out from the SQLAlchemy pool",
+    ["pool"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf")],
+)
+DB_QUERY_DURATION = Histogram(
+    COMMON_METRIC_TEMPLATE.format("db_query_duration_sec"),
+    "Duration of SQL queries by the hash of the query fingerprint (the query without parameter values)",
+    ["pool", "query_hash"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")],
+)
+DB_SLOW_QUERIES = Counter(
+    COMMON_METRIC_TEMPLATE.format("db_slow_queries_total"),
+    "Number of SQL queries slower than DATABASE_SLOW_QUERY_SEC",
+    ["pool"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    COMMON_METRIC_TEMPLATE.format("db_queries_per_request"),
+    "Number of SQL queries per FastAPI request or Telegram update",
+    ["app_type", "handler"],
+    buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf")],
+)
+DB_REPEATED_QUERIES = Counter(
+    COMMON_METRIC_TEMPLATE.format("db_repeated_queries_total"),
+    "Number of SQL queries repeated DATABASE_REPEATED_QUERY_THRESHOLD times per request, possible N+1",
+    ["app_type", "handler"],
+)
+
+
+CIRCUIT_STATE_VALUES = {CircuitStateEnum.CLOSED: 0, CircuitStateEnum.HALF_OPEN: 1, CircuitStateEnum.OPEN: 2}
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}", flags=re.IGNORECASE)
+
+
+def normalize_resource(resource: str) -> str:
+    """Нормализация ресурса для метки метрик, как в llm_common.prometheus.http_tracking()."""
+    resource = resource.strip("/")
+    if not resource:
+        return "/"
+
+    resource = re.sub(r"eapi/[^/]+", "", resource)
+    resource = UUID_PATTERN.sub("{uuid}", resource)
+    resource = re.sub(r"/\d+", "/{int}", resource)
+    return re.sub(r"\d{2,}", "{int}", resource)
+
+
+class HttpRequestRecorder:
+    """
+    Запись общих метрик HTTP запросов (как http_tracking()) для одного ресурса и метода.
+
+    Ресурс нормализуется один раз, метрики с метками кешируются по статусу ответа,
+    поэтому запись одного запроса не разбирает строки и не ищет метки заново.
+    Получайте через http_request_recorder(), чтобы объект переиспользовался.
+    Ничего не пишет, пока общие метрики не переданы в use_common_metrics().
+    """
+
+    __slots__ = ("_children", "_common", "app_type", "method", "resource")
+
+    common: t.ClassVar[prometheus.CommonMetrics | None] = None
+    normalize_resource = staticmethod(normalize_resource)
+
+    def __init__(self, app_type: str, resource: str, method: str):
+        self.app_type = app_type
+        self.resource = self.normalize_resource(resource)
+        self.method = method.upper()
+        self._common = None
+        self._children = {}
+
+    @classmethod
+    def use_common_metrics(cls, common: prometheus.CommonMetrics | None) -> None:
+        """
+        Args:
+            common: Результат build_prometheus_metrics(), None - не писать общие метрики.
+        """
+        cls.common = common
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def cached(cls, app_type: str, resource: str, method: str) -> "HttpRequestRecorder":
+        """Один объект на app_type, resource и method, он же http_request_recorder()."""
+        return cls(app_type, resource, method)
+
+    def record(self, status_code: int, duration: float, request_size: int = 0, response_size: int = 0) -> None:
+        common = self.common
+        if common is None:
+            return
+
+        if common is not self._common:
+            # Переданы другие общие метрики, метки привязываются к ним заново.
+            self._common = common
+            self._children = {}
+
+        children = self._children.get(status_code)
+        if children is None:
+            children = self._children[status_code] = self._bind(common, status_code)
+
+        requests, durations, request_sizes, response_sizes = children
+        requests.inc()
+        durations.observe(duration)
+        request_sizes.observe(request_size)
+        response_sizes.observe(response_size)
+
+    def _bind(self, common: prometheus.CommonMetrics, status_code: int) -> tuple:
+        labels = {"method": self.method, "resource": self.resource, "status": status_code, "app_type": self.app_type}
+        return (
+            common.HTTP_REQUESTS.labels(**labels),
+            common.HTTP_REQUEST_DURATION.labels(**labels),
+            common.HTTP_REQUEST_SIZE.labels(**labels, direction="in"),
+            common.HTTP_REQUEST_SIZE.labels(**labels, direction="out"),
+        )
+
+
+http_request_recorder = HttpRequestRecorder.cached
+
+
+class HttpClientMetrics:
+    """
+    Метрики HTTP клиента одного внешнего сервиса (app_type - name_for_monitoring клиента).
+    Ничего не пишут, если метрики не инициализированы.
+    """
+
+    get_recorder = staticmethod(http_request_recorder)
+
+    def __init__(self, app_type: str):
+        self.app_type = app_type
+
+    def recorder(self, resource: str, method: str) -> HttpRequestRecorder:
+        """Запись общих метрик запросов ресурса, объект создается один раз."""
+        return self.get_recorder(self.app_type, resource, method)
+
+    def track_coalesced(self) -> None:
+        if is_build_metrics():
+            HTTP_COALESCED_REQUESTS.labels(app_type=self.app_type).inc()
+
+    def track_cache_request(self, tier: str, hit: bool) -> None:
+        if is_build_metrics():
+            HTTP_CACHE_REQUESTS.labels(app_type=self.app_type, tier=tier, result="hit" if hit else "miss").inc()
+
+    def track_cache_eviction(self, reason: str) -> None:
+        if is_build_metrics():
+            HTTP_CACHE_EVICTIONS.labels(app_type=self.app_type, reason=reason).inc()
+
+    def track_time_to_first_byte(self, duration: float) -> None:
+        if is_build_metrics():
+            HTTP_TIME_TO_FIRST_BYTE.labels(app_type=self.app_type).observe(duration)
+
+    def track_batch(self, duration: float) -> None:
+        if is_build_metrics():
+            HTTP_BATCH_DURATION.labels(app_type=self.app_type).observe(duration)
+
+    def track_batch_call(self, duration: float, ok: bool) -> None:
+        if is_build_metrics():
+            HTTP_BATCH_CALL_DURATION.labels(app_type=self.app_type, result="success" if ok else "error").observe(
+                duration
+            )
+
+    def track_limit_wait(self, duration: float) -> None:
+        if is_build_metrics():
+            HTTP_LIMITER_WAIT.labels(app_type=self.app_type).observe(duration)
+
+    def track_concurrency_limit(self, limit: int) -> None:
+        if is_build_metrics():
+            HTTP_CONCURRENCY_LIMIT.labels(app_type=self.app_type).set(limit)
+
+    def track_circuit_state(self, state: CircuitStateEnum) -> None:
+        if is_build_metrics():
+            HTTP_CIRCUIT_STATE.labels(app_type=self.app_type).set(CIRCUIT_STATE_VALUES[state])
+
+    def track_circuit_rejected(self) -> None:
+        if is_build_metrics():
+            HTTP_CIRCUIT_REJECTED.labels(app_type=self.app_type).inc()
+
+    def track_hedge(self, result: str) -> None:
+        if is_build_metrics():
+            HTTP_HEDGED_REQUESTS.labels(app_type=self.app_type, result=result).inc()
+
+    def track_new_connection(self) -> None:
+        if is_build_metrics():
+            HTTP_NEW_CONNECTIONS.labels(app_type=self.app_type).inc()
+
+    def track_requests_in_flight(self, delta: int) -> None:
+        if is_build_metrics():
+            HTTP_REQUESTS_IN_FLIGHT.labels(app_type=self.app_type).inc(delta)
@@ -0,0 +1,124 @@
+"""
+Подсчет SQL запросов в рамках запроса FastAPI, обновления Telegram, теста или любого блока кода.
+
+Запросы записываются событиями SQLAlchemy (project.infrastructure.adapters.database.instrument_queries)
+во все открытые track_queries() текущего контекста, т.е. вложенные блоки тоже считаются во внешних.
+Один и тот же запрос, повторенный много раз, обычно означает N+1: ленивую загрузку связей в цикле.
+
+Example:
+    with track_queries("chat_history") as stats:
+        Container().chat.get_history(user_id)
+
+    print(stats.count, stats.duration)
+    print(stats.report())
+"""
+
+import collections
+import contextvars
+import hashlib
+import logging
+import re
+import typing as t
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from llm_common.prometheus import is_build_metrics
+
+from project.libs import metrics
+from project.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+query_stats_storage: contextvars.ContextVar[tuple["QueryStats", ...]] = contextvars.ContextVar(
+    "query_stats", default=()
+)
+
+FINGERPRINT_MAX_LENGTH = 300
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+# Параметры psycopg2 %(name)s, asyncpg $1, именованные :name (но не приведение типа ::jsonb) и числа.
+PARAMETER_PATTERN = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\b\d+(?:\.\d+)?\b")
+SAVEPOINT_PATTERN = re.compile(r"\bsa_savepoint_\d+\b")
+LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+ROWS_PATTERN = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+@dataclass(slots=True)
+class QueryStats:
+    name: str
+    count: int = 0
+    duration: float = 0
+    fingerprints: collections.Counter[str] = field(default_factory=collections.Counter)
+
+    metrics = metrics
+
+    @classmethod
+    @contextmanager
+    def track(cls, name: str) -> t.Generator["QueryStats", t.Any, None]:
+        stats = cls(name)
+        token = query_stats_storage.set((*query_stats_storage.get(), stats))
+        try:
+            yield stats
+        finally:
+            query_stats_storage.reset(token)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Запросы, выполненные не меньше threshold раз."""
+        return [(query, count) for query, count in self.fingerprints.most_common() if count >= threshold]
+
+    def report(self) -> str:
+        lines = [f"{self.name}: {self.count} queries in {self.duration:.3f}s"]
+        lines.extend(f"{count:>5} x {query}" for query, count in self.fingerprints.most_common())
+        return "\n".join(lines)
+
+    def observe(self, app_type: str, handler: str) -> None:
+        """
+        Количество запросов на запрос FastAPI или обновление Telegram в genapp_db_queries_per_request.
+        Запрос, повторенный DATABASE_REPEATED_QUERY_THRESHOLD раз, пишется в лог как возможный N+1.
+        """
+        if is_build_metrics():
+            self.metrics.DB_QUERIES_PER_REQUEST.labels(app_type=app_type, handler=handler).observe(self.count)
+
+        threshold = Settings().DATABASE_REPEATED_QUERY_THRESHOLD
+        if not threshold:
+            return
+
+        for query, count in self.repeated(threshold):
+            if is_build_metrics():
+                self.metrics.DB_REPEATED_QUERIES.labels(app_type=app_type, handler=handler).inc()
+            logger.warning("Query repeated %d times in %s, possible N+1: %s", count, handler, query)
+
+
+track_queries = QueryStats.track
+observe_queries = QueryStats.observe
+
+
+def record_query(query: str, duration: float) -> None:
+    for stats in query_stats_storage.get():
+        stats.count += 1
+        stats.duration += duration
+        stats.fingerprints[query] += 1
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Запрос без значений параметров: строки, числа, параметры и номера SAVEPOINT заменяются на ?,
+    списки IN (...) и строки VALUES (...), (...) разной длины сворачиваются в один (?).
+    Обрезается до FINGERPRINT_MAX_LENGTH символов, чтобы ограничить память статистики и размер логов.
+    """
+    query = SAVEPOINT_PATTERN.sub("sa_savepoint_?", statement)
+    query = STRING_PATTERN.sub("?", query)
+    query = PARAMETER_PATTERN.sub("?", query)
+    query = LIST_PATTERN.sub("(?)", query)
+    query = ROWS_PATTERN.sub("(?)", query)
+    return " ".join(query.split())[:FINGERPRINT_MAX_LENGTH]
+
+
+@lru_cache(maxsize=4096)
+def query_hash(query: str) -> str:
+    """
+    Короткий хеш отпечатка запроса для метки метрик: число значений метки не растет с длиной запросов.
+    Полный текст запроса с этим хешем пишется только в лог медленных запросов.
+    """
+    return hashlib.blake2b(query.encode(), digest_size=4).hexdigest()
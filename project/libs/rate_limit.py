@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import typing as t
+from collections import deque
+
+
+class RateLimiter(t.Protocol):
+    async def acquire(self) -> None: ...
+
+
+class TokenBucket:
+    """
+    Ограничение частоты вызовов алгоритмом token bucket.
+
+    Токены пополняются со скоростью rate в секунду, но не больше burst.
+    При burst=1 вызовы идут равномерно, как в leaky bucket.
+    Вызов резервирует токен сразу и ждет его появления, поэтому очередь ожидающих честная (FIFO).
+
+    Example:
+        limiter = TokenBucket(rate=50, burst=10)
+        await limiter.acquire()  # в асинхронном коде
+        limiter.wait()  # в синхронном коде
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Количество вызовов в секунду
+            burst: Количество вызовов, которые можно сделать сразу после простоя
+        """
+        if rate <= 0 or burst < 1:
+            error = "rate and burst must be positive"
+            raise ValueError(error)
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Returns:
+            Время в секундах, через которое можно выполнить вызов.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self) -> None:
+        if delay := self.reserve():
+            await asyncio.sleep(delay)
+
+    def wait(self) -> None:
+        if delay := self.reserve():
+            time.sleep(delay)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Адаптивное ограничение количества одновременных вызовов (AIMD).
+
+    Лимит растет на increase за каждые limit успешных вызовов
+    и уменьшается в decrease_factor раз при перегрузке внешнего сервиса (429, 5xx, таймауты),
+    но не чаще раза в cooldown секунд, чтобы пачка одновременных ошибок не обрушила лимит до минимума.
+
+    Example:
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=100)
+        await limiter.acquire()
+        try:
+            ...
+        finally:
+            limiter.release(overloaded=False)
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            error = "Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit"
+            raise ValueError(error)
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._decreased_at = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже выдан, возвращаем его следующему.
+                self._in_flight -= 1
+                self._wake_up()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, overloaded: bool = False) -> None:
+        now = time.monotonic()
+        if overloaded:
+            if now - self._decreased_at >= self.cooldown:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._decreased_at = now
+        else:
+            self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+
+        self._in_flight -= 1
+        self._wake_up()
+
+    def cancel(self) -> None:
+        """Вызов отменен без ответа сервиса: слот освобождается, лимит не меняется."""
+        self._in_flight -= 1
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
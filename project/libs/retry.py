@@ -1,212 +1,523 @@
 import asyncio
 import logging
+import random
+import threading
 import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from typing import Callable, Iterable
+from typing import Any, Awaitable, Callable, ClassVar, Iterable, Iterator, Literal
+
+from llm_common.prometheus import is_build_metrics
+
+from project.exceptions import ClientError, ExternalHTTPConnectionError, ServerError
+from project.libs import metrics
+from project.libs.circuit_breaker import is_circuit_open_error
 
 logger = logging.getLogger(__name__)
 
+JitterT = Literal["none", "full", "decorrelated"]
+
+
+class RetryBudget:
+    """
+    Бюджет повторов: ограничивает долю повторов относительно успешных вызовов.
+
+    Каждый успешный вызов добавляет ratio токенов (но не больше max_tokens), каждый повтор забирает один.
+    Во время недоступности сервиса успешных вызовов нет, бюджет заканчивается и повторы прекращаются,
+    поэтому нагрузка на сервис не умножается на количество попыток.
+
+    Example:
+        budget = RetryBudget("llm", ratio=0.1, max_tokens=10)
 
-def retry_on_exception(
-    exceptions: type[Exception] | Iterable[type[Exception]] | None = None,
-    max_attempts: int = 3,
-    delay: float = 1.0,
+        @retry_on_exception(TimeoutError, budget=budget)
+        async def call(): ...
+    """
+
+    _shared: ClassVar[dict[str, "RetryBudget"]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, name: str, ratio: float = 0.1, max_tokens: float = 10.0):
+        """
+        Args:
+            name: Имя бюджета для метрик и логов
+            ratio: Количество повторов, которое разрешает один успешный вызов
+            max_tokens: Максимальный запас повторов, он же начальный
+        """
+        self.name = name
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @classmethod
+    def shared(cls, name: str, ratio: float = 0.1, max_tokens: float = 10.0) -> "RetryBudget":
+        """
+        Общий бюджет повторов группы функций, создается при первом обращении.
+
+        Raises:
+            ValueError: Бюджет с этим именем уже создан с другими ratio или max_tokens.
+        """
+        with cls._shared_lock:
+            if name not in cls._shared:
+                cls._shared[name] = cls(name, ratio, max_tokens)
+
+            budget = cls._shared[name]
+            if (budget.ratio, budget.max_tokens) != (ratio, max_tokens):
+                error = (
+                    f"Retry budget {name} already exists with ratio={budget.ratio}, max_tokens={budget.max_tokens}, "
+                    f"requested ratio={ratio}, max_tokens={max_tokens}"
+                )
+                raise ValueError(error)
+
+            return budget
+
+
+get_retry_budget = RetryBudget.shared
+
+
+def backoff_delays(
+    delay: float,
     backoff: float = 1.0,
-    on_retry: Callable[[int, Exception], None] | None = None,
-):
+    max_delay: float | None = None,
+    jitter: JitterT = "none",
+) -> Iterator[float]:
     """
-    Декоратор для автоматического повторного выполнения функции при возникновении указанных исключений.
+    Бесконечная последовательность задержек между попытками.
 
     Args:
-        exceptions: Исключение или кортеж исключений, при которых нужно повторять попытку
-        max_attempts: Максимальное количество попыток (включая первую)
-        delay: Начальная задержка между попытками в секундах
-        backoff: Множитель для увеличения задержки после каждой неудачной попытки
-        on_retry: Функция обратного вызова, вызываемая при каждой повторной попытке
+        jitter: none - delay * backoff ** n без случайности;
+            full - случайная задержка от 0 до delay * backoff ** n;
+            decorrelated - случайная задержка от delay до утроенной предыдущей (backoff не используется).
     """
-    if not exceptions:
-        exceptions = (Exception,)
+    cap = float("inf") if max_delay is None else max_delay
+    current = previous = delay
+    while True:
+        if jitter == "full":
+            value = random.uniform(0, current)  # noqa: S311
+        elif jitter == "decorrelated":
+            value = previous = min(cap, random.uniform(delay, previous * 3))  # noqa: S311
+        else:
+            value = current
+
+        yield min(cap, value)
+        current = min(cap, current * backoff)
+
+
+class _Retrying:
+    """Состояние повторов одного вызова декорированной функции."""
+
+    backoff_delays = staticmethod(backoff_delays)
+    get_retry_budget = staticmethod(get_retry_budget)
+    is_circuit_open_error = staticmethod(is_circuit_open_error)
+    metrics = metrics
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int,
+        delay: float,
+        backoff: float,
+        max_delay: float | None,
+        jitter: JitterT,
+        deadline: float | None,
+        budget: RetryBudget | str | None,
+        on_retry: Callable[[int, Exception], None] | None,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.delays = self.backoff_delays(delay, backoff, max_delay, jitter)
+        self.deadline = deadline
+        self.budget = self.get_retry_budget(budget) if isinstance(budget, str) else budget
+        self.on_retry = on_retry
+        self.started_at = time.monotonic()
+
+    def succeeded(self) -> None:
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def next_delay(self, attempt: int, exc: Exception, retry_after: float | None = None) -> float | None:
+        """
+        Args:
+            retry_after: Задержка, которую запросил сервис, используется вместо очередной задержки backoff.
+
+        Returns:
+            Задержка перед следующей попыткой или None, если повторять не нужно.
+        """
+        name = self.name
+
+        if self.is_circuit_open_error(exc):
+            logger.warning("No retry (func=%s), circuit is open: %s", name, exc)
+            return None
 
-    if isinstance(exceptions, type):
-        exceptions = (exceptions,)
+        if attempt == self.max_attempts:
+            logger.error("Failed after %s attempts (func=%s): %s: %s", attempt, name, exc.__class__.__name__, exc)
+            return None
+
+        delay = next(self.delays) if retry_after is None else retry_after
+
+        if self.deadline is not None and time.monotonic() - self.started_at + delay > self.deadline:
+            logger.error("Retry deadline %ss exceeded (func=%s): %s: %s", self.deadline, name, type(exc).__name__, exc)
+            return None
+
+        if self.budget is not None and not self.budget.withdraw():
+            logger.error(
+                "Retry budget %s is exhausted (func=%s): %s: %s", self.budget.name, name, type(exc).__name__, exc
+            )
+            if is_build_metrics():
+                self.metrics.RETRY_BUDGET_EXHAUSTED.labels(name=self.budget.name).inc()
+            return None
+
+        logger.warning(
+            "Retry %s/%s (func=%s) on %s: %s; sleep=%.2fs",
+            attempt,
+            self.max_attempts,
+            name,
+            exc.__class__.__name__,
+            exc,
+            delay,
+        )
+        if is_build_metrics():
+            self.metrics.RETRY_ATTEMPTS.labels(name=self.budget.name if self.budget else name).inc()
+        if self.on_retry is not None:
+            self.on_retry(attempt, exc)
+
+        return delay
+
+
+class RetryDecorator:
+    """Декоратор повторов, создается retry_on_exception и retry_unless_exception."""
+
+    Retrying = _Retrying
+    get_retry_budget = staticmethod(get_retry_budget)
+
+    def __init__(
+        self,
+        should_retry: Callable[[Exception], bool],
+        max_attempts: int,
+        delay: float,
+        backoff: float,
+        max_delay: float | None,
+        jitter: JitterT,
+        deadline: float | None,
+        budget: RetryBudget | str | None,
+        on_retry: Callable[[int, Exception], None] | None,
+    ):
+        self.should_retry = should_retry
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.budget = self.get_retry_budget(budget) if isinstance(budget, str) else budget
+        self.on_retry = on_retry
+
+    @classmethod
+    def on_exception(
+        cls,
+        exceptions: type[Exception] | Iterable[type[Exception]] | None = None,
+        max_attempts: int = 3,
+        delay: float = 1.0,
+        backoff: float = 1.0,
+        on_retry: Callable[[int, Exception], None] | None = None,
+        *,
+        max_delay: float | None = None,
+        jitter: JitterT = "none",
+        deadline: float | None = None,
+        budget: RetryBudget | str | None = None,
+    ) -> "RetryDecorator":
+        """
+        Декоратор для автоматического повторного выполнения функции при возникновении указанных исключений.
+        Повторы не делаются, если ошибка вызвана открытым предохранителем (CircuitOpenError).
+
+        Args:
+            exceptions: Исключение или кортеж исключений, при которых нужно повторять попытку
+            max_attempts: Максимальное количество попыток (включая первую)
+            delay: Начальная задержка между попытками в секундах
+            backoff: Множитель для увеличения задержки после каждой неудачной попытки
+            on_retry: Функция обратного вызова, вызываемая при каждой повторной попытке
+            max_delay: Максимальная задержка между попытками в секундах
+            jitter: Случайный разброс задержек, чтобы клиенты не повторяли запросы одновременно, см. backoff_delays()
+            deadline: Максимальное время в секундах от первой попытки, после которого повторы не делаются
+            budget: Бюджет повторов или имя общего бюджета группы функций, см. RetryBudget
+        """
+        if not exceptions:
+            exceptions = (Exception,)
+
+        if isinstance(exceptions, type):
+            exceptions = (exceptions,)
+
+        exceptions = tuple(exceptions)
+
+        return cls(
+            lambda e: isinstance(e, exceptions),
+            max_attempts,
+            delay,
+            backoff,
+            max_delay,
+            jitter,
+            deadline,
+            budget,
+            on_retry,
+        )
+
+    @classmethod
+    def unless_exception(
+        cls,
+        excluded_exceptions: type[Exception] | Iterable[type[Exception]],
+        max_attempts: int = 3,
+        delay: float = 1.0,
+        backoff: float = 1.0,
+        on_retry: Callable[[int, Exception], None] | None = None,
+        *,
+        max_delay: float | None = None,
+        jitter: JitterT = "none",
+        deadline: float | None = None,
+        budget: RetryBudget | str | None = None,
+    ) -> "RetryDecorator":
+        """
+        Декоратор, который НЕ делает повторов для выбранных исключений, а для остальных
+        предпринимает повторы по тем же правилам, что и retry_on_exception.
+        Повторы не делаются, если ошибка вызвана открытым предохранителем (CircuitOpenError).
+
+        Args:
+            excluded_exceptions: Исключение или набор исключений, для которых повторы
+                делаться не должны (будет мгновенный проброс исключения без ретраев).
+            max_attempts: Максимальное количество попыток (включая первую) для остальных исключений.
+            delay: Начальная задержка между попытками в секундах.
+            backoff: Множитель для увеличения задержки после каждой неудачной попытки.
+            on_retry: Функция обратного вызова, вызываемая перед каждой повторной попыткой.
+            max_delay, jitter, deadline, budget: См. retry_on_exception.
+        """
+        if not isinstance(excluded_exceptions, Iterable):
+            excluded_exceptions = (excluded_exceptions,)
+
+        excluded_exceptions = tuple(excluded_exceptions)
+
+        return cls(
+            lambda e: not isinstance(e, excluded_exceptions),
+            max_attempts,
+            delay,
+            backoff,
+            max_delay,
+            jitter,
+            deadline,
+            budget,
+            on_retry,
+        )
+
+    def retrying(self, name: str) -> _Retrying:
+        return self.Retrying(
+            name,
+            self.max_attempts,
+            self.delay,
+            self.backoff,
+            self.max_delay,
+            self.jitter,
+            self.deadline,
+            self.budget,
+            self.on_retry,
+        )
+
+    def __call__(self, func):
+        should_retry = self.should_retry
+        max_attempts = self.max_attempts
 
-    def decorator(func):
         if asyncio.iscoroutinefunction(func):
 
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                current_delay = delay
-                for attempt in range(1, max_attempts + 1):
+                state = self.retrying(func.__name__)
+                for attempt in range(1, max_attempts + 1):  # noqa: RET503
                     try:
-                        return await func(*args, **kwargs)
-                    except exceptions as e:
-                        if attempt == max_attempts:
-                            logger.error(
-                                "Failed after %s attempts (func=%s): %s: %s",
-                                max_attempts,
-                                func.__name__,
-                                e.__class__.__name__,
-                                e,
-                            )
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        if not should_retry(e) or (sleep := state.next_delay(attempt, e)) is None:
                             raise
 
-                        logger.warning(
-                            "Retry %s/%s (func=%s) on %s: %s; sleep=%.2fs",
-                            attempt,
-                            max_attempts,
-                            func.__name__,
-                            e.__class__.__name__,
-                            e,
-                            current_delay,
-                        )
-                        if on_retry is not None:
-                            on_retry(attempt, e)
-
-                        await asyncio.sleep(current_delay)
-                        current_delay *= backoff
-
-                return None
+                        await asyncio.sleep(sleep)
+                    else:
+                        state.succeeded()
+                        return result
 
             return async_wrapper
 
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            current_delay = delay
-            for attempt in range(1, max_attempts + 1):
+            state = self.retrying(func.__name__)
+            for attempt in range(1, max_attempts + 1):  # noqa: RET503
                 try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    if attempt == max_attempts:
-                        logger.error(
-                            "Failed after %s attempts (func=%s): %s: %s",
-                            max_attempts,
-                            func.__name__,
-                            e.__class__.__name__,
-                            e,
-                        )
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if not should_retry(e) or (sleep := state.next_delay(attempt, e)) is None:
                         raise
 
-                    logger.warning(
-                        "Retry %s/%s (func=%s) on %s: %s; sleep=%.2fs",
-                        attempt,
-                        max_attempts,
-                        func.__name__,
-                        e.__class__.__name__,
-                        e,
-                        current_delay,
-                    )
-                    if on_retry is not None:
-                        on_retry(attempt, e)
-
-                    time.sleep(current_delay)
-                    current_delay *= backoff
-
-            return None
+                    time.sleep(sleep)
+                else:
+                    state.succeeded()
+                    return result
 
         return sync_wrapper
 
-    return decorator
 
+retry_on_exception = RetryDecorator.on_exception
+retry_unless_exception = RetryDecorator.unless_exception
 
-def retry_unless_exception(
-    excluded_exceptions: type[Exception] | Iterable[type[Exception]],
-    max_attempts: int = 3,
-    delay: float = 1.0,
-    backoff: float = 1.0,
-    on_retry: Callable[[int, Exception], None] | None = None,
-):
+
+def parse_retry_after(value: str | None) -> float | None:
     """
-    Декоратор, который НЕ делает повторов для выбранных исключений, а для остальных
-    предпринимает повторы по тем же правилам, что и retry_on_exception.
+    Значение заголовка Retry-After в секундах: число секунд или HTTP-дата.
 
-    Args:
-        excluded_exceptions: Исключение или набор исключений, для которых повторы
-            делаться не должны (будет мгновенный проброс исключения без ретраев).
-        max_attempts: Максимальное количество попыток (включая первую) для остальных исключений.
-        delay: Начальная задержка между попытками в секундах.
-        backoff: Множитель для увеличения задержки после каждой неудачной попытки.
-        on_retry: Функция обратного вызова, вызываемая перед каждой повторной попыткой.
+    Returns:
+        None, если заголовка нет или значение не удалось разобрать.
     """
-    if not isinstance(excluded_exceptions, Iterable):
-        excluded_exceptions = (excluded_exceptions,)
+    if not value:
+        return None
 
-    def decorator(func):
-        if asyncio.iscoroutinefunction(func):
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
 
-            @wraps(func)
-            async def async_wrapper(*args, **kwargs):
-                current_delay = delay
-                for attempt in range(1, max_attempts + 1):
-                    try:
-                        return await func(*args, **kwargs)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
 
-                    except excluded_exceptions:
-                        # Для указанных исключений не делаем повторов
-                        raise
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
 
-                    except Exception as e:  # pylint: disable=broad-except
-                        if attempt == max_attempts:
-                            logger.error(
-                                "Failed after %s attempts (func=%s): %s: %s",
-                                max_attempts,
-                                func.__name__,
-                                e.__class__.__name__,
-                                e,
-                            )
-                            raise
+    return max(0.0, (date - datetime.now(UTC)).total_seconds())
 
-                        logger.warning(
-                            "Retry %s/%s (func=%s) on %s: %s; sleep=%.2fs",
-                            attempt,
-                            max_attempts,
-                            func.__name__,
-                            e.__class__.__name__,
-                            e,
-                            current_delay,
-                        )
-                        if on_retry is not None:
-                            on_retry(attempt, e)
 
-                        await asyncio.sleep(current_delay)
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """
+    Политика повторов HTTP вызовов по статусу ответа, для AsyncApi и SyncApi из base_client.
 
-                        current_delay *= backoff
+    Повторяются только идемпотентные методы при ошибках соединения, таймаутах и статусах из statuses.
+    Заголовок Retry-After ответа используется вместо задержки backoff,
+    если он больше max_retry_after, вызов не повторяется.
 
-                return None
+    Example:
+        api = MyApi(api_root, name_for_monitoring="my_api", retry_policy=RetryPolicy(max_attempts=3))
+        # или для одного вызова
+        await api.call_endpoint("items", retry_policy=RetryPolicy(max_attempts=5, budget="my_api"))
 
-            return async_wrapper
+    Args:
+        max_attempts, delay, backoff, max_delay, jitter, deadline, budget: См. retry_on_exception.
+        statuses: Статусы ответа ServerError и ClientError, при которых вызов повторяется.
+        methods: Методы, вызовы которых можно повторять.
+        retry_connection_errors: Повторять вызовы при ошибках соединения и таймаутах.
+        max_retry_after: Максимальная задержка по Retry-After в секундах.
+    """
 
-        @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            current_delay = delay
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    return func(*args, **kwargs)
+    max_attempts: int = 3
+    delay: float = 0.5
+    backoff: float = 2.0
+    max_delay: float | None = 10.0
+    jitter: JitterT = "none"
+    deadline: float | None = None
+    budget: RetryBudget | str | None = None
+    statuses: frozenset[int] = frozenset((408, 429, 500, 502, 503, 504))
+    methods: frozenset[str] = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+    retry_connection_errors: bool = True
+    max_retry_after: float = 60.0
 
-                except excluded_exceptions:
-                    # Для указанных исключений не делаем повторов
-                    raise
+    Retrying = _Retrying
+    parse_retry_after = staticmethod(parse_retry_after)
 
-                except Exception as e:  # pylint: disable=broad-except
-                    if attempt == max_attempts:
-                        raise
+    def is_retryable(self, exc: Exception, method: str) -> bool:
+        if method.upper() not in self.methods:
+            return False
+
+        if isinstance(exc, ExternalHTTPConnectionError):
+            return self.retry_connection_errors
 
-                    logger.warning(
-                        "Retry %s/%s (func=%s) on %s: %s; sleep=%.2fs",
-                        attempt,
-                        max_attempts,
-                        func.__name__,
-                        e.__class__.__name__,
-                        e,
-                        current_delay,
-                    )
-                    if on_retry is not None:
-                        on_retry(attempt, e)
-
-                    time.sleep(current_delay)
-                    current_delay *= backoff
+        if isinstance(exc, ServerError | ClientError):
+            return exc.status_code in self.statuses
 
+        return False
+
+    def retry_after(self, exc: Exception) -> float | None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is None:
             return None
 
-        return sync_wrapper
+        return self.parse_retry_after(headers.get("Retry-After"))
+
+    def _retrying(self, name: str) -> _Retrying:
+        return self.Retrying(
+            name,
+            self.max_attempts,
+            self.delay,
+            self.backoff,
+            self.max_delay,
+            self.jitter,
+            self.deadline,
+            self.budget,
+            None,
+        )
+
+    def _next_delay(self, state: _Retrying, attempt: int, exc: Exception, method: str) -> float | None:
+        if not self.is_retryable(exc, method):
+            return None
+
+        retry_after = self.retry_after(exc)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.warning("No retry (func=%s), Retry-After %.0fs is too long: %s", state.name, retry_after, exc)
+            return None
+
+        return state.next_delay(attempt, exc, retry_after)
+
+    async def acall(self, func: Callable[[], Awaitable[Any]], method: str, name: str) -> Any:
+        """
+        Args:
+            func: Вызов без аргументов.
+            method: HTTP метод вызова.
+            name: Имя вызова для логов и метрик.
+        """
+        state = self._retrying(name)
+        for attempt in range(1, self.max_attempts + 1):  # noqa: RET503
+            try:
+                result = await func()
+            except Exception as e:
+                if (sleep := self._next_delay(state, attempt, e, method)) is None:
+                    raise
+
+                await asyncio.sleep(sleep)
+            else:
+                state.succeeded()
+                return result
+
+    def call(self, func: Callable[[], Any], method: str, name: str) -> Any:
+        """Синхронный вариант acall()."""
+        state = self._retrying(name)
+        for attempt in range(1, self.max_attempts + 1):  # noqa: RET503
+            try:
+                result = func()
+            except Exception as e:
+                if (sleep := self._next_delay(state, attempt, e, method)) is None:
+                    raise
 
-    return decorator
+                time.sleep(sleep)
+            else:
+                state.succeeded()
+                return result
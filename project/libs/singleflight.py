@@ -0,0 +1,46 @@
+import asyncio
+import typing as t
+
+
+class SingleFlight[T]:
+    """
+    Объединяет одновременные одинаковые вызовы в один (request coalescing).
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же ключом
+    не запускают новый, а ждут и получают результат (или исключение) первого.
+    Результат общий для всех ожидающих, поэтому его нельзя изменять.
+
+    Example:
+        flight = SingleFlight()
+        result, shared = await flight.do(("GET", url), lambda: fetch(url))
+    """
+
+    def __init__(self):
+        self._calls: dict[t.Hashable, asyncio.Task[T]] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: t.Hashable, func: t.Callable[[], t.Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Returns:
+            Результат вызова и признак того, что он получен от уже выполняющегося вызова.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Отмена одного из ожидающих не должна отменять общий вызов для остальных.
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: t.Hashable, task: asyncio.Task[T]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # Помечаем исключение полученным, если все ожидающие были отменены.
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,147 @@
+"""
+Инкрементальный разбор потоковых HTTP ответов с ограниченным потреблением памяти.
+
+Поддерживаемые форматы:
+    - raw: куски байтов как есть
+    - ndjson: по одному JSON объекту на строку (https://github.com/ndjson/ndjson-spec)
+    - sse: Server-Sent Events (https://html.spec.whatwg.org/multipage/server-sent-events.html)
+
+Example:
+    decoder = StreamDecoder("ndjson")
+    for chunk in chunks:
+        for record in decoder.feed(chunk):
+            ...
+    for record in decoder.flush():
+        ...
+"""
+
+import typing as t
+from dataclasses import dataclass
+
+import orjson
+
+StreamModeT = t.Literal["raw", "ndjson", "sse"]
+
+
+@dataclass(frozen=True, slots=True)
+class ServerSentEvent:
+    data: str
+    event: str = "message"
+    id: str | None = None
+    retry: int | None = None
+
+    def encode(self) -> bytes:
+        """Событие в формате потока text/event-stream."""
+        lines = []
+        if self.event != "message":
+            lines.append(f"event: {self.event}")
+        if self.id is not None:
+            lines.append(f"id: {self.id}")
+        if self.retry is not None:
+            lines.append(f"retry: {self.retry}")
+        lines.extend(f"data: {line}" for line in self.data.splitlines() or [""])
+        return ("\n".join(lines) + "\n\n").encode()
+
+
+class LineDecoder:
+    """Разбивает куски байтов на строки без символов перевода строки."""
+
+    def __init__(self, max_line_size: int = 1024 * 1024):
+        self.max_line_size = max_line_size
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        if len(self._buffer) > self.max_line_size:
+            error = f"Line is longer than {self.max_line_size} bytes"
+            raise ValueError(error)
+
+        return [line.removesuffix(b"\r") for line in lines]
+
+    def flush(self) -> list[bytes]:
+        line, self._buffer = self._buffer, b""
+        return [line.removesuffix(b"\r")] if line else []
+
+
+class SSEDecoder:
+    """Собирает события Server-Sent Events из строк потока."""
+
+    ServerSentEvent = ServerSentEvent
+
+    def __init__(self):
+        self._data: list[str] = []
+        self._event: str | None = None
+        self._retry: int | None = None
+        self._last_event_id: str | None = None
+
+    def decode(self, line: bytes) -> ServerSentEvent | None:
+        if not line:
+            return self._dispatch()
+
+        if line.startswith(b":"):
+            return None
+
+        field, _, value = line.decode().partition(":")
+        value = value.removeprefix(" ")
+
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id" and "\0" not in value:
+            self._last_event_id = value
+        elif field == "retry" and value.isdigit():
+            self._retry = int(value)
+
+        return None
+
+    def _dispatch(self) -> ServerSentEvent | None:
+        event = None
+        if self._data:
+            event = self.ServerSentEvent(
+                data="\n".join(self._data),
+                event=self._event or "message",
+                id=self._last_event_id,
+                retry=self._retry,
+            )
+
+        self._data = []
+        self._event = None
+        self._retry = None
+
+        return event
+
+
+class StreamDecoder:
+    """Превращает куски байтов потока в записи выбранного формата."""
+
+    LineDecoder = LineDecoder
+    SSEDecoder = SSEDecoder
+
+    def __init__(self, mode: StreamModeT = "raw", max_line_size: int = 1024 * 1024):
+        self.mode = mode
+        self._lines = self.LineDecoder(max_line_size)
+        self._sse = self.SSEDecoder()
+
+    def feed(self, chunk: bytes) -> list[t.Any]:
+        if self.mode == "raw":
+            return [chunk]
+
+        return self._decode_lines(self._lines.feed(chunk))
+
+    def flush(self) -> list[t.Any]:
+        if self.mode == "raw":
+            return []
+
+        lines = self._lines.flush()
+        if self.mode == "sse":
+            # Событие в конце потока без пустой строки не отправляется, как в браузерах.
+            return []
+
+        return self._decode_lines(lines)
+
+    def _decode_lines(self, lines: list[bytes]) -> list[t.Any]:
+        if self.mode == "ndjson":
+            return [orjson.loads(line) for line in lines if line.strip()]
+
+        return [event for line in lines if (event := self._sse.decode(line)) is not None]
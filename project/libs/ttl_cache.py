@@ -0,0 +1,106 @@
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+
+class TTLCache[K, V]:
+    """
+    Потокобезопасный in-memory кеш с временем жизни записей и вытеснением давно не используемых (LRU).
+
+    Размер ограничивается количеством записей и, опционально, суммарным размером в байтах,
+    который передается при записи.
+
+    Example:
+        cache = TTLCache(max_entries=1000, max_bytes=10 * 1024 * 1024)
+        cache.set("key", b"value", ttl=60, size=5)
+        cache.get("key")  # b"value"
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int | None = None,
+        on_evict: t.Callable[[str], None] | None = None,
+    ):
+        """
+        Args:
+            max_entries: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер записей в байтах
+            on_evict: Функция обратного вызова при вытеснении записи, получает причину: "expired" или "lru"
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._data: OrderedDict[K, tuple[float, int, V]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: K):
+        return self.get(key) is not None
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, _, value = item
+            if expires_at <= time.monotonic():
+                self._pop(key, "expired")
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V, ttl: float, size: int = 0) -> None:
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)), "lru")
+
+    def delete(self, key: K) -> None:
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key: K, reason: str | None = None) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+        if reason and self.on_evict is not None:
+            self.on_evict(reason)
+
+
+@dataclass(frozen=True, slots=True)
+class CachePolicy:
+    """
+    Политика кеширования ответов эндпоинта в AsyncApi/SyncApi.
+
+    Args:
+        ttl: Время жизни успешных ответов.
+        negative_ttl: Время жизни ответов 404, если не задано, они не кешируются.
+        redis: Хранить ответы также в Redis, чтобы процессы использовали их совместно.
+    """
+
+    ttl: timedelta
+    negative_ttl: timedelta | None = None
+    redis: bool = False
@@ -0,0 +1,137 @@
+"""
+Load test of /chat/v1/ask (sync, FastAPI threadpool) against /chat/v2/ask (async).
+
+The database and the LLM are replaced with in-memory fakes, the LLM answers after LLM_LATENCY seconds.
+The sync endpoint holds a threadpool worker (40 by default) for the whole LLM latency,
+so its throughput is capped at ~40 / LLM_LATENCY requests per second. The async endpoint is not capped.
+
+Usage:
+    python -m scripts.benchmarks.chat_ask_load [concurrency] [llm_latency]
+"""
+
+import asyncio
+import itertools
+import sys
+import time
+import warnings
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+
+import httpx
+
+from project.container import Container
+from project.infrastructure.apps.api import app
+from project.settings import Settings
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LLM_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+ids = itertools.count(1)
+
+
+class FakeChatRepository:
+    @staticmethod
+    def get_or_create_active_chat(user_id):
+        return SimpleNamespace(id=user_id)
+
+    @staticmethod
+    async def aget_or_create_active_chat(user_id):
+        return SimpleNamespace(id=user_id)
+
+
+class FakeMessageRepository:
+    @staticmethod
+    def save_user_message(user_id, chat_id, content):
+        return SimpleNamespace(id=next(ids))
+
+    save_ai_message = save_user_message
+
+    @staticmethod
+    async def asave_user_message(user_id, chat_id, content):
+        return SimpleNamespace(id=next(ids))
+
+    asave_ai_message = asave_user_message
+
+    @staticmethod
+    def save_turn(user_id, chat_id, question, answer):
+        return [SimpleNamespace(id=next(ids)), SimpleNamespace(id=next(ids))]
+
+    @staticmethod
+    async def asave_turn(user_id, chat_id, question, answer):
+        return [SimpleNamespace(id=next(ids)), SimpleNamespace(id=next(ids))]
+
+    @staticmethod
+    def get_chat_history(user_id, chat_id, limit):
+        return []
+
+    @staticmethod
+    async def aget_chat_history(user_id, chat_id, limit):
+        return []
+
+    @staticmethod
+    async def aget_chat_window(user_id, chat_id):
+        return []
+
+
+class FakeUserCacheRepository:
+    @staticmethod
+    async def save(user_id, data):
+        pass
+
+
+class FakeRepositories:
+    chat = FakeChatRepository()
+    message = FakeMessageRepository()
+    user_cache = FakeUserCacheRepository()
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    @asynccontextmanager
+    async def atransaction(self):
+        yield
+
+
+class FakeChatAgent:
+    @staticmethod
+    def generate_answer(user_id, chat_id, question, history):
+        time.sleep(LLM_LATENCY)
+        return "answer"
+
+    @staticmethod
+    async def agenerate_answer(user_id, chat_id, question, history):
+        await asyncio.sleep(LLM_LATENCY)
+        return "answer"
+
+
+async def load(client: httpx.AsyncClient, path: str) -> tuple[float, list[float]]:
+    async def ask(user_id: int) -> float:
+        start_time = time.perf_counter()
+        response = await client.post(path, json={"user_id": user_id, "question": "Question"})
+        response.raise_for_status()
+        return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    latencies = await asyncio.gather(*(ask(user_id) for user_id in range(1, CONCURRENCY + 1)))
+    return time.perf_counter() - start_time, sorted(latencies)
+
+
+async def main():
+    headers = {"Api-Token": Settings().API_TOKEN.get_secret_value()}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers, timeout=None) as client:
+        print(f"{CONCURRENCY} concurrent requests, LLM latency {LLM_LATENCY}s")
+        for path in ("/chat/v1/ask", "/chat/v2/ask"):
+            duration, latencies = await load(client, path)
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(
+                f"{path}: {duration:.2f}s, {CONCURRENCY / duration:.0f} req/s, p50={p50:.2f}s, p99={p99:.2f}s",
+            )
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    with Container.local(repositories=FakeRepositories(), llm_client=object(), chat_agent=FakeChatAgent()):
+        asyncio.run(main())
@@ -0,0 +1,164 @@
+"""
+Benchmark of the chat history query on a table with millions of messages (PostgreSQL).
+
+Compares:
+- old: `ORDER BY created_at ASC LIMIT n` with single-column indexes on chat_id / user_id
+  (returns the oldest messages and sorts all messages of the chat or the user);
+- new: `MessageRepository.chat_history_query` (last n messages, `ORDER BY created_at DESC, id DESC LIMIT n`)
+  with single-column and with composite (chat_id|user_id, created_at, id) indexes;
+- keyset page: `before_id` of a message in the middle of the history.
+
+Tables are created in a separate `benchmark` schema of SQLALCHEMY_DATABASE_DSN, which is dropped at the end.
+The time is the "Execution Time" of EXPLAIN ANALYZE averaged over random chats / users.
+
+Usage:
+    python -m scripts.benchmarks.chat_history_query [messages] [users] [chats_per_user]
+"""
+
+import json
+import random
+import sys
+import time
+
+from sqlalchemy import Select, create_engine, select, text
+
+from project.components.base.models import public_schema
+from project.components.chat.models import MessageModel
+from project.components.chat.repositories import MessageRepository
+from project.settings import Settings
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+CHATS_PER_USER = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+LIMIT = 20
+SAMPLES = 200
+
+SINGLE_COLUMN_INDEXES = [
+    "CREATE INDEX ix_message_chat_id ON message (chat_id)",
+    "CREATE INDEX ix_message_user_id ON message (user_id)",
+]
+COMPOSITE_INDEXES = [
+    "CREATE INDEX ix_message_chat_id_created_at_id ON message (chat_id, created_at, id)",
+    "CREATE INDEX ix_message_user_id_created_at_id ON message (user_id, created_at, id)",
+]
+
+
+def old_query(user_id: int, chat_id: int | None) -> Select:
+    query = select(MessageModel)
+    if chat_id:
+        query = query.where(MessageModel.chat_id == chat_id)
+    else:
+        query = query.where(MessageModel.user_id == user_id)
+    return query.order_by(MessageModel.created_at.asc()).limit(LIMIT)
+
+
+def new_query(user_id: int, chat_id: int | None, before_id: int | None = None) -> Select:
+    query, params = MessageRepository.chat_history_query(user_id, chat_id, LIMIT, before_id=before_id)
+    return query.params(params)
+
+
+def fill(connection) -> None:
+    chats = USERS * CHATS_PER_USER
+    connection.execute(
+        text("""
+            INSERT INTO "user" (id, name, telegram_user_id, is_admin)
+            SELECT i, 'user ' || i, i, false FROM generate_series(1, :users) AS i
+        """),
+        {"users": USERS},
+    )
+    connection.execute(
+        text("""
+            INSERT INTO chat (id, user_id, title, is_active)
+            SELECT i, (i - 1) % :users + 1, 'chat ' || i, true FROM generate_series(1, :chats) AS i
+        """),
+        {"users": USERS, "chats": chats},
+    )
+    # Сообщения чата идут парами (вопрос, ответ) с одинаковым created_at, как при сохранении в одной транзакции.
+    connection.execute(
+        text("""
+            INSERT INTO message (id, chat_id, user_id, content, message_type, created_at, updated_at)
+            SELECT
+                i,
+                (i - 1) % :chats + 1,
+                ((i - 1) % :chats) % :users + 1,
+                repeat('x', 200),
+                CASE WHEN (i - 1) / :chats % 2 = 0 THEN 'USER'::messagetypeenum ELSE 'AI'::messagetypeenum END,
+                timestamp '2025-01-01' + ((i - 1) / :chats / 2) * interval '1 minute',
+                now()
+            FROM generate_series(1, :messages) AS i
+        """),
+        {"users": USERS, "chats": chats, "messages": MESSAGES},
+    )
+    connection.execute(text("DROP INDEX IF EXISTS ix_message_chat_id_created_at_id, ix_message_user_id_created_at_id"))
+    connection.execute(text("ANALYZE"))
+
+
+def execution_time(connection, query: Select) -> float:
+    compiled = query.compile(connection, compile_kwargs={"literal_binds": True})
+    plan = connection.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"]
+
+
+def measure(connection, name: str, make_query) -> None:
+    chats = USERS * CHATS_PER_USER
+    for by in ("chat", "user"):
+        times = []
+        for _ in range(SAMPLES):
+            user_id = random.randint(1, USERS)
+            chat_id = random.randint(1, chats) if by == "chat" else None
+            times.append(execution_time(connection, make_query(user_id, chat_id)))
+        times.sort()
+        print(
+            f"{name:<44} by {by:<5} avg={sum(times) / len(times):7.2f}ms p99={times[int(len(times) * 0.99) - 1]:7.2f}ms"
+        )
+
+
+def main():
+    engine = create_engine(str(Settings().SQLALCHEMY_DATABASE_DSN))
+    middle_id = MESSAGES // 2
+
+    with engine.connect() as connection:
+        connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        connection.execute(text("CREATE SCHEMA benchmark"))
+        connection.execute(text("SET search_path TO benchmark"))
+        try:
+            public_schema.create_all(connection)
+            start_time = time.perf_counter()
+            fill(connection)
+            duration = time.perf_counter() - start_time
+            print(f"{MESSAGES} messages, {USERS} users, {USERS * CHATS_PER_USER} chats, filled in {duration:.0f}s")
+
+            for sql in SINGLE_COLUMN_INDEXES:
+                connection.execute(text(sql))
+            connection.execute(text("ANALYZE message"))
+            measure(connection, "old query, single-column indexes", old_query)
+            measure(
+                connection,
+                "new query, single-column indexes",
+                new_query,
+            )
+
+            connection.execute(text("DROP INDEX ix_message_chat_id, ix_message_user_id"))
+            for sql in COMPOSITE_INDEXES:
+                connection.execute(text(sql))
+            connection.execute(text("ANALYZE message"))
+            measure(
+                connection,
+                "new query, composite indexes",
+                new_query,
+            )
+            measure(
+                connection,
+                "keyset page (before_id), composite indexes",
+                lambda user_id, chat_id: new_query(user_id, chat_id, before_id=middle_id),
+            )
+        finally:
+            connection.rollback()
+            connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark of database round-trips and latency per Chat.ask (PostgreSQL).
+
+Compares:
+- before: the chat is created via `create()` and every message via `save_user_message()`/`save_ai_message()`,
+  each `create()` runs in a nested `transaction()`, i.e. SAVEPOINT / INSERT / RELEASE SAVEPOINT;
+- after: `Chat.ask`, the chat is created by one INSERT ... RETURNING
+  and the question with the answer by one multi-row INSERT ... RETURNING (`MessageRepository.save_turn`).
+
+The LLM is replaced with a fake answering instantly, so the latency is the database part of the ask.
+Round-trips are statements sent to the database plus COMMIT.
+Tables are created in a separate `benchmark` schema of SQLALCHEMY_DATABASE_DSN, which is dropped at the end.
+
+Usage:
+    python -m scripts.benchmarks.chat_turn_write [asks] [turns_per_chat]
+"""
+
+import sys
+import time
+
+from sqlalchemy import event, insert, text
+
+from project.components.base.models import public_schema
+from project.components.chat.models import ChatModel
+from project.components.user.models import UserModel
+from project.container import AllRepositories, DIContainer
+from project.infrastructure.adapters import database
+from project.settings import Settings
+
+ASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+TURNS_PER_CHAT = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+
+class FakeChatAgent:
+    @staticmethod
+    def generate_answer(user_id, chat_id, question, history):
+        return "answer"
+
+
+class RoundTrips:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.inc)
+        event.listen(engine, "commit", self.inc)
+
+    def inc(self, *args):
+        self.count += 1
+
+
+def ask_before(repo: AllRepositories, user_id: int, question: str, chat_id: int | None) -> str:
+    with repo.transaction():
+        if chat_id is None:
+            chat = repo.chat.get_active_chat(user_id) or repo.chat.create(
+                user_id=user_id, title="Новый чат", is_active=True
+            )
+            chat_id = chat.id
+
+        history = repo.message.get_chat_history(user_id=user_id, chat_id=chat_id, limit=Settings().HISTORY_WINDOW)
+        repo.message.save_user_message(user_id, chat_id, question)
+        answer = FakeChatAgent.generate_answer(user_id, chat_id, question, history)
+        repo.message.save_ai_message(user_id, chat_id, answer)
+        return answer
+
+
+def ask_after(container: DIContainer, user_id: int, question: str, chat_id: int | None) -> str:
+    return container.chat.ask(user_id=user_id, question=question, chat_id=chat_id)
+
+
+def run(name: str, ask, round_trips: RoundTrips, first_user_id: int) -> None:
+    users = ASKS // TURNS_PER_CHAT
+    round_trips.count = 0
+    start_time = time.perf_counter()
+    for i in range(ASKS):
+        # Первый вопрос пользователя создает чат, остальные идут в активный чат.
+        ask(first_user_id + i % users, f"Question {i}", None)
+    duration = time.perf_counter() - start_time
+    print(
+        f"{name:<7} {ASKS} asks: {round_trips.count / ASKS:.1f} round-trips/ask, "
+        f"{duration / ASKS * 1000:.2f}ms/ask, {ASKS / duration:.0f} asks/s"
+    )
+
+
+def main():
+    engine = database.engine_factory()
+    event.listen(engine, "connect", lambda dbapi_connection, _: set_search_path(dbapi_connection))
+    users = ASKS // TURNS_PER_CHAT
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        connection.execute(text("CREATE SCHEMA benchmark"))
+    engine.dispose()
+
+    try:
+        public_schema.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(UserModel), [{"id": i, "name": f"user {i}"} for i in range(1, users * 2 + 1)])
+
+        round_trips = RoundTrips(engine)
+        run("before", lambda *args: ask_before(AllRepositories(), *args), round_trips, first_user_id=1)
+        container = DIContainer(llm_client=object(), chat_agent=FakeChatAgent())
+        run("after", lambda *args: ask_after(container, *args), round_trips, first_user_id=users + 1)
+
+        with engine.connect() as connection:
+            chats = connection.scalar(text(f"SELECT count(*) FROM {ChatModel.__tablename__}"))
+            print(f"{chats} chats, {TURNS_PER_CHAT} asks per chat")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+
+
+def set_search_path(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET search_path TO benchmark")
+    cursor.close()
+    dbapi_connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark of recording HTTP client metrics per call.
+
+Compares the previous path of AsyncApi.call_endpoint (is_build_metrics() + parsing content-length headers
++ http_tracking() with label normalization) with HttpRequestRecorder.
+
+Usage:
+    python -m scripts.benchmarks.http_metrics
+"""
+
+import timeit
+
+from llm_common.prometheus import build_prometheus_metrics, http_tracking, is_build_metrics
+from multidict import CIMultiDict
+
+from project.libs.metrics import HttpRequestRecorder, http_request_recorder
+
+NUMBER = 20_000
+
+request_headers = CIMultiDict({"Content-Type": "application/json", "Content-Length": "128"})
+response_headers = CIMultiDict({"Content-Type": "application/json", "Content-Length": "2048"})
+
+
+def http_tracking_call():
+    if is_build_metrics():
+        request_size = int(request_headers.get("content-length", request_headers.get("Content-Length", 0)))
+        response_size = int(response_headers.get("content-length", response_headers.get("Content-Length", 0)))
+        http_tracking(
+            app_type="benchmark_api",
+            resource="api/check/{telegram_user_id}",
+            method="GET",
+            response_size=response_size,
+            status_code=200,
+            duration=0.01,
+            request_size=request_size,
+        )
+
+
+def recorder_call():
+    http_request_recorder("benchmark_api", "api/check/{telegram_user_id}", "GET").record(200, 0.01, 128, 2048)
+
+
+def main():
+    HttpRequestRecorder.use_common_metrics(build_prometheus_metrics(project_name="benchmark", env="dev"))
+
+    for name, func in (("http_tracking", http_tracking_call), ("HttpRequestRecorder", recorder_call)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print(f"{name:<20} {seconds / NUMBER * 1_000_000:8.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark of Python CPU time per hot repository query (PostgreSQL).
+
+Compares:
+- before: the statement is built on every call (`select(...)`, `insert(...).values(...)` with values),
+  SQLAlchemy traverses the new statement to generate the key of the compiled statement cache;
+- after: prebuilt statements of ChatRepository/MessageRepository with bound parameters,
+  the cache key is generated once and memoized in the statement object.
+
+CPU is process_time() of the benchmark process per query, i.e. the client side (SQLAlchemy, ORM, driver),
+waiting for the database is not included. Wall time includes the database.
+Tables are created in a separate `benchmark` schema of SQLALCHEMY_DATABASE_DSN, which is dropped at the end.
+
+Usage:
+    python -m scripts.benchmarks.repository_statements [queries]
+"""
+
+import sys
+import time
+from operator import attrgetter
+
+from sqlalchemy import event, insert, select, text
+
+from project.components.base.models import public_schema
+from project.components.chat.enums import MessageTypeEnum
+from project.components.chat.models import ChatModel, MessageModel
+from project.components.chat.repositories import ChatRepository, MessageRepository
+from project.components.user.models import UserModel
+from project.infrastructure.adapters import database
+
+QUERIES = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+USERS = 100
+LIMIT = 20
+
+
+def active_chat_before(user_id: int) -> ChatModel | None:
+    query = (
+        select(ChatModel)
+        .where(ChatModel.user_id == user_id)
+        .where(ChatModel.is_active.is_(True))
+        .order_by(ChatModel.created_at.desc())
+        .limit(1)
+    )
+    with database.Session() as session:
+        return session.scalars(query).first()
+
+
+def chat_history_before(user_id: int) -> list[MessageModel]:
+    query = (
+        select(MessageModel)
+        .where(MessageModel.chat_id == user_id)
+        .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
+        .limit(LIMIT)
+    )
+    with database.Session() as session:
+        return list(reversed(session.scalars(query).all()))
+
+
+def save_turn_before(user_id: int) -> list[MessageModel]:
+    rows = [
+        {"user_id": user_id, "chat_id": user_id, "content": "question", "message_type": MessageTypeEnum.USER},
+        {"user_id": user_id, "chat_id": user_id, "content": "answer", "message_type": MessageTypeEnum.AI},
+    ]
+    with database.transaction() as session:
+        messages = session.scalars(insert(MessageModel).values(rows).returning(MessageModel)).all()
+        return sorted(messages, key=attrgetter("id"))
+
+
+def save_turn_after(user_id: int) -> list[MessageModel]:
+    with database.transaction():
+        return MessageRepository.save_turn(user_id, user_id, "question", "answer")
+
+
+CASES = [
+    ("get_active_chat", active_chat_before, ChatRepository.get_active_chat),
+    (
+        "get_chat_history",
+        chat_history_before,
+        lambda user_id: MessageRepository.get_chat_history(user_id, user_id, limit=LIMIT),
+    ),
+    ("save_turn", save_turn_before, save_turn_after),
+]
+
+
+def measure(func) -> tuple[float, float]:
+    """CPU and wall time in microseconds per query."""
+    for user_id in range(1, USERS + 1):
+        func(user_id)  # Прогрев кеша скомпилированных запросов.
+
+    start_cpu, start_time = time.process_time(), time.perf_counter()
+    for i in range(QUERIES):
+        func(i % USERS + 1)
+
+    cpu, duration = time.process_time() - start_cpu, time.perf_counter() - start_time
+    return cpu / QUERIES * 1e6, duration / QUERIES * 1e6
+
+
+def run() -> None:
+    for name, before, after in CASES:
+        for version, func in (("before", before), ("after", after)):
+            cpu, wall = measure(func)
+            print(f"{name:<17} {version:<7} cpu={cpu:7.1f}us/query wall={wall:7.1f}us/query")
+
+
+def fill(engine) -> None:
+    with engine.begin() as connection:
+        connection.execute(insert(UserModel), [{"id": i, "name": f"user {i}"} for i in range(1, USERS + 1)])
+        connection.execute(
+            insert(ChatModel), [{"id": i, "user_id": i, "title": "chat", "is_active": True} for i in range(1, USERS + 1)]
+        )
+        connection.execute(
+            insert(MessageModel),
+            [
+                {"chat_id": i, "user_id": i, "content": "message", "message_type": MessageTypeEnum.USER}
+                for i in range(1, USERS + 1)
+                for _ in range(LIMIT * 2)
+            ],
+        )
+
+
+def main():
+    engine = database.engine_factory()
+    event.listen(engine, "connect", lambda dbapi_connection, _: set_search_path(dbapi_connection))
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        connection.execute(text("CREATE SCHEMA benchmark"))
+    engine.dispose()
+
+    try:
+        public_schema.create_all(engine)
+        fill(engine)
+        print(f"{QUERIES} queries per case, {USERS} users")
+        run()
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+
+
+def set_search_path(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET search_path TO benchmark")
+    cursor.close()
+    dbapi_connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import pathlib
+from contextlib import contextmanager
 
 import pytest
 import pytest_asyncio
 from aioresponses import aioresponses
+from llm_common import prometheus
 from starlette.testclient import TestClient
 from testcontainers.postgres import PostgresContainer
 from testcontainers.redis import RedisContainer, AsyncRedisContainer
@@ -15,6 +17,8 @@ from project.infrastructure.apps.api import app
 from project.logger import setup_logging
 from project.settings import Settings
 from project.libs.log import logging_disabled
+from project.libs.metrics import HttpRequestRecorder
+from project.libs.query_stats import track_queries
 
 
 @pytest.fixture(autouse=True, scope="session")
@@ -30,6 +34,17 @@ def setup():
         yield
 
 
+@pytest.fixture(scope="session")
+def common_metrics():
+    """
+    Включает Prometheus метрики до конца сессии тестов, в llm_common нет публичного способа их выключить.
+    Тесты метрик используют свои значения меток, чтобы не зависеть от других тестов.
+    """
+    common = prometheus.build_prometheus_metrics(project_name="test", env="dev")
+    HttpRequestRecorder.use_common_metrics(common)
+    return common
+
+
 @pytest.fixture(scope="session")
 def init_database(setup):
     with PostgresContainer("postgres:17.2") as postgres:
@@ -123,6 +138,27 @@ async def asession(init_database):
     adatabase.async_sessionmaker_factory.cache_clear()
 
 
+@pytest.fixture
+def query_budget():
+    """
+    Fails the test if the block executes more SQL queries than max_queries.
+
+    Example:
+        with query_budget(3):
+            container.chat.ask(user_id=user.id, question="Foo")
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        with track_queries("query_budget") as stats:
+            yield stats
+
+        if stats.count > max_queries:
+            pytest.fail(f"Query budget {max_queries} exceeded\n{stats.report()}", pytrace=False)
+
+    return budget
+
+
 @pytest.fixture
 def api_client(session):
     return TestClient(app, headers={"Api-Token": Settings().API_TOKEN.get_secret_value()})
@@ -1,5 +1,11 @@
+import httpx
+import pytest
+
 from tests.factories import UserFactory, MessageFactory, ChatFactory
 from project.components.chat.enums import MessageTypeEnum
+from project.infrastructure.adapters import adatabase
+from project.infrastructure.apps.api import app
+from project.settings import Settings
 
 
 class TestChatEndpoints:
@@ -31,12 +37,12 @@ class TestChatHistory:
         chat = ChatFactory(user=user)
 
         # Создаем первую пару вопрос-ответ в одном чате
-        MessageFactory(content="Test question", user=user, chat=chat, message_type=MessageTypeEnum.USER)
-        MessageFactory(content="Test answer", user=user, chat=chat, message_type=MessageTypeEnum.AI)
+        question = MessageFactory(content="Test question", user=user, chat=chat, message_type=MessageTypeEnum.USER)
+        answer = MessageFactory(content="Test answer", user=user, chat=chat, message_type=MessageTypeEnum.AI)
 
         # Создаем вторую пару вопрос-ответ в том же чате
-        MessageFactory(content="Test question 2", user=user, chat=chat, message_type=MessageTypeEnum.USER)
-        MessageFactory(content="Test answer 2", user=user, chat=chat, message_type=MessageTypeEnum.AI)
+        question2 = MessageFactory(content="Test question 2", user=user, chat=chat, message_type=MessageTypeEnum.USER)
+        answer2 = MessageFactory(content="Test answer 2", user=user, chat=chat, message_type=MessageTypeEnum.AI)
 
         response = api_client.post(
             "/chat/v1/history",
@@ -47,8 +53,18 @@ class TestChatHistory:
         assert response.json() == {
             "data": {
                 "messages": [
-                    {"question": "Test question", "answer": "Test answer"},
-                    {"question": "Test question 2", "answer": "Test answer 2"},
+                    {
+                        "question_id": question.id,
+                        "question": "Test question",
+                        "answer_id": answer.id,
+                        "answer": "Test answer",
+                    },
+                    {
+                        "question_id": question2.id,
+                        "question": "Test question 2",
+                        "answer_id": answer2.id,
+                        "answer": "Test answer 2",
+                    },
                 ],
             },
         }
@@ -70,6 +86,29 @@ class TestChatHistory:
         assert response.status_code == 200
         assert "messages" in response.json()["data"]
 
+    def test_get_history_pagination(self, api_client):
+        """Тест получения последних сообщений и keyset пагинации истории чата."""
+        user = UserFactory()
+        chat = ChatFactory(user=user)
+
+        for i in range(1, 4):
+            MessageFactory(content=f"Question {i}", user=user, chat=chat, message_type=MessageTypeEnum.USER)
+            MessageFactory(content=f"Answer {i}", user=user, chat=chat, message_type=MessageTypeEnum.AI)
+
+        def history(**params):
+            response = api_client.post("/chat/v1/history", json={"user_id": user.id, "chat_id": chat.id, **params})
+            assert response.status_code == 200
+            return response.json()["data"]["messages"]
+
+        last = history(limit=4)
+        assert [item["question"] for item in last] == ["Question 2", "Question 3"]
+
+        before = history(limit=4, before_id=last[0]["question_id"])
+        assert [item["question"] for item in before] == ["Question 1"]
+
+        after = history(limit=4, after_id=before[-1]["answer_id"])
+        assert after == last
+
     def test_empty_history(self, api_client):
         """Тест пустой истории чата."""
         response = api_client.post("/chat/v1/history", json={"user_id": 0})
@@ -79,6 +118,7 @@ class TestChatHistory:
 
 
 class TestAskEndpoint:
+    @pytest.mark.usefixtures("redis")
     def test_ask_success(self, api_client, httpx_responses):
         """Тест задавания вопроса в чат."""
         response_text = "Test answer"
@@ -116,6 +156,7 @@ class TestAskEndpoint:
         assert response.status_code == 200
         assert "data" in response.json()
 
+    @pytest.mark.usefixtures("redis")
     def test_ask_with_chat_id(self, api_client, httpx_responses):
         """Тест задавания вопроса в конкретный чат."""
         response_text = "Test answer"
@@ -153,3 +194,47 @@ class TestAskEndpoint:
 
         assert response.status_code == 200
         assert "data" in response.json()
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("async_redis")
+    async def test_ask_v2_success(self, asession, httpx_responses):
+        """Тест асинхронного задавания вопроса: запросы к БД идут через движок aengine_factory() с asyncpg."""
+        mock_response_json = {
+            "id": "chatcmpl-123",
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "message": {"role": "assistant", "content": "Test answer"},
+                    "finish_reason": "stop",
+                    "index": 0,
+                },
+            ],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+            "created": 1234567890,
+            "model": "gpt-4o-mini",
+        }
+
+        # Мок HTTP запроса к OpenAI
+        httpx_responses.add(
+            method="POST",
+            url="https://api.openai.com/v1/chat/completions",
+            json=mock_response_json,
+            status=200,
+        )
+
+        user = UserFactory.build()
+        asession.add(user)
+        await asession.flush()
+
+        # TestClient запускает приложение в другом потоке и event loop, поэтому асинхронная сессия теста
+        # передается приложению через ASGITransport в том же event loop.
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test",
+            headers={"Api-Token": Settings().API_TOKEN.get_secret_value()},
+        ) as client:
+            response = await client.post("/chat/v2/ask", json={"user_id": user.id, "question": "Test question"})
+
+        assert response.status_code == 200
+        assert response.json() == {"data": "Test answer"}
+        assert adatabase.aengine_factory().dialect.driver == "asyncpg"
@@ -0,0 +1,80 @@
+import pytest
+import redis
+
+from project.components.chat.enums import MessageTypeEnum
+from project.components.chat.models import MessageModel
+from project.components.chat.repositories import ChatRepository, ChatWindowCacheRepository, MessageRepository
+from tests.factories import UserFactory
+
+
+def test_chat_history_query_is_prebuilt():
+    query, params = MessageRepository.chat_history_query(1, 2, 10, before_id=3)
+
+    assert MessageRepository.chat_history_query(4, 5, 20, before_id=6)[0] is query
+    assert params == {"chat_id": 2, "limit": 10, "before_id": 3}
+    assert MessageRepository.chat_history_query(1, None, 10)[1] == {"user_id": 1, "limit": 10}
+
+
+def test_get_or_create_active_chat(session):
+    user = UserFactory()
+
+    chat = ChatRepository.get_or_create_active_chat(user.id)
+
+    assert chat.is_active
+    assert ChatRepository.get_or_create_active_chat(user.id).id == chat.id
+
+
+@pytest.mark.usefixtures("redis")
+def test_save_turn_and_history(session):
+    user = UserFactory()
+    chat = ChatRepository.create_active_chat(user.id)
+
+    question, answer = MessageRepository.save_turn(user.id, chat.id, "Foo", "Bar")
+    (next_question,) = MessageRepository.save_turn(user.id, chat.id, "Baz", None)
+
+    assert question.id < answer.id < next_question.id
+    history = MessageRepository.get_chat_history(user.id, chat.id, limit=2)
+    assert [message.content for message in history] == ["Bar", "Baz"]
+    history = MessageRepository.get_chat_history(user.id, limit=10, before_id=next_question.id)
+    assert [message.content for message in history] == ["Foo", "Bar"]
+
+
+@pytest.mark.usefixtures("session")
+def test_bulk_insert_invalidates_chat_window(redis):
+    user = UserFactory()
+    chat = ChatRepository.create_active_chat(user.id)
+    redis.rpush(f"chat_window:{chat.id}", b"{}")
+
+    rows = [{"user_id": user.id, "chat_id": chat.id, "content": "Foo", "message_type": MessageTypeEnum.USER.name}]
+    assert MessageRepository.bulk_insert(rows) == 1
+
+    assert not redis.exists(f"chat_window:{chat.id}")
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("async_redis")
+async def test_chat_window_is_not_saved_after_change():
+    """Окно, прочитанное из Postgres до нового сообщения чата, не сохраняется в кеш."""
+    message = MessageModel(id=1, chat_id=1, user_id=1, message_type=MessageTypeEnum.USER, content="Foo")
+
+    version = await ChatWindowCacheRepository.version(1)
+    await ChatWindowCacheRepository.append(message)
+    await ChatWindowCacheRepository.save(1, [], version)
+    assert await ChatWindowCacheRepository.get(1) is None
+
+    await ChatWindowCacheRepository.save(1, [message], await ChatWindowCacheRepository.version(1))
+    window = await ChatWindowCacheRepository.get(1)
+    assert [message.content for message in window] == ["Foo"]
+
+
+@pytest.mark.asyncio
+async def test_chat_window_cache_error_is_miss():
+    """Ошибка Redis считается промахом кеша, окно читается из Postgres и не сохраняется."""
+
+    class UnavailableWindowCache(ChatWindowCacheRepository):
+        @staticmethod
+        def client():
+            return redis.asyncio.Redis(port=1)
+
+    assert await UnavailableWindowCache.get(1) is None
+    assert await UnavailableWindowCache.version(1) is None
@@ -1,5 +1,7 @@
 import datetime
+from types import SimpleNamespace
 
+import pytest
 from freezegun import freeze_time
 
 from project.container import DIContainer, Container
@@ -7,6 +9,7 @@ from tests.factories import UserFactory
 
 
 @freeze_time("2025-01-01")
+@pytest.mark.usefixtures("redis")
 def test_question_use_case(session):
     """Тест UseCase для задавания вопроса в чат."""
 
@@ -31,6 +34,7 @@ def test_question_use_case(session):
 
 
 @freeze_time("2025-01-01")
+@pytest.mark.usefixtures("redis")
 def test_question_use_case_with_chat_id(session):
     """Тест UseCase для задавания вопроса в конкретный чат."""
 
@@ -58,7 +62,29 @@ def test_question_use_case_with_chat_id(session):
     assert answer == "Bar 2025-01-01"
 
 
+@pytest.mark.usefixtures("redis")
+def test_question_use_case_query_budget(session, query_budget):
+    """Количество SQL запросов на вопрос не растет с длиной истории."""
+
+    class FakeChatAgent:
+        @staticmethod
+        def generate_answer(*_args):
+            return "Bar"
+
+    user = UserFactory()
+    container = DIContainer(llm_client=object(), chat_agent=FakeChatAgent())
+
+    # SAVEPOINT и RELEASE для двух транзакций, чат, его создание, история и сохранение вопроса с ответом.
+    with query_budget(9):
+        container.chat.ask(user_id=user.id, question="Foo")
+
+    for _ in range(3):
+        with query_budget(7):
+            container.chat.ask(user_id=user.id, question="Foo")
+
+
 @freeze_time("2025-01-01")
+@pytest.mark.usefixtures("redis")
 def test_question_use_case_with_http_mock(session, httpx_responses):
     """Тест UseCase для задавания вопроса в чат."""
 
@@ -119,3 +145,87 @@ def test_get_active_chat_use_case(session):
     chat_id2 = container.chat.get_active_chat(user_id=user.id)
 
     assert chat_id1 == chat_id2
+
+
+@pytest.mark.asyncio
+async def test_async_question_use_case(asession, async_redis):
+    """Тест асинхронного UseCase для задавания вопроса в чат."""
+
+    class MockLLMClient:
+        """Мок LLM клиента для тестирования."""
+
+        async def ainvoke(self, messages, **_kwargs):
+            """Возвращает мок-ответ."""
+
+            class Response:
+                content = f"Bar {len(messages)}"
+
+            return Response()
+
+    user = UserFactory.build()
+    asession.add(user)
+    await asession.flush()
+
+    container = DIContainer(llm_client=MockLLMClient())
+
+    answer = await container.chat.aask(user_id=user.id, question="Foo")
+    assert answer == "Bar 2"
+
+    # История вопроса и ответа попадает в следующий запрос.
+    answer = await container.chat.aask(user_id=user.id, question="Foo")
+    assert answer == "Bar 4"
+
+    # Окно истории закешировано в Redis и дополняется новыми сообщениями.
+    chat = await container.repo.chat.aget_or_create_active_chat(user.id)
+    window = await container.repo.message.window_cache.get(chat.id)
+    assert [message.content for message in window] == ["Foo", "Bar 2", "Foo", "Bar 4"]
+
+
+@pytest.mark.asyncio
+async def test_async_question_stream_use_case(asession, async_redis):
+    """Тест потокового UseCase: части ответа отдаются по мере генерации, ответ сохраняется целиком."""
+
+    class MockLLMClient:
+        """Мок LLM клиента для тестирования."""
+
+        async def astream(self, *_args, **_kwargs):
+            """Возвращает ответ по частям."""
+            for text in ("Bar", " ", "Baz"):
+                yield SimpleNamespace(text=text)
+
+    user = UserFactory.build()
+    asession.add(user)
+    await asession.flush()
+
+    container = DIContainer(llm_client=MockLLMClient())
+
+    parts = [part async for part in container.chat.aask_stream(user_id=user.id, question="Foo")]
+    assert parts == ["Bar", " ", "Baz"]
+
+    messages = await container.repo.message.aget_chat_history(user_id=user.id)
+    assert [message.content for message in messages] == ["Foo", "Bar Baz"]
+
+
+@pytest.mark.asyncio
+async def test_async_question_stream_use_case_error(asession, async_redis):
+    """Тест потокового UseCase: если LLM не вернула ответ, вопрос все равно сохраняется."""
+
+    class MockLLMClient:
+        """Мок LLM клиента для тестирования."""
+
+        async def astream(self, *_args, **_kwargs):
+            """Падает до первой части ответа."""
+            raise RuntimeError("LLM is unavailable")
+            yield
+
+    user = UserFactory.build()
+    asession.add(user)
+    await asession.flush()
+
+    container = DIContainer(llm_client=MockLLMClient())
+
+    with pytest.raises(RuntimeError):
+        [part async for part in container.chat.aask_stream(user_id=user.id, question="Foo")]
+
+    messages = await container.repo.message.aget_chat_history(user_id=user.id)
+    assert [message.content for message in messages] == ["Foo"]
@@ -1,7 +1,10 @@
+import io
+
 import pytest
 
 from project.exceptions import NotFoundError
 from project.components.user.repositories import UserRepository
+from project.libs.bulk import read_rows
 from tests.factories import UserFactory
 
 
@@ -104,3 +107,26 @@ class TestUserRepository:
         repo.delete_by_id(user.id)
 
         assert repo.get_or_none(user.id) is None
+
+    @pytest.mark.usefixtures("session")
+    @pytest.mark.parametrize("file_format", ["csv", "ndjson"])
+    def test_bulk_insert_and_export(self, file_format):
+        repo = UserRepository()
+        rows = [
+            {"id": 1001, "name": 'Line 1\nLine 2, "quoted"', "telegram_username": None, "is_admin": True},
+            {"id": 1002, "name": "Back\\slash", "telegram_username": "", "is_admin": False},
+        ]
+
+        assert repo.bulk_insert(rows) == 2
+
+        file = io.BytesIO()
+        assert repo.bulk_export(file, file_format, columns=["id", "name", "telegram_username", "is_admin"]) == 2
+        file.seek(0)
+        exported = sorted(read_rows(file, file_format), key=lambda row: int(row["id"]))
+        assert [(row["name"], row["telegram_username"]) for row in exported] == [
+            ('Line 1\nLine 2, "quoted"', None),
+            ("Back\\slash", ""),
+        ]
+
+        # Последовательность id сдвинута после загрузки с явными id.
+        assert repo.create(name="Test User").id > 1002
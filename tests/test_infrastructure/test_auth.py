@@ -0,0 +1,59 @@
+import pytest
+from pydantic import ValidationError
+
+from project.infrastructure.adapters.auth import AuthClient
+from project.settings import Settings
+
+
+@pytest.fixture
+def auth(async_redis):
+    with Settings.local(**Settings().model_dump(exclude_unset=True), BOT_AUTH_SERVICE_URL="http://auth.example.com"):
+        yield AuthClient()
+
+
+@pytest.mark.asyncio
+async def test_is_authorized_is_cached(auth, async_redis, aiohttp_responses):
+    aiohttp_responses.get("http://auth.example.com/api/check/1", payload={"exists": True})
+    aiohttp_responses.get("http://auth.example.com/api/check/2", payload={"exists": False})
+
+    assert await auth.is_authorized(1) is True
+    assert await auth.is_authorized(1) is True
+    assert await auth.is_authorized(2) is False
+    assert await auth.is_authorized(2) is False
+
+    assert await async_redis.get("auth:telegram_user:1") == b"1"
+    assert await async_redis.get("auth:telegram_user:2") == b"0"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_authorization(auth, async_redis, aiohttp_responses):
+    aiohttp_responses.get("http://auth.example.com/api/check/1", payload={"exists": True})
+    aiohttp_responses.get("http://auth.example.com/api/check/1", payload={"exists": False})
+
+    assert await auth.is_authorized(1) is True
+
+    await auth.invalidate_authorization(1)
+
+    assert await async_redis.get("auth:telegram_user:1") is None
+    assert await auth.is_authorized(1) is False
+
+
+@pytest.mark.asyncio
+async def test_warm_up_authorization(auth, async_redis, aiohttp_responses):
+    aiohttp_responses.get("http://auth.example.com/api/users_data", payload={"1": {}, "2": {"name": "user"}})
+
+    assert await auth.warm_up_authorization() == 2
+
+    assert await auth.is_authorized(1) is True
+    assert await auth.is_authorized(2) is True
+    assert await async_redis.get("auth:telegram_user:2") == b"1"
+
+
+@pytest.mark.asyncio
+async def test_warm_up_authorization_invalid_response(auth, async_redis, aiohttp_responses):
+    aiohttp_responses.get("http://auth.example.com/api/users_data", payload={"user": {}})
+
+    with pytest.raises(ValidationError):
+        await auth.warm_up_authorization()
+
+    assert await async_redis.keys("auth:telegram_user:*") == []
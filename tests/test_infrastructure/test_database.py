@@ -1,6 +1,13 @@
-from sqlalchemy import text
+import contextvars
+import sqlite3
 
-from project.infrastructure.adapters.database import Session, transaction, current_transaction
+import pytest
+from sqlalchemy import QueuePool, column, create_engine, insert, table, text
+from sqlalchemy.orm import Session as ORMSession
+
+from project.infrastructure.adapters import database
+from project.infrastructure.adapters.database import Session, read_session, transaction, current_transaction
+from project.settings import Settings
 
 
 def test_session_fixture(session):
@@ -49,3 +56,85 @@ def test_nested_transaction():
                 assert s.execute(text("SELECT 1")).scalar() == 1
 
             assert s1.execute(text("SELECT 1")).scalar() == 1
+
+
+@pytest.fixture
+def replicas(init_database):
+    dsn = init_database.url.render_as_string(hide_password=False)
+    with Settings.local(**Settings().model_dump(exclude_unset=True), SQLALCHEMY_REPLICA_DSNS=[dsn, dsn]):
+        database.replica_engines_factory.cache_clear()
+        yield database.replica_engines_factory()
+
+    for engine in database.replica_engines_factory():
+        engine.dispose()
+    database.replica_engines_factory.cache_clear()
+
+
+def test_read_session_replica(replicas):
+    context = contextvars.Context()
+
+    def request():
+        with read_session() as s:
+            assert s.get_bind() in replicas
+            assert s.execute(text("SELECT 1")).scalar() == 1
+
+            with read_session() as s2:
+                assert s2 is s
+
+            with transaction() as s3:
+                assert s3.get_bind() is database.engine_factory()
+
+                with read_session() as s4:
+                    assert s4 is s3
+
+        # Read-your-writes: после коммита чтения идут в primary.
+        with read_session() as s:
+            assert s.get_bind() is database.engine_factory()
+
+    context.run(request)
+
+    with read_session() as s:
+        assert s.get_bind() in replicas
+
+
+def test_select_replica():
+    pools = [QueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1) for _ in range(2)]
+
+    assert {database.select_replica(pools) for _ in range(4)} == {0, 1}
+
+    connection = pools[0].connect()  # Одно соединение занято
+    with Settings.local(**Settings().model_dump(exclude_unset=True), DATABASE_REPLICA_SELECTION="least_connections"):
+        assert [database.select_replica(pools) for _ in range(3)] == [1, 1, 1]
+    connection.close()
+
+
+def test_is_primary_pinned():
+    def request():
+        assert not database.is_primary_pinned()
+        database.pin_primary()
+        assert database.is_primary_pinned()
+
+        with Settings.local(**Settings().model_dump(exclude_unset=True), DATABASE_REPLICA_PRIMARY_PIN=0):
+            assert not database.is_primary_pinned()
+
+    contextvars.Context().run(request)
+
+
+def test_primary_is_pinned_after_commit_with_writes():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+    item = table("item", column("id"))
+
+    def request(statement, *, rollback: bool = False) -> bool:
+        with ORMSession(engine) as session, session.begin():
+            with session.begin_nested():
+                session.execute(statement)
+            if rollback:
+                session.rollback()
+
+        return database.is_primary_pinned()
+
+    assert not contextvars.Context().run(request, text("SELECT 1"))
+    assert not contextvars.Context().run(request, insert(item).values(id=1), rollback=True)
+    assert contextvars.Context().run(request, insert(item).values(id=2))
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from project.infrastructure.utils.telegram import split_message, stream_reply
+
+
+class FakeMessage:
+    def __init__(self, text: str = "", chat_type: str = "private", errors: list | None = None):
+        self.text = text
+        self.chat = SimpleNamespace(type=chat_type)
+        self.message_id = id(self)
+        self.replies: list[FakeMessage] = []
+        self.edits: list[str] = []
+        self.deleted = False
+        self.errors = errors if errors is not None else []
+
+    async def reply_text(self, text: str):
+        reply = FakeMessage(text, errors=self.errors)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text: str):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.edits.append(text)
+        self.text = text
+
+    async def delete(self):
+        self.deleted = True
+
+
+async def stream(*parts: str):
+    for part in parts:
+        yield part
+
+
+def test_split_message():
+    assert split_message("") == []
+    assert split_message("foo bar", max_length=10) == ["foo bar"]
+    assert split_message("foo bar baz", max_length=8) == ["foo bar", "baz"]
+    assert split_message("foo\nbar baz", max_length=9) == ["foo", "bar baz"]
+    assert split_message("foobarbaz", max_length=4) == ["foob", "arba", "z"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reply():
+    message = FakeMessage()
+
+    messages = await stream_reply(message, stream("Foo", " ", "Bar"), edit_interval=0)
+
+    assert [reply.text for reply in messages] == ["Foo Bar"]
+    assert messages[0].edits == ["Foo", "Foo ", "Foo Bar"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reply_throttles_edits():
+    message = FakeMessage()
+
+    messages = await stream_reply(message, stream("Foo", " ", "Bar"), edit_interval=60)
+
+    assert messages[0].edits == ["Foo Bar"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reply_group_interval():
+    message = FakeMessage(chat_type="group")
+
+    messages = await stream_reply(message, stream("Foo", " ", "Bar"), edit_interval=0, group_edit_interval=60)
+
+    assert messages[0].edits == ["Foo Bar"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reply_splits_long_answer():
+    message = FakeMessage()
+
+    messages = await stream_reply(message, stream("foo ", "bar ", "baz"), edit_interval=0, max_length=8)
+
+    assert [reply.text for reply in messages] == ["foo bar", "baz"]
+    assert message.replies == messages
+
+
+@pytest.mark.asyncio
+async def test_stream_reply_retry_after():
+    message = FakeMessage(errors=[RetryAfter(60)])
+
+    messages = await stream_reply(message, stream("Foo", " ", "Bar"), edit_interval=0)
+
+    assert messages[0].edits == ["Foo Bar"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reply_fallback():
+    message = FakeMessage(errors=[BadRequest("Bad Request")])
+
+    messages = await stream_reply(message, stream("Foo", " ", "Bar"), edit_interval=0)
+
+    placeholder, reply = message.replies
+    assert placeholder.deleted
+    assert messages == [reply]
+    assert reply.text == "Foo Bar"
@@ -1,7 +1,19 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
 import pytest
+from prometheus_client import REGISTRY
+from yarl import URL
 
-from project.infrastructure.utils.base_client import AsyncApi
-from project.exceptions import ExternalApiError, ServerError, ClientError
+from project.infrastructure.utils.base_client import AsyncApi, CallResult, EndpointCall, SyncApi
+from project.exceptions import ExternalApiError, ServerError, ClientError, ExternalHTTPConnectionError
+from project.libs.circuit_breaker import CircuitBreaker, CircuitOpenError
+from project.libs.hedging import Hedger
+from project.libs.rate_limit import AdaptiveConcurrencyLimiter
+from project.libs.retry import RetryPolicy
+from project.libs.streams import ServerSentEvent
+from project.libs.ttl_cache import CachePolicy
 
 
 @pytest.fixture
@@ -17,6 +29,20 @@ async def test_call_endpoint_success(api, aiohttp_responses):
     assert result == {"key": "value"}
 
 
+@pytest.mark.asyncio
+async def test_call_endpoint_json_body(api, aiohttp_responses):
+    aiohttp_responses.post("http://example.com/test", status=200, payload={})
+
+    await api.call_endpoint("test", method="POST", json={"name": "ёж"})
+
+    request = aiohttp_responses.requests[("POST", URL("http://example.com/test"))][0]
+    assert request.kwargs["data"] == b'{"name": "\\u0451\\u0436"}'
+    assert request.kwargs["headers"]["Content-Type"] == "application/json"
+
+    with pytest.raises(ValueError, match="data and json"):
+        await api.call_endpoint("test", method="POST", data=b"{}", json={})
+
+
 @pytest.mark.asyncio
 async def test_response_to_native_text(api, aiohttp_responses):
     aiohttp_responses.get("http://example.com/test", status=200, body="text response")
@@ -81,3 +107,434 @@ async def test_unknown_status_error(api, aiohttp_responses):
 def test_exception_inheritance():
     assert issubclass(ClientError, ExternalApiError)
     assert issubclass(ServerError, ExternalApiError)
+
+
+@pytest.mark.asyncio
+async def test_pooled_session_is_shared(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    other_api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    aiohttp_responses.get("http://example.com/test", status=200, payload={"key": "value"}, repeat=True)
+
+    try:
+        assert await api.call_endpoint("test") == {"key": "value"}
+        assert await other_api.call_endpoint("test") == {"key": "value"}
+
+        session = api.pooled_session()
+        assert not session.closed
+        assert session is other_api.pooled_session()
+    finally:
+        await AsyncApi.close_pooled_sessions()
+
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_pooled_session_per_connector_settings():
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    limited_api = AsyncApi(
+        api_root="http://example.com",
+        name_for_monitoring="Api",
+        pooled=True,
+        connector_settings={"limit_per_host": 1},
+    )
+
+    try:
+        assert api.pooled_session() is not limited_api.pooled_session()
+        assert limited_api.pooled_session().connector.limit_per_host == 1
+    finally:
+        await AsyncApi.close_pooled_sessions()
+
+
+def test_pooled_session_per_event_loop():
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+
+    async def pooled_session():
+        return api.pooled_session()
+
+    async def pooled_session_and_close():
+        session = api.pooled_session()
+        await AsyncApi.close_pooled_sessions()
+        return session
+
+    loop = asyncio.new_event_loop()
+    try:
+        session = loop.run_until_complete(pooled_session())
+        other_session = asyncio.run(pooled_session_and_close())
+
+        assert session is not other_session
+        assert other_session.closed
+        assert not session.closed
+    finally:
+        loop.run_until_complete(AsyncApi.close_pooled_sessions())
+        loop.close()
+
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_external_session_is_not_closed(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/test", status=200, payload={"key": "value"}, repeat=True)
+
+    async with api.Session() as session:
+        await api.call_endpoint("test")
+        await api.call_endpoint("test")
+
+        assert not session.closed
+
+
+def test_sync_pooled_client_is_reused(httpx_responses):
+    httpx_responses.add("GET", "http://example.com/test", json={"key": "value"})
+
+    with SyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True) as api:
+        assert api.call_endpoint("test") == {"key": "value"}
+        assert api.call_endpoint("test") == {"key": "value"}
+
+        client = api.pooled_client()
+        assert client is SyncApi(api_root="http://example.com", name_for_monitoring="Api").pooled_client()
+
+    # The client is shared by the Api class, it is closed by close() or close_pooled_clients().
+    assert not client.is_closed
+    api.close()
+    assert client.is_closed
+
+
+def test_sync_pooled_client_per_connection_settings():
+    limits = httpx.Limits(max_connections=1)
+    api = SyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    limited_api = SyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True, limits=limits)
+    http2_api = SyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True, http2=True)
+    same_api = SyncApi(api_root="http://example.com", name_for_monitoring="Api", limits=httpx.Limits(max_connections=1))
+
+    assert api.pooled_client() is not limited_api.pooled_client()
+    assert api.pooled_client() is not http2_api.pooled_client()
+    assert limited_api.pooled_client() is same_api.pooled_client()
+
+    SyncApi.close_pooled_clients()
+
+
+def test_sync_pooled_clients_are_closed():
+    api = SyncApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    client = api.pooled_client()
+
+    SyncApi.close_pooled_clients()
+
+    assert client.is_closed
+    assert api.pooled_client() is not client
+    api.close()
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_identical_calls(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", singleflight=True)
+    aiohttp_responses.get("http://example.com/test", status=200, payload={"key": "value"}, repeat=True)
+
+    results = await asyncio.gather(*(api.call_endpoint("test") for _ in range(5)))
+
+    assert results == [{"key": "value"}] * 5
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test"))]) == 1
+
+    await api.call_endpoint("test")
+
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test"))]) == 2
+
+
+@pytest.mark.asyncio
+async def test_singleflight_skips_different_and_unsafe_calls(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", singleflight=True)
+    aiohttp_responses.get("http://example.com/test?a=1", status=200, payload={}, repeat=True)
+    aiohttp_responses.get("http://example.com/test?a=2", status=200, payload={}, repeat=True)
+    aiohttp_responses.post("http://example.com/test", status=200, payload={}, repeat=True)
+
+    await asyncio.gather(
+        api.call_endpoint("test", params={"a": 1}),
+        api.call_endpoint("test", params={"a": 2}),
+        api.call_endpoint("test", method="POST"),
+        api.call_endpoint("test", method="POST"),
+    )
+
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test?a=1"))]) == 1
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test?a=2"))]) == 1
+    assert len(aiohttp_responses.requests[("POST", URL("http://example.com/test"))]) == 2
+
+
+@pytest.mark.asyncio
+async def test_singleflight_shares_errors(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", singleflight=True)
+    aiohttp_responses.get("http://example.com/test", status=500, body="Server error", repeat=True)
+
+    results = await asyncio.gather(api.call_endpoint("test"), api.call_endpoint("test"), return_exceptions=True)
+
+    assert all(isinstance(result, ServerError) for result in results)
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test"))]) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_policy(aiohttp_responses):
+    api = AsyncApi(
+        api_root="http://example.com",
+        name_for_monitoring="Api",
+        cache_policies={"test/{id}": CachePolicy(ttl=timedelta(minutes=1))},
+    )
+    aiohttp_responses.get("http://example.com/test/1", status=200, payload={"key": "value"}, repeat=True)
+    aiohttp_responses.post("http://example.com/test/1", status=200, payload={"key": "value"}, repeat=True)
+
+    first = await api.call_endpoint("test/1", resource_for_monitoring="test/{id}")
+    first["key"] = "changed"
+    second = await api.call_endpoint("test/1", resource_for_monitoring="test/{id}")
+    await api.call_endpoint("test/1", method="POST", resource_for_monitoring="test/{id}")
+    await api.call_endpoint("test/1", method="POST", resource_for_monitoring="test/{id}")
+
+    assert second == {"key": "value"}
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test/1"))]) == 1
+    assert len(aiohttp_responses.requests[("POST", URL("http://example.com/test/1"))]) == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_not_found(aiohttp_responses):
+    api = AsyncApi(
+        api_root="http://example.com",
+        name_for_monitoring="Api",
+        cache_policies={"test": CachePolicy(ttl=timedelta(minutes=1), negative_ttl=timedelta(seconds=10))},
+    )
+    aiohttp_responses.get("http://example.com/test", status=404, body="Not found", repeat=True)
+
+    for _ in range(2):
+        with pytest.raises(ClientError) as exc_info:
+            await api.call_endpoint("test")
+
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.response_data == "Not found"
+
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/test"))]) == 1
+
+
+def test_sync_cache_policy(httpx_responses):
+    api = SyncApi(
+        api_root="http://example.com",
+        name_for_monitoring="Api",
+        cache_policies={"test": CachePolicy(ttl=timedelta(minutes=1))},
+    )
+    route = httpx_responses.add("GET", "http://example.com/test", json={"key": "value"})
+
+    assert api.call_endpoint("test") == {"key": "value"}
+    assert api.call_endpoint("test") == {"key": "value"}
+    assert api.call_endpoint("test", params={"a": 1}) == {"key": "value"}
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_call_endpoint_stream_ndjson(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/export", status=200, body=b'{"id": 1}\n{"id": 2}\n')
+
+    records = [record async for record in api.call_endpoint_stream("export", mode="ndjson")]
+
+    assert records == [{"id": 1}, {"id": 2}]
+
+
+@pytest.mark.asyncio
+async def test_call_endpoint_stream_sse(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/events", status=200, body=b"data: a\n\nevent: end\ndata: b\n\n")
+
+    events = [event async for event in api.call_endpoint_stream("events", mode="sse")]
+
+    assert events == [ServerSentEvent(data="a"), ServerSentEvent(data="b", event="end")]
+
+
+@pytest.mark.asyncio
+async def test_call_endpoint_stream_error(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/export", status=500, body="Server error")
+
+    with pytest.raises(ServerError):
+        await anext(api.call_endpoint_stream("export"))
+
+
+def test_sync_call_endpoint_stream(httpx_responses):
+    api = SyncApi(api_root="http://example.com", name_for_monitoring="Api")
+    httpx_responses.add("GET", "http://example.com/export", json=[1, 2])
+
+    assert b"".join(api.call_endpoint_stream("export", chunk_size=1)) == b"[1,2]"
+
+
+@pytest.mark.asyncio
+async def test_call_many(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/items/1", status=200, payload={"id": 1})
+    aiohttp_responses.get("http://example.com/items/2", status=404, body="Not found")
+    aiohttp_responses.get("http://example.com/items/3", status=200, payload={"id": 3})
+
+    results = await api.call_many((EndpointCall(f"items/{i}") for i in range(1, 4)), concurrency=2)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [result.result for result in results] == [{"id": 1}, None, {"id": 3}]
+    assert isinstance(results[1].error, ClientError)
+    assert [result.ok for result in results] == [True, False, True]
+
+
+class SleepApi(AsyncApi):
+    """Calls sleep for float(resource) seconds instead of HTTP requests."""
+
+    in_flight = 0
+    max_in_flight = 0
+
+    async def call_endpoint(self, resource, **_kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(float(resource))
+        self.in_flight -= 1
+        return resource
+
+
+@pytest.mark.asyncio
+async def test_call_many_bounded_concurrency():
+    api = SleepApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+
+    results = await api.call_many([EndpointCall("0.01") for _ in range(10)], concurrency=3)
+
+    assert [result.result for result in results] == ["0.01"] * 10
+    assert api.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_iter_call_many_as_completed_with_timeout():
+    api = SleepApi(api_root="http://example.com", name_for_monitoring="Api", pooled=True)
+    calls = [EndpointCall("0.05"), EndpointCall("1"), EndpointCall("0")]
+
+    results = [result async for result in api.iter_call_many(calls, concurrency=3, call_timeout=0.2)]
+
+    assert [result.index for result in results] == [2, 0, 1]
+    assert isinstance(results[-1], CallResult)
+    assert isinstance(results[-1].error, TimeoutError)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter(aiohttp_responses):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, cooldown=0)
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", concurrency_limiter=limiter)
+    aiohttp_responses.get("http://example.com/items", status=429, body="Too many requests")
+    aiohttp_responses.get("http://example.com/items", status=404, body="Not found")
+    aiohttp_responses.get("http://example.com/items", status=200, payload=[], repeat=True)
+
+    with pytest.raises(ClientError):
+        await api.call_endpoint("items")
+    assert limiter.limit == 2
+
+    # 404 is not an overload, the limit grows by 1/limit per successful call: 2.5, 2.9, 3.24.
+    with pytest.raises(ClientError):
+        await api.call_endpoint("items")
+    assert await api.call_endpoint("items") == []
+    assert limiter.limit == 2
+    assert await api.call_endpoint("items") == []
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_keeps_concurrency_limit(aiohttp_responses):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="Api", concurrency_limiter=limiter)
+
+    async def slow_response(*_args, **_kwargs):
+        await asyncio.sleep(1)
+
+    aiohttp_responses.get("http://example.com/items", callback=slow_response)
+
+    call = asyncio.create_task(api.call_endpoint("items"))
+    await asyncio.sleep(0.01)
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+
+    assert limiter.limit == 1
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(aiohttp_responses):
+    breaker = CircuitBreaker("CircuitApi", failure_threshold=2, recovery_timeout=60)
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="CircuitApi", circuit_breaker=breaker)
+    aiohttp_responses.get("http://example.com/items", status=404, body="Not found")
+    aiohttp_responses.get("http://example.com/items", status=500, body="Server error", repeat=2)
+
+    with pytest.raises(ClientError):
+        await api.call_endpoint("items")
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            await api.call_endpoint("items")
+
+    with pytest.raises(ExternalHTTPConnectionError) as exc_info:
+        await api.call_endpoint("items")
+
+    assert isinstance(exc_info.value.original_error, CircuitOpenError)
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/items"))]) == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_policy(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="RetryApi", retry_policy=RetryPolicy(delay=0))
+    aiohttp_responses.get("http://example.com/items", status=503, headers={"Retry-After": "0"})
+    aiohttp_responses.get("http://example.com/items", status=429)
+    aiohttp_responses.get("http://example.com/items", status=200, payload={"key": "value"})
+
+    assert await api.call_endpoint("items") == {"key": "value"}
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/items"))]) == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_name_is_normalized(common_metrics, aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="RetryNameApi", retry_policy=RetryPolicy(delay=0))
+    aiohttp_responses.get("http://example.com/items/1", status=503)
+    aiohttp_responses.get("http://example.com/items/1", status=200, payload={})
+
+    await api.call_endpoint("items/1")
+
+    assert REGISTRY.get_sample_value("genapp_retry_attempts_total", {"name": "RetryNameApi:items/{int}"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_skips_unsafe_calls(aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="RetryApi", retry_policy=RetryPolicy(delay=0))
+    aiohttp_responses.post("http://example.com/items", status=503)
+    aiohttp_responses.get("http://example.com/items", status=400)
+    aiohttp_responses.get("http://example.com/items", status=503, headers={"Retry-After": "3600"})
+
+    with pytest.raises(ServerError):
+        await api.call_endpoint("items", method="POST", json={})
+    with pytest.raises(ClientError):
+        await api.call_endpoint("items")
+    with pytest.raises(ServerError):
+        await api.call_endpoint("items")
+
+    assert len(aiohttp_responses.requests[("POST", URL("http://example.com/items"))]) == 1
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/items"))]) == 2
+
+
+@pytest.mark.asyncio
+async def test_call_endpoint_retry_policy(api, aiohttp_responses):
+    aiohttp_responses.get("http://example.com/items", status=502, repeat=2)
+
+    with pytest.raises(ServerError):
+        await api.call_endpoint("items", retry_policy=RetryPolicy(max_attempts=2, delay=0))
+
+    assert len(aiohttp_responses.requests[("GET", URL("http://example.com/items"))]) == 2
+
+
+class SlowRequestApi(AsyncApi):
+    """Each request sleeps for the next duration and returns it instead of an HTTP request."""
+
+    def __init__(self, *durations: float, **kwargs):
+        super().__init__(api_root="http://example.com", **kwargs)
+        self.durations = list(durations)
+
+    async def _request(self, *_args, **_kwargs):
+        duration = self.durations.pop(0)
+        await asyncio.sleep(duration)
+        return duration
+
+
+@pytest.mark.asyncio
+async def test_hedging():
+    hedger = Hedger(min_samples=1)
+    api = SlowRequestApi(0.01, 1, 0, 1, name_for_monitoring="HedgeApi", hedgers={"items": hedger})
+
+    assert await api.call_endpoint("items") == 0.01
+    assert await api.call_endpoint("items") == 0
+    assert await api.call_endpoint("items", method="POST", json={}) == 1
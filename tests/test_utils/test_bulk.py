@@ -0,0 +1,68 @@
+import io
+
+from project.libs.bulk import CopyWriter, CsvRowsReader, first_row_columns, read_rows
+
+
+def read_all(reader: CsvRowsReader, size: int) -> bytes:
+    data = b""
+    while chunk := reader.read(size):
+        data += chunk
+    return data
+
+
+def test_csv_rows_reader():
+    rows = [{"id": i, "content": 'a,b\n"c"', "tags": ["x"], "title": None} for i in range(5)]
+    progress = []
+    reader = CsvRowsReader(rows, ["id", "content", "tags", "title"], batch_size=2, on_progress=progress.append)
+
+    data = read_all(reader, size=7)
+
+    assert data == b'"0","a,b\n""c""","[""x""]",\n' + b"".join(
+        f'"{i}","a,b\n""c""","[""x""]",\n'.encode() for i in range(1, 5)
+    )
+    assert reader.count == 5
+    assert progress == [2, 4, 5]
+
+
+def test_copy_writer_csv():
+    file = io.BytesIO()
+    progress = []
+    writer = CopyWriter(file, "csv", progress_every=2, on_progress=progress.append)
+
+    for line in (b"id,name\n", b"1,foo\n", b"2,\\N\n", b"3,bar\n"):
+        writer.write(line)
+
+    assert file.getvalue() == b"id,name\n1,foo\n2,\\N\n3,bar\n"
+    assert writer.count == 3
+    assert progress == [2]
+
+
+def test_copy_writer_ndjson():
+    file = io.BytesIO()
+    writer = CopyWriter(file, "ndjson")
+
+    writer.write(b'{"id":1,"content":"a\\\\nb \\\\"c\\\\""}\n')
+
+    assert file.getvalue() == b'{"id":1,"content":"a\\nb \\"c\\""}\n'
+    assert list(read_rows(io.BytesIO(file.getvalue()), "ndjson")) == [{"id": 1, "content": 'a\nb "c"'}]
+
+
+def test_read_rows_csv():
+    file = io.BytesIO(b'id,name,title\n1,"foo\nbar",\\N\n2,,x\n')
+
+    assert list(read_rows(file, "csv")) == [
+        {"id": "1", "name": "foo\nbar", "title": None},
+        {"id": "2", "name": "", "title": "x"},
+    ]
+
+
+def test_first_row_columns():
+    columns, rows = first_row_columns(iter([{"a": 1, "b": 2}, {"a": 3, "b": 4}]))
+
+    assert columns == ["a", "b"]
+    assert list(rows) == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+
+    columns, rows = first_row_columns([])
+
+    assert columns == []
+    assert list(rows) == []
@@ -0,0 +1,63 @@
+import pytest
+from freezegun import freeze_time
+
+from project.libs.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitStateEnum
+from project.libs.retry import retry_on_exception, retry_unless_exception
+
+
+def test_circuit_breaker():
+    with freeze_time("2025-01-01 00:00:00") as frozen_time:
+        breaker = CircuitBreaker("api", failure_threshold=2, recovery_timeout=10)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state is CircuitStateEnum.CLOSED
+
+        breaker.record_failure()
+        assert breaker.state is CircuitStateEnum.OPEN
+        assert not breaker.allow()
+        assert breaker.retry_after == 10
+
+        frozen_time.tick(10)
+        assert breaker.allow()
+        assert breaker.state is CircuitStateEnum.HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.state is CircuitStateEnum.OPEN
+
+        frozen_time.tick(10)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state is CircuitStateEnum.CLOSED
+
+
+def test_circuit_breaker_release_trial():
+    with freeze_time("2025-01-01 00:00:00") as frozen_time:
+        breaker = CircuitBreaker("api", failure_threshold=1, recovery_timeout=1)
+        breaker.record_failure()
+        frozen_time.tick(1)
+
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+
+@pytest.mark.parametrize(
+    "decorator",
+    [retry_on_exception(ConnectionError, delay=0), retry_unless_exception(ValueError, delay=0)],
+)
+def test_retry_skips_open_circuit(decorator):
+    calls = 0
+
+    @decorator
+    def call():
+        nonlocal calls
+        calls += 1
+        raise ConnectionError from CircuitOpenError("api", 10)
+
+    with pytest.raises(ConnectionError):
+        call()
+
+    assert calls == 1
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from project.libs.hedging import Hedger
+
+
+def sleeper(*durations: float):
+    """Each call sleeps for the next duration and returns it, errors are raised."""
+    durations = list(durations)
+    cancelled = []
+
+    async def func():
+        duration = durations.pop(0)
+        try:
+            await asyncio.sleep(abs(duration))
+        except asyncio.CancelledError:
+            cancelled.append(duration)
+            raise
+        if duration < 0:
+            raise ValueError(duration)
+        return duration
+
+    return func, cancelled
+
+
+def test_hedger_delay_percentile():
+    hedger = Hedger(percentile=0.9, min_samples=10, window=100)
+
+    for duration in range(1, 10):
+        hedger.record(duration / 100)
+    assert hedger.delay is None
+
+    hedger.record(0.1)
+    assert hedger.delay == 0.09
+
+    hedger = Hedger(percentile=0.5, min_delay=0.2, max_delay=0.3, min_samples=1)
+    hedger.record(0.1)
+    assert hedger.delay == 0.2
+    for _ in range(100):
+        hedger.record(1)
+    assert hedger.delay == 0.3
+
+
+@pytest.mark.asyncio
+async def test_hedger_without_samples():
+    hedger = Hedger(min_samples=2)
+    func, _ = sleeper(0.01, 0.01)
+
+    assert await hedger.run(func) == 0.01
+    assert hedger.delay is None
+    assert await hedger.run(func) == 0.01
+    assert hedger.delay >= 0.01
+
+
+@pytest.mark.asyncio
+async def test_hedger_sends_hedge_and_cancels_loser():
+    outcomes = []
+    hedger = Hedger(min_samples=1, on_hedge=outcomes.append)
+    hedger.record(0.01)
+    func, cancelled = sleeper(1, 0)
+
+    assert await hedger.run(func) == 0
+    assert outcomes == ["sent", "won"]
+    assert cancelled == [1]
+
+
+@pytest.mark.asyncio
+async def test_hedger_primary_wins():
+    outcomes = []
+    hedger = Hedger(min_samples=1, on_hedge=outcomes.append)
+    hedger.record(0.01)
+    func, cancelled = sleeper(0.05, 1)
+
+    assert await hedger.run(func) == 0.05
+    assert outcomes == ["sent"]
+    assert cancelled == [1]
+
+
+@pytest.mark.asyncio
+async def test_hedger_waits_for_success_after_error():
+    hedger = Hedger(min_samples=1)
+    hedger.record(0.01)
+
+    func, _ = sleeper(-0.05, 0.1)
+    assert await hedger.run(func) == 0.1
+
+    func, _ = sleeper(-0.05, -0.06)
+    with pytest.raises(ValueError, match="-0.05"):
+        await hedger.run(func)
+
+
+@pytest.mark.asyncio
+async def test_hedger_rate_cap():
+    outcomes = []
+    hedger = Hedger(min_samples=1, max_hedge_ratio=0.5, max_tokens=1, on_hedge=outcomes.append)
+    hedger.record(0.01)
+    func, _ = sleeper(0.05, 0, 0.05, 0.2, 0)
+
+    await hedger.run(func)
+    await hedger.run(func)
+    assert outcomes == ["sent", "won"]
+
+    await hedger.run(func)
+    assert outcomes == ["sent", "won", "sent", "won"]
@@ -0,0 +1,187 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, exc, text
+
+from project.components.base.repositories import ORMRepository
+from project.infrastructure.adapters.database import (
+    InstrumentedQueuePool,
+    instrument_pool,
+    instrument_queries,
+    repository_method_storage,
+)
+
+from project.infrastructure.utils.base_client import AsyncApi, SyncApi
+from project.libs.metrics import http_request_recorder, normalize_resource
+from project.libs.query_stats import observe_queries, query_hash, track_queries
+from project.settings import Settings
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, {"env": "dev", "app": "test", **labels}) or 0
+
+
+@pytest.mark.parametrize(
+    ("resource", "expected"),
+    [
+        ("", "/"),
+        ("/api/check/123/", "api/check/{int}"),
+        ("items/3f2504e0-4f89-41d3-9a0c-0305e82c3301", "items/{uuid}"),
+    ],
+)
+def test_normalize_resource(resource, expected):
+    assert normalize_resource(resource) == expected
+
+
+def test_recorder_is_reused():
+    assert http_request_recorder("api", "items", "get") is http_request_recorder("api", "items", "get")
+
+
+def test_recorder(common_metrics):
+    labels = {"app_type": "recorder_api", "resource": "items/{int}", "method": "GET", "status": "200"}
+    recorder = http_request_recorder("recorder_api", "items/1", "get")
+
+    recorder.record(200, 0.5, request_size=0, response_size=100)
+    recorder.record(200, 0.5, request_size=0, response_size=100)
+
+    assert sample("genapp_http_requests_total", **labels) == 2
+    assert sample("genapp_http_request_duration_sec_sum", **labels) == 1
+    assert sample("genapp_http_request_size_bytes_sum", direction="out", **labels) == 200
+
+
+def test_recorder_without_metrics():
+    http_request_recorder("recorder_api", "items", "GET").record(200, 0.5)
+
+
+@pytest.mark.asyncio
+async def test_async_api_records_body_sizes(common_metrics, aiohttp_responses):
+    api = AsyncApi(api_root="http://example.com", name_for_monitoring="sizes_api")
+    aiohttp_responses.post("http://example.com/items", status=201, body=b'{"id": 1}')
+    labels = {"app_type": "sizes_api", "resource": "items", "method": "POST", "status": "201"}
+
+    assert await api.call_endpoint("items", method="POST", json={"name": "item"}) == {"id": 1}
+
+    assert sample("genapp_http_requests_total", **labels) == 1
+    assert sample("genapp_http_request_size_bytes_sum", direction="in", **labels) == len(b'{"name": "item"}')
+    assert sample("genapp_http_request_size_bytes_sum", direction="out", **labels) == len(b'{"id": 1}')
+
+
+def test_sync_api_records_body_sizes(common_metrics, httpx_responses):
+    api = SyncApi(api_root="http://example.com", name_for_monitoring="sizes_sync_api")
+    httpx_responses.add("GET", "http://example.com/items", json=[1, 2])
+    labels = {"app_type": "sizes_sync_api", "resource": "items", "method": "GET", "status": "200"}
+
+    assert api.call_endpoint("items") == [1, 2]
+
+    assert sample("genapp_http_requests_total", **labels) == 1
+    assert sample("genapp_http_request_size_bytes_sum", direction="out", **labels) == len(b"[1,2]")
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JsonHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_api_connection_metrics(common_metrics, http_server):
+    api = SyncApi(api_root=http_server, name_for_monitoring="connections_api", pooled=True)
+    labels = {"app_type": "connections_api"}
+
+    try:
+        assert api.call_endpoint("items") == []
+        assert api.call_endpoint("items") == []
+        assert list(api.call_endpoint_stream("items")) == [b"[]"]
+    finally:
+        api.close()
+
+    # Keep-alive connection of the pooled client is reused.
+    assert REGISTRY.get_sample_value("genapp_http_new_connections_total", labels) == 1
+    assert REGISTRY.get_sample_value("genapp_http_requests_in_flight", labels) == 0
+
+
+class MetricsQueuePool(InstrumentedQueuePool):
+    pool_name = "test"
+
+
+def test_db_pool_metrics(common_metrics, tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        poolclass=MetricsQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.01,
+    )
+    instrument_pool(engine, "test")
+    labels = {"pool": "test"}
+
+    with engine.connect() as connection, engine.connect():
+        connection.execute(text("SELECT 1"))
+        assert REGISTRY.get_sample_value("genapp_db_pool_checked_out", labels) == 2
+        assert REGISTRY.get_sample_value("genapp_db_pool_overflow", labels) == 1
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    assert REGISTRY.get_sample_value("genapp_db_pool_checked_out", labels) == 0
+    assert REGISTRY.get_sample_value("genapp_db_pool_overflow", labels) == 0
+    assert REGISTRY.get_sample_value("genapp_db_connection_hold_sec_count", labels) == 2
+    assert REGISTRY.get_sample_value("genapp_db_connection_age_sec_count", labels) == 2
+    assert REGISTRY.get_sample_value("genapp_db_pool_checkout_wait_sec_count", labels) == 3
+    assert REGISTRY.get_sample_value("genapp_db_pool_checkout_timeouts_total", labels) == 1
+
+
+def test_db_query_metrics(common_metrics):
+    engine = create_engine("sqlite://")
+    with Settings.local(**Settings().model_dump(exclude_unset=True), DATABASE_SLOW_QUERY_SEC=1e-9):
+        instrument_queries(engine, "test")
+    query = "SELECT ?"
+
+    with track_queries("handler") as stats, engine.connect() as connection:
+        for i in range(10):
+            connection.execute(text("SELECT :i"), {"i": i})
+
+    observe_queries(stats, "fastapi", "/handler")
+
+    assert stats.count == 10
+    assert stats.fingerprints == {query: 10}
+    labels = {"pool": "test", "query_hash": query_hash(query)}
+    assert REGISTRY.get_sample_value("genapp_db_query_duration_sec_count", labels) == 10
+    assert REGISTRY.get_sample_value("genapp_db_slow_queries_total", {"pool": "test"}) == 10
+    labels = {"app_type": "fastapi", "handler": "/handler"}
+    assert REGISTRY.get_sample_value("genapp_db_queries_per_request_sum", labels) == 10
+    assert REGISTRY.get_sample_value("genapp_db_repeated_queries_total", labels) == 1
+
+
+def test_repository_method_name():
+    class ItemRepository(ORMRepository):
+        @classmethod
+        def current(cls) -> str | None:
+            return repository_method_storage.get()
+
+        @classmethod
+        def outer(cls) -> tuple[str | None, str | None]:
+            return cls.current(), repository_method_storage.get()
+
+    assert ItemRepository.current() == "ItemRepository.current"
+    assert ItemRepository.outer() == ("ItemRepository.current", "ItemRepository.outer")
+    assert repository_method_storage.get() is None
@@ -0,0 +1,41 @@
+from project.libs.query_stats import fingerprint, query_hash, record_query, track_queries
+
+
+def test_fingerprint():
+    assert (
+        fingerprint("SELECT a FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND x = 'it''s' AND y::jsonb = :y LIMIT 10")
+        == "SELECT a FROM t WHERE id IN (?) AND x = ? AND y::jsonb = ? LIMIT ?"
+    )
+    assert (
+        fingerprint("INSERT INTO m (a, b)\n VALUES ($1, $2), ($3, $4) RETURNING m.id")
+        == "INSERT INTO m (a, b) VALUES (?) RETURNING m.id"
+    )
+    assert fingerprint("RELEASE SAVEPOINT sa_savepoint_12") == "RELEASE SAVEPOINT sa_savepoint_?"
+
+
+def test_query_hash():
+    query = fingerprint("SELECT a FROM t WHERE id = 1 AND x = 'foo' " + "AND y = 2 " * 100)
+
+    assert len(query_hash(query)) == 8
+    same_query = fingerprint("SELECT a FROM t WHERE id = 2 AND x = 'bar' " + "AND y = 3 " * 100)
+
+    assert query_hash(query) == query_hash(same_query)
+    assert query_hash(query) != query_hash("SELECT ?")
+
+
+def test_track_queries():
+    record_query("SELECT 1", 1)
+
+    with track_queries("outer") as outer:
+        record_query("SELECT ?", 0.5)
+
+        with track_queries("inner") as inner:
+            record_query("SELECT ?", 0.25)
+            record_query("UPDATE t SET a = ?", 0.25)
+
+    record_query("SELECT 1", 1)
+
+    assert (outer.count, outer.duration) == (3, 1)
+    assert (inner.count, inner.duration) == (2, 0.5)
+    assert outer.repeated(2) == [("SELECT ?", 2)]
+    assert outer.report() == "outer: 3 queries in 1.000s\n    2 x SELECT ?\n    1 x UPDATE t SET a = ?"
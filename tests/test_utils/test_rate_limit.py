@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from freezegun import freeze_time
+
+from project.libs.rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+def test_token_bucket():
+    with freeze_time("2025-01-01 00:00:00") as frozen_time:
+        limiter = TokenBucket(rate=10, burst=2)
+
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == pytest.approx(0.1)
+        assert limiter.reserve() == pytest.approx(0.2)
+
+        frozen_time.tick(1)
+
+        assert limiter.reserve() == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_limiter_queue():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=2)
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.waiting == 1
+
+    limiter.release()
+    await waiter
+
+    assert limiter.in_flight == 1
+    assert limiter.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_limiter_cancelled_waiter():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    assert limiter.waiting == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_limiter_aimd():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=2, max_limit=10, cooldown=60)
+
+    for _ in range(9):
+        await limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 9
+
+    await limiter.acquire()
+    await limiter.acquire()
+    limiter.release(overloaded=True)
+    limiter.release(overloaded=True)
+    assert limiter.limit == 4
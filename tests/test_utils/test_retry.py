@@ -0,0 +1,180 @@
+import itertools
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+from prometheus_client import REGISTRY
+
+from project.exceptions import ExternalHTTPConnectionError, ServerError
+from project.libs.retry import (
+    RetryBudget,
+    RetryPolicy,
+    backoff_delays,
+    get_retry_budget,
+    parse_retry_after,
+    retry_on_exception,
+)
+
+
+def failing(errors: int):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= errors:
+            raise ConnectionError
+        return len(calls)
+
+    return func, calls
+
+
+@pytest.mark.parametrize(
+    ("jitter", "expected"),
+    [
+        ("none", [1, 2, 4, 5, 5]),
+        ("full", [1, 2, 4, 5, 5]),
+        ("decorrelated", [5, 5, 5, 5, 5]),
+    ],
+)
+def test_backoff_delays_max_delay(jitter, expected):
+    delays = list(itertools.islice(backoff_delays(1, backoff=2, max_delay=5, jitter=jitter), 5))
+
+    for value, upper in zip(delays, expected, strict=True):
+        assert 0 <= value <= upper
+
+
+def test_backoff_delays_without_jitter_by_default():
+    assert list(itertools.islice(backoff_delays(1, backoff=3, max_delay=10), 5)) == [1, 3, 9, 10, 10]
+
+
+def test_backoff_delays_decorrelated_lower_bound():
+    delays = itertools.islice(backoff_delays(0.5, max_delay=10, jitter="decorrelated"), 100)
+
+    assert all(0.5 <= value <= 10 for value in delays)
+
+
+def test_retry_budget():
+    budget = RetryBudget("test", ratio=0.5, max_tokens=2)
+
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+    for _ in range(10):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_shared_retry_budget():
+    assert get_retry_budget("shared_test") is get_retry_budget("shared_test")
+
+
+def test_shared_retry_budget_with_other_parameters():
+    get_retry_budget("shared_parameters_test", ratio=0.5)
+
+    with pytest.raises(ValueError, match="already exists"):
+        get_retry_budget("shared_parameters_test")
+
+
+def test_retry_stops_when_budget_is_exhausted():
+    func, calls = failing(errors=10)
+    budget = RetryBudget("test", max_tokens=2)
+    decorated = retry_on_exception(ConnectionError, max_attempts=5, delay=0, budget=budget)(func)
+
+    with pytest.raises(ConnectionError):
+        decorated()
+
+    assert len(calls) == 3
+
+
+def test_retry_deposits_budget_on_success():
+    budget = RetryBudget("test", ratio=1, max_tokens=1)
+    func, calls = failing(errors=1)
+
+    assert retry_on_exception(ConnectionError, delay=0, budget=budget)(func)() == 2
+    assert budget.tokens == 1
+
+
+def test_retry_deadline():
+    func, calls = failing(errors=10)
+    decorated = retry_on_exception(ConnectionError, max_attempts=5, delay=10, jitter="none", deadline=5)(func)
+
+    with pytest.raises(ConnectionError):
+        decorated()
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_retry_max_delay():
+    calls = []
+
+    @retry_on_exception(ConnectionError, max_attempts=3, delay=10, backoff=3, max_delay=0, jitter="none")
+    async def func():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError
+        return "ok"
+
+    assert await func() == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_metrics(common_metrics):
+    func, _ = failing(errors=10)
+    budget = RetryBudget("metrics_test", max_tokens=1)
+
+    with pytest.raises(ConnectionError):
+        retry_on_exception(ConnectionError, max_attempts=5, delay=0, budget=budget)(func)()
+
+    labels = {"name": "metrics_test"}
+    assert REGISTRY.get_sample_value("genapp_retry_attempts_total", labels) == 1
+    assert REGISTRY.get_sample_value("genapp_retry_budget_exhausted_total", labels) == 1
+
+
+def test_parse_retry_after():
+    date = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+
+    assert parse_retry_after("5") == 5
+    assert 28 < parse_retry_after(date) <= 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+class Response:
+    method = "GET"
+
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+
+def test_retry_policy_is_retryable():
+    policy = RetryPolicy()
+    server_error = ServerError(Response({}), None, "http://example.com", 503)
+    connection_error = ExternalHTTPConnectionError("http://example.com", "GET", TimeoutError())
+
+    assert policy.is_retryable(server_error, "get")
+    assert policy.is_retryable(connection_error, "GET")
+    assert not policy.is_retryable(server_error, "POST")
+    assert not policy.is_retryable(ServerError(Response({}), None, "http://example.com", 501), "GET")
+    assert not RetryPolicy(retry_connection_errors=False).is_retryable(connection_error, "GET")
+
+
+def test_retry_policy_retry_after():
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ServerError(Response({"Retry-After": "120"}), None, "http://example.com", 503)
+
+    with pytest.raises(ServerError):
+        RetryPolicy(max_retry_after=60).call(func, "GET", "test")
+    assert len(calls) == 1
+
+    assert RetryPolicy().retry_after(ServerError(Response({"Retry-After": "2"}), None, "", 503)) == 2
@@ -0,0 +1,58 @@
+import pytest
+
+from project.libs.streams import LineDecoder, ServerSentEvent, StreamDecoder
+
+
+def decode(decoder: StreamDecoder, chunks: list[bytes]) -> list:
+    items = []
+    for chunk in chunks:
+        items.extend(decoder.feed(chunk))
+    items.extend(decoder.flush())
+    return items
+
+
+def test_raw():
+    assert decode(StreamDecoder("raw"), [b"ab", b"c"]) == [b"ab", b"c"]
+
+
+def test_ndjson_split_between_chunks():
+    chunks = [b'{"a": 1}\n{"a"', b": 2}\r\n\n", b'{"a": 3}']
+
+    assert decode(StreamDecoder("ndjson"), chunks) == [{"a": 1}, {"a": 2}, {"a": 3}]
+
+
+def test_sse():
+    chunks = [
+        b": comment\n",
+        b"event: token\ndata: Hel",
+        b"lo\nid: 1\n\n",
+        b"data: line 1\ndata: line 2\nretry: 100\n\n",
+        b"data: not finished",
+    ]
+
+    assert decode(StreamDecoder("sse"), chunks) == [
+        ServerSentEvent(data="Hello", event="token", id="1"),
+        ServerSentEvent(data="line 1\nline 2", id="1", retry=100),
+    ]
+
+
+def test_line_too_long():
+    decoder = LineDecoder(max_line_size=4)
+
+    assert decoder.feed(b"1234\n12") == [b"1234"]
+
+    with pytest.raises(ValueError, match="Line is longer"):
+        decoder.feed(b"345")
+
+
+def test_sse_encode():
+    events = [
+        ServerSentEvent(data="Hello"),
+        ServerSentEvent(data="line 1\nline 2", event="token", id="1", retry=100),
+    ]
+
+    content = b"".join(event.encode() for event in events)
+
+    assert content == b"data: Hello\n\nevent: token\nid: 1\nretry: 100\ndata: line 1\ndata: line 2\n\n"
+    assert decode(StreamDecoder("sse"), [content]) == events
+    assert ServerSentEvent(data="").encode() == b"data: \n\n"
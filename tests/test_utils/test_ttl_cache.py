@@ -0,0 +1,61 @@
+from freezegun import freeze_time
+
+from project.libs.ttl_cache import TTLCache
+
+
+def test_get_and_set():
+    cache = TTLCache()
+    cache.set("foo", "bar", ttl=60)
+
+    assert cache.get("foo") == "bar"
+    assert cache.get("baz") is None
+    assert cache.get("baz", "default") == "default"
+
+
+def test_expired():
+    evicted = []
+    cache = TTLCache(on_evict=evicted.append)
+
+    with freeze_time("2025-01-01 00:00:00") as frozen_time:
+        cache.set("foo", "bar", ttl=60)
+        frozen_time.tick(61)
+
+        assert cache.get("foo") is None
+
+    assert len(cache) == 0
+    assert evicted == ["expired"]
+
+
+def test_lru_by_entries():
+    evicted = []
+    cache = TTLCache(max_entries=2, on_evict=evicted.append)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert evicted == ["lru"]
+
+
+def test_lru_by_bytes():
+    cache = TTLCache(max_bytes=10)
+    cache.set("a", b"12345", ttl=60, size=5)
+    cache.set("b", b"12345", ttl=60, size=5)
+    cache.set("c", b"123", ttl=60, size=3)
+
+    assert "a" not in cache
+    assert cache.nbytes == 8
+
+    cache.set("b", b"1", ttl=60, size=1)
+    assert cache.nbytes == 4
+
+    cache.delete("b")
+    cache.delete("unknown")
+    assert cache.nbytes == 3
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.nbytes == 0